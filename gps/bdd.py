@@ -0,0 +1,416 @@
+"""
+A small reduced ordered binary decision diagram (BDD) package in pure Python.
+
+A BDD represents a boolean function of numbered variables as a directed
+acyclic graph in which every internal node tests one variable and has a low
+child (the variable is false) and a high child (it is true), and every path
+tests the variables in increasing order. Nodes are shared: the manager keeps
+a unique table, so two nodes with the same variable and children are always
+the same node, and equivalent functions are the same node. A function is
+referred to by the integer id of its root node; 0 and 1 are the constant
+functions false and true.
+
+Nodes are kept in parallel lists of their variables and children, indexed by
+id; a node is always created after its children, so it has a larger id. The
+results of the binary operations and quantifications are cached, and the
+caches may be cleared with :func:`BDD.clear_caches` to bound their memory.
+Nodes are not freed as they become unused, but :func:`BDD.collect` compacts
+the node table to the nodes of the functions still in use, renumbering them.
+
+The operations walk the diagrams with explicit stacks rather than recursion,
+so the number of variables is not limited by the recursion limit of the
+interpreter.
+
+"""
+
+FALSE = 0
+TRUE = 1
+
+# operations applied by :func:`BDD._apply`
+_AND = 0
+_OR = 1
+_DIFF = 2
+
+
+class BDD(object):
+    """A manager of the nodes of BDDs over a fixed number of variables."""
+
+    def __init__(self, num_vars):
+        """
+        :param int num_vars: The number of variables, numbered from 0 in the
+            order in which they are tested.
+
+        """
+        self.num_vars = num_vars
+        # the terminals test a variable after the last, so that comparisons
+        # of variables put them at the bottom
+        self.var = [num_vars, num_vars]
+        self.low = [FALSE, TRUE]
+        self.high = [FALSE, TRUE]
+        self._unique = {}  # (var, low, high) -> node
+        self._caches = ({}, {}, {})  # of each operation applied
+        self._not = {}
+        self._exists = {}
+        self.collections = 0
+
+    def __len__(self):
+        """The number of nodes in the node table, including the terminals."""
+        return len(self.var)
+
+    def node(self, var, low, high):
+        """Get the node testing a variable with particular children.
+
+        :param int var: The variable tested.
+        :param int low: The node for when it is false.
+        :param int high: The node for when it is true.
+        :rtype:  int
+
+        """
+        if low == high:
+            return low
+        key = (var, low, high)
+        u = self._unique.get(key)
+        if u is None:
+            u = self._unique[key] = len(self.var)
+            self.var.append(var)
+            self.low.append(low)
+            self.high.append(high)
+        return u
+
+    def variable(self, var, value=True):
+        """Get the function which is true when a variable has a value.
+
+        :param int var: The variable.
+        :param bool value: The value.
+        :rtype:  int
+
+        """
+        return self.node(var, FALSE, TRUE) if value else \
+            self.node(var, TRUE, FALSE)
+
+    def cube(self, literals):
+        """Get the conjunction of some literals.
+
+        :param dict literals: The value of each variable in the conjunction.
+        :rtype:  int
+
+        """
+        u = TRUE
+        for var in sorted(literals, reverse=True):
+            u = self.node(var, FALSE, u) if literals[var] else \
+                self.node(var, u, FALSE)
+        return u
+
+    def conj(self, u, v):
+        """Get the conjunction of two functions.
+
+        :rtype:  int
+
+        """
+        return self._apply(_AND, u, v)
+
+    def disj(self, u, v):
+        """Get the disjunction of two functions.
+
+        :rtype:  int
+
+        """
+        return self._apply(_OR, u, v)
+
+    def diff(self, u, v):
+        """Get the function true where one function is and another is not.
+
+        :rtype:  int
+
+        """
+        return self._apply(_DIFF, u, v)
+
+    def _terminal(self, op, u, v):
+        # the result of an operation if it follows without a walk, else None
+        if op == _AND:
+            if u == FALSE or v == FALSE:
+                return FALSE
+            if u == TRUE or u == v:
+                return v
+            if v == TRUE:
+                return u
+        elif op == _OR:
+            if u == TRUE or v == TRUE:
+                return TRUE
+            if u == FALSE or u == v:
+                return v
+            if v == FALSE:
+                return u
+        else:
+            if u == FALSE or u == v or v == TRUE:
+                return FALSE
+            if v == FALSE:
+                return u
+            if u == TRUE:
+                return self.neg(v)
+        return None
+
+    def _apply(self, op, u, v):
+        """Apply a binary operation to two functions, walking their diagrams
+        together. Tasks on the stack are pairs of nodes to walk, or, with the
+        variable tested, pairs whose children have been walked and whose node
+        is to be built from the last two results.
+
+        """
+        result = self._terminal(op, u, v)
+        if result is not None:
+            return result
+
+        var, low, high = self.var, self.low, self.high
+        node, terminal = self.node, self._terminal
+        cache = self._caches[op]
+        symmetric = op != _DIFF
+        results = []
+        tasks = [(u, v, None)]
+        while tasks:
+            u, v, top = tasks.pop()
+            if top is not None:
+                high_result = results.pop()
+                result = cache[u, v] = node(top, results.pop(), high_result)
+                results.append(result)
+                continue
+
+            if symmetric and u > v:
+                u, v = v, u
+            result = terminal(op, u, v)
+            if result is None:
+                result = cache.get((u, v))
+            if result is not None:
+                results.append(result)
+                continue
+
+            top = min(var[u], var[v])
+            u0, u1 = (low[u], high[u]) if var[u] == top else (u, u)
+            v0, v1 = (low[v], high[v]) if var[v] == top else (v, v)
+            tasks.append((u, v, top))
+            tasks.append((u1, v1, None))
+            tasks.append((u0, v0, None))
+        return results[0]
+
+    def neg(self, u):
+        """Get the negation of a function.
+
+        :rtype:  int
+
+        """
+        cache = self._not
+        low, high = self.low, self.high
+        stack = [u]
+        while stack:
+            w = stack[-1]
+            if w <= TRUE:
+                cache[w] = TRUE - w
+            if w in cache:
+                stack.pop()
+                continue
+            if low[w] in cache and high[w] in cache:
+                cache[w] = self.node(self.var[w], cache[low[w]],
+                                     cache[high[w]])
+                stack.pop()
+            else:
+                stack.append(low[w])
+                stack.append(high[w])
+        return cache[u]
+
+    def exists(self, u, variables):
+        """Existentially quantify variables out of a function.
+
+        :param int u: The function.
+        :param int variables: Bitset of the variables to quantify.
+        :rtype:  int
+
+        """
+        var, low, high = self.var, self.low, self.high
+        cache = self._exists
+        results = {}
+        stack = [u]
+        while stack:
+            w = stack[-1]
+            if w in results:
+                stack.pop()
+                continue
+            if w <= TRUE or not variables >> var[w]:
+                results[w] = w  # no quantified variable is tested below
+                stack.pop()
+                continue
+            result = cache.get((w, variables))
+            if result is not None:
+                results[w] = result
+                stack.pop()
+                continue
+
+            w0, w1 = low[w], high[w]
+            if w0 not in results or w1 not in results:
+                stack.append(w0)
+                stack.append(w1)
+                continue
+            if variables >> var[w] & 1:
+                result = self.disj(results[w0], results[w1])
+            else:
+                result = self.node(var[w], results[w0], results[w1])
+            results[w] = cache[w, variables] = result
+            stack.pop()
+        return results[u]
+
+    def count(self, u):
+        """Count the assignments to all of the variables which satisfy a
+        function.
+
+        :rtype:  int
+
+        """
+        var, low, high = self.var, self.low, self.high
+        # the number of satisfying assignments to the variables from the one
+        # a node tests onwards
+        counts = {FALSE: 0, TRUE: 1}
+        stack = [u]
+        while stack:
+            w = stack[-1]
+            if w in counts:
+                stack.pop()
+                continue
+            w0, w1 = low[w], high[w]
+            if w0 in counts and w1 in counts:
+                counts[w] = ((counts[w0] << (var[w0] - var[w] - 1)) +
+                             (counts[w1] << (var[w1] - var[w] - 1)))
+                stack.pop()
+            else:
+                stack.append(w0)
+                stack.append(w1)
+        return counts[u] << var[u]
+
+    def pick(self, u, mask=0, values=0):
+        """Pick an assignment which satisfies a function, in which some
+        variables have given values. Variables neither given nor tested along
+        the path found are false.
+
+        :param int u: The function.
+        :param int mask: Bitset of the variables given values.
+        :param int values: Bitset of those of them which are true.
+        :rtype:  int or None
+        :return: Bitset of the variables true in the assignment, or None if
+            no such assignment satisfies the function.
+
+        """
+        var, low, high = self.var, self.low, self.high
+
+        def options(w):
+            bit = 1 << var[w]
+            if not mask & bit:
+                return ((low[w], 0), (high[w], bit))
+            if values & bit:
+                return ((high[w], bit),)
+            return ((low[w], 0),)
+
+        if u <= TRUE:
+            return values & mask if u == TRUE else None
+        dead = set()  # nodes from which no path to the true node fits
+        # frames are [node, options, next option, variables true so far]
+        frames = [[u, options(u), 0, 0]]
+        while frames:
+            frame = frames[-1]
+            w, choices, i, bits = frame
+            if i == len(choices):
+                dead.add(w)
+                frames.pop()
+                continue
+            frame[2] = i + 1
+            child, value = choices[i]
+            if child == TRUE:
+                return bits | value | (values & mask)
+            if child != FALSE and child not in dead:
+                frames.append([child, options(child), 0, bits | value])
+        return None
+
+    def possible_values(self, u):
+        """Find the variables which are false, and those which are true, in
+        some assignment satisfying a function: those tested with a low edge,
+        or a high edge, on some path to the true node, and those skipped.
+
+        :rtype:  tuple of int
+        :return: Bitsets of the variables which can be false and of those
+            which can be true.
+
+        """
+        if u == FALSE:
+            return 0, 0
+        var, low, high = self.var, self.low, self.high
+        skipped = (1 << var[u]) - 1  # above the root
+        false = true = 0
+        seen = set()
+        stack = [u]
+        while stack:
+            u = stack.pop()
+            if u <= TRUE or u in seen:
+                continue
+            seen.add(u)
+            bit = 1 << var[u]
+            below = ~((bit << 1) - 1)  # the variables after this one
+            if low[u] != FALSE:
+                false |= bit
+                skipped |= ((1 << var[low[u]]) - 1) & below
+                stack.append(low[u])
+            if high[u] != FALSE:
+                true |= bit
+                skipped |= ((1 << var[high[u]]) - 1) & below
+                stack.append(high[u])
+        return false | skipped, true | skipped
+
+    def _reachable(self, roots):
+        # the nodes of some functions, including the terminals they reach
+        low, high = self.low, self.high
+        seen = set()
+        stack = list(roots)
+        while stack:
+            u = stack.pop()
+            if u in seen:
+                continue
+            seen.add(u)
+            if u > TRUE:
+                stack.append(low[u])
+                stack.append(high[u])
+        return seen
+
+    def size(self, u):
+        """Count the nodes of a function, including the terminals it reaches.
+
+        :rtype:  int
+
+        """
+        return len(self._reachable([u]))
+
+    def collect(self, roots):
+        """Compact the node table to the nodes of some functions, freeing all
+        others. Nodes are renumbered, keeping their order, and the caches are
+        cleared, so ids of functions other than those given are invalid
+        afterwards.
+
+        :param roots: The functions to keep.
+        :rtype:  list of int
+        :return: The new id of each function, in the order given.
+
+        """
+        roots = list(roots)
+        live = sorted(self._reachable(roots) | set([FALSE, TRUE]))
+        renumber = dict((u, i) for i, u in enumerate(live))
+        self.var = [self.var[u] for u in live]
+        self.low = [renumber[self.low[u]] for u in live]
+        self.high = [renumber[self.high[u]] for u in live]
+        self._unique = dict(
+            ((self.var[u], self.low[u], self.high[u]), u)
+            for u in range(2, len(live)))
+        self.clear_caches()
+        self.collections += 1
+        return [renumber[u] for u in roots]
+
+    def clear_caches(self):
+        """Forget the cached results of operations. The node table is kept."""
+        for cache in self._caches:
+            cache.clear()
+        self._not.clear()
+        self._exists.clear()
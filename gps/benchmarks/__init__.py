@@ -0,0 +1,10 @@
+"""
+Benchmarks for measuring how the GPS versions scale. The generators in
+:mod:`benchmarks.generators` build synthetic problems of any size, and the
+runner in :mod:`benchmarks.runner` solves them with each version, recording
+time, peak memory and nodes expanded, and compares the measurements against a
+stored baseline.
+
+Run from the gps directory with ``python -m benchmarks``.
+
+"""
@@ -0,0 +1,181 @@
+"""
+Load-generating client for the solver service of :mod:`service`, which
+measures its throughput and the latency of its responses. Requires Python 3.
+
+Each of a number of concurrent connections sends requests one after another,
+waiting for each response before sending the next, until the total number of
+requests has been sent. Requests are spread over a number of distinct solves;
+the fewer there are, the more requests the service can coalesce.
+
+Run from the gps directory, with the service running and preloading the
+problem module, with
+``python -m benchmarks.client problems/drive_to_school.py``.
+
+"""
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+
+import gps
+import service
+
+
+# node limits given to make requests distinct without limiting their solves
+DISTINCT_BASE_NODES = 10 ** 9
+
+
+def percentile(values, fraction):
+    """Get the value below which a fraction of the sorted values fall.
+
+    :param list values: The values, in ascending order.
+    :param float fraction: The fraction, from 0 to 1.
+
+    """
+    if not values:
+        return None
+    index = max(0, int(math.ceil(fraction * len(values))) - 1)
+    return values[index]
+
+
+async def _connect(host, port, path):
+    if path is not None:
+        return await asyncio.open_unix_connection(path)
+    return await asyncio.open_connection(host, port)
+
+
+async def _run_connection(requests, latencies, statuses, host, port, path):
+    reader, writer = await _connect(host, port, path)
+    try:
+        while requests:
+            request = requests.pop()
+            start = time.time()
+            writer.write(json.dumps(request).encode() + b'\n')
+            await writer.drain()
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError('service closed the connection')
+            latencies.append(time.time() - start)
+            status = json.loads(line.decode()).get('status')
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def _service_stats(host, port, path):
+    reader, writer = await _connect(host, port, path)
+    try:
+        writer.write(b'{"stats": true}\n')
+        await writer.drain()
+        return json.loads((await reader.readline()).decode())
+    finally:
+        writer.close()
+
+
+async def run_load(request, count, connections, distinct=1,
+                   host=service.DEFAULT_HOST, port=service.DEFAULT_PORT,
+                   path=None):
+    """Send requests to the service and measure its responses.
+
+    :param dict request: The request to send.
+    :param int count: The total number of requests to send.
+    :param int connections: The number of concurrent connections.
+    :param int distinct: The number of distinct solves to spread the requests
+        over.
+    :param str host: The host the service listens on.
+    :param int port: The port the service listens on.
+    :param str path: The path of the Unix socket the service listens on, if
+        it does not listen on a port.
+    :rtype:  dict
+    :return: The number of requests, the count of each response status, the
+        seconds taken, the throughput in requests per second, the median and
+        99th percentile latencies in milliseconds, and the counters of the
+        service after the run.
+
+    """
+    requests = []
+    for i in range(count):
+        variant = dict(request, id=i)
+        if distinct > 1:
+            variant['max_nodes'] = DISTINCT_BASE_NODES + i % distinct
+        requests.append(variant)
+    requests.reverse()
+
+    latencies = []
+    statuses = {}
+    start = time.time()
+    await asyncio.gather(*[
+        _run_connection(requests, latencies, statuses, host, port, path)
+        for _ in range(connections)])
+    seconds = time.time() - start
+
+    latencies.sort()
+    p50, p99 = percentile(latencies, 0.5), percentile(latencies, 0.99)
+    return {'requests': len(latencies), 'statuses': statuses,
+            'seconds': seconds,
+            'throughput': len(latencies) / seconds if seconds else None,
+            'p50_ms': None if p50 is None else p50 * 1000,
+            'p99_ms': None if p99 is None else p99 * 1000,
+            'service': await _service_stats(host, port, path)}
+
+
+def setup_parser():
+    parser = argparse.ArgumentParser(
+        description='Measure the throughput and latency of the solver '
+                    'service.')
+
+    parser.add_argument(
+        'modpath', action='store',
+        help='path of the module with the problem to request solves of')
+    parser.add_argument(
+        '--problem', action='store', default=None,
+        help='name of the problem in the module (default: the first)')
+    parser.add_argument(
+        '-i', '--implementation', action='store',
+        type=int, default=gps.DEFAULT_VERSION,
+        help='the GPS version to request (default: {})'.format(
+            gps.DEFAULT_VERSION))
+    parser.add_argument(
+        '-n', '--requests', action='store', type=int, default=1000,
+        help='total number of requests to send (default: 1000)')
+    parser.add_argument(
+        '-c', '--connections', action='store', type=int, default=8,
+        help='number of concurrent connections (default: 8)')
+    parser.add_argument(
+        '-d', '--distinct', action='store', type=int, default=1,
+        help='number of distinct solves to spread the requests over '
+             '(default: 1)')
+    parser.add_argument(
+        '--host', action='store', default=service.DEFAULT_HOST,
+        help='host of the service (default: {})'.format(service.DEFAULT_HOST))
+    parser.add_argument(
+        '--port', action='store', type=int, default=service.DEFAULT_PORT,
+        help='port of the service (default: {})'.format(service.DEFAULT_PORT))
+    parser.add_argument(
+        '--unix', action='store', default=None,
+        help='path of the Unix socket of the service instead of a port')
+
+    return parser
+
+
+def main():
+    parser = setup_parser()
+    args = parser.parse_args()
+
+    request = {'module': os.path.abspath(args.modpath),
+               'version': args.implementation}
+    if args.problem is not None:
+        request['problem'] = args.problem
+
+    results = asyncio.run(run_load(request, args.requests, args.connections,
+                                   args.distinct, args.host, args.port,
+                                   args.unix))
+    print(json.dumps(results, indent=2, sort_keys=True))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
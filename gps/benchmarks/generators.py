@@ -0,0 +1,169 @@
+"""
+Generators of synthetic problems which exercise the different ways the GPS can
+do a lot of work. Every generator takes its size parameters and returns a
+:class:`problem.Problem`; condition names are prefixed with the name of the
+problem so that problems of different shapes and sizes never share
+conditions.
+
+"""
+from lifted import LiftedProblem, Schema, atom
+from problem import Condition, Operation, Problem
+
+
+def _conditions(prefix, count):
+    return [Condition('{}-{}'.format(prefix, i)) for i in range(count)]
+
+
+def chain(length):
+    """A single long precondition chain: the goal can only be achieved by the
+    last of `length` operations, each of which requires the condition added
+    by the one before. Means-ends analysis follows a subgoal chain `length`
+    deep.
+
+    :param int length: The number of operations.
+    :rtype:  :class:`problem.Problem`
+
+    """
+    name = 'chain-{}'.format(length)
+    links = _conditions(name, length + 1)
+    ops = [Operation('{}-op-{}'.format(name, i), (links[i],), (links[i + 1],))
+           for i in range(length)]
+    return Problem((links[-1],), (links[0],), ops, name)
+
+
+def fanout(width, depth=1):
+    """A goal with `width` appropriate operations, of which only the last can
+    be applied. Each of the others leads into a dead end `depth` operations
+    deep, so the GPS backtracks `width - 1` times before it succeeds.
+
+    :param int width: The number of operations achieving the goal.
+    :param int depth: The length of each dead end.
+    :rtype:  :class:`problem.Problem`
+
+    """
+    name = 'fanout-{}x{}'.format(width, depth)
+    goal = Condition('{}-goal'.format(name))
+    start = Condition('{}-start'.format(name))
+
+    ops = []
+    for i in range(width - 1):
+        # the first condition of each dead end has no achievers
+        dead_end = _conditions('{}-dead-{}'.format(name, i), depth)
+        for j in range(depth - 1):
+            ops.append(Operation('{}-dead-{}-op-{}'.format(name, i, j),
+                                 (dead_end[j],), (dead_end[j + 1],)))
+        ops.append(Operation('{}-dead-{}'.format(name, i),
+                             (dead_end[-1],), (goal,)))
+    ops.append(Operation('{}-live'.format(name), (start,), (goal,)))
+    return Problem((goal,), (start,), ops, name)
+
+
+def clobbering(goals):
+    """Many interacting goals. Each goal is achieved by an operation which
+    consumes a shared resource (restored by a refill operation) and deletes
+    the goal before it. Achieving the goals in the order they are given
+    clobbers each previous goal, so the means-ends solvers fail, while a
+    forward search finds the plan which achieves them in reverse.
+
+    :param int goals: The number of goals.
+    :rtype:  :class:`problem.Problem`
+
+    """
+    name = 'clobbering-{}'.format(goals)
+    targets = _conditions('{}-goal'.format(name), goals)
+    resource = Condition('{}-resource'.format(name))
+    supply = Condition('{}-supply'.format(name))
+
+    ops = [Operation('{}-refill'.format(name), (supply,), (resource,))]
+    for i, target in enumerate(targets):
+        deletes = (resource, targets[i - 1]) if i else (resource,)
+        ops.append(Operation('{}-make-{}'.format(name, i), (resource,),
+                             (target,), deletes))
+    return Problem(targets, (resource, supply), ops, name)
+
+
+def cycle(length, solvable=True):
+    """A recursive subgoal cycle, like the recursive subgoal problem of the
+    "Driving to School" domain scaled up: each of `length` conditions is
+    achieved by an operation requiring the next, and the last requires the
+    first. The GPS follows the cycle all the way around before it detects the
+    loop. If solvable, the last condition has a second achiever which can be
+    applied in the initial state, listed after the one closing the cycle.
+
+    :param int length: The number of conditions in the cycle.
+    :param bool solvable: Whether to add the way out of the cycle.
+    :rtype:  :class:`problem.Problem`
+
+    """
+    name = 'cycle-{}{}'.format(length, '' if solvable else '-closed')
+    links = _conditions(name, length)
+    ops = [Operation('{}-op-{}'.format(name, i),
+                     (links[(i + 1) % length],), (links[i],))
+           for i in range(length)]
+
+    state = ()
+    if solvable:
+        start = Condition('{}-start'.format(name))
+        ops.append(Operation('{}-exit'.format(name), (start,), (links[-1],)))
+        state = (start,)
+    return Problem((links[0],), state, ops, name)
+
+
+def rooms(count):
+    """The "Monkey and Bananas" domain scaled up to `count` rooms, as a
+    lifted problem. The monkey and the chair start in the first room and the
+    bananas hang in the last. Fully ground, the domain has an operation for
+    walking and for pushing the chair between every pair of rooms, but
+    means-ends analysis only needs those into the last room.
+
+    :param int count: The number of rooms.
+    :rtype:  :class:`lifted.LiftedProblem`
+
+    """
+    name = 'rooms-{}'.format(count)
+    places = ['{}-room-{}'.format(name, i) for i in range(count)]
+
+    def predicate(base):
+        return '{}-{}'.format(name, base)
+
+    at, chair_at, bananas_at = (predicate('at'), predicate('chair-at'),
+                                predicate('bananas-at'))
+    on_floor, on_chair = predicate('on-floor'), predicate('on-chair')
+    empty_handed, has_ball = predicate('empty-handed'), predicate('has-ball')
+    has_bananas, hungry = predicate('has-bananas'), predicate('hungry')
+    not_hungry = predicate('not-hungry')
+    moves = [('?from', 'room'), ('?to', 'room')]
+
+    schemas = [
+        Schema(predicate('eat-bananas'), [], [(has_bananas,)],
+               [(empty_handed,), (not_hungry,)], [(has_bananas,), (hungry,)]),
+        Schema(predicate('grasp-bananas'), [('?room', 'room')],
+               [(bananas_at, '?room'), (on_chair, '?room'), (empty_handed,)],
+               [(has_bananas,)], [(empty_handed,)]),
+        Schema(predicate('climb-on-chair'), [('?room', 'room')],
+               [(chair_at, '?room'), (at, '?room'), (on_floor,)],
+               [(on_chair, '?room')], [(on_floor,)]),
+        Schema(predicate('push-chair'), moves,
+               [(chair_at, '?from'), (at, '?from'), (on_floor,)],
+               [(chair_at, '?to'), (at, '?to')],
+               [(chair_at, '?from'), (at, '?from')],
+               distinct=[('?from', '?to')]),
+        Schema(predicate('walk'), moves, [(at, '?from'), (on_floor,)],
+               [(at, '?to')], [(at, '?from')], distinct=[('?from', '?to')]),
+        Schema(predicate('drop-ball'), [], [(has_ball,)], [(empty_handed,)],
+               [(has_ball,)]),
+    ]
+    state = [atom(at, places[0]), atom(chair_at, places[0]),
+             atom(bananas_at, places[-1]), atom(on_floor), atom(has_ball),
+             atom(hungry)]
+    return LiftedProblem([atom(not_hungry)], state, schemas,
+                         {'room': places}, name)
+
+
+GENERATORS = {
+    'chain': chain,
+    'fanout': fanout,
+    'clobbering': clobbering,
+    'cycle': cycle,
+    'rooms': rooms,
+}
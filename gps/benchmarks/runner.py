@@ -0,0 +1,300 @@
+"""
+Runner which solves the benchmark problems with each GPS version, records how
+long each solve takes, the peak memory it allocates and the number of nodes it
+expands, and compares the measurements against a stored baseline.
+
+Times are the best of a number of repeats. Peak memory is measured in a
+separate run under :mod:`tracemalloc`, since tracing allocations slows the
+solver down; it is not measured where tracemalloc is unavailable.
+
+A baseline of the quick suite with every GPS version is kept in
+``baseline.json`` beside this module. Run from the gps directory, compare
+against it with ``python -m benchmarks -i 1 2 3 4 5 6 7 -b
+benchmarks/baseline.json``. Times and memory depend on the machine and the
+Python version, so on other hardware record a baseline of your own first by
+running the same command with ``--save`` in place of ``-b``, and regenerate the
+committed one the same way when a change is meant to alter the measurements.
+
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+import gps
+from benchmarks.generators import GENERATORS
+
+
+# (case name, generator name, generator arguments)
+QUICK_SUITE = (
+    ('chain-100', 'chain', (100,)),
+    ('chain-1000', 'chain', (1000,)),
+    ('fanout-100', 'fanout', (100, 3)),
+    ('fanout-1000', 'fanout', (1000, 3)),
+    ('clobbering-10', 'clobbering', (10,)),
+    ('clobbering-100', 'clobbering', (100,)),
+    ('cycle-100', 'cycle', (100,)),
+    ('cycle-1000', 'cycle', (1000,)),
+    ('rooms-100', 'rooms', (100,)),
+)
+
+FULL_SUITE = QUICK_SUITE + (
+    ('chain-10000', 'chain', (10000,)),
+    ('chain-100000', 'chain', (100000,)),
+    ('fanout-10000', 'fanout', (10000, 3)),
+    ('clobbering-1000', 'clobbering', (1000,)),
+    ('clobbering-10000', 'clobbering', (10000,)),
+    ('cycle-10000', 'cycle', (10000,)),
+    ('cycle-100000', 'cycle', (100000,)),
+    ('rooms-1000', 'rooms', (1000,)),
+)
+
+SUITES = {'quick': QUICK_SUITE, 'full': FULL_SUITE}
+
+# the committed baseline, relative to the gps directory
+BASELINE_PATH = os.path.join('benchmarks', 'baseline.json')
+
+DEFAULT_VERSIONS = (1, 2, 3)
+
+# a measurement regresses if it exceeds the baseline by more than the
+# tolerance; times must also differ by more than MIN_SECONDS to count, so
+# that noise in short solves, which on a busy machine can take several times
+# as long from one run to the next, is ignored
+DEFAULT_TOLERANCE = 0.25
+MIN_SECONDS = 0.05
+
+
+def measure(generator, args, version, repeat=3, timeout=None):
+    """Solve a generated problem with one GPS version and measure the solve.
+
+    :param function generator: The problem generator.
+    :param tuple args: The arguments to generate the problem with.
+    :param int version: The version of GPS to use.
+    :param int repeat: The number of timed solves to take the best of.
+    :param float timeout: Number of seconds after which to give up on each
+        solve.
+    :rtype:  dict
+    :return: The status, plan length, nodes expanded, best number of seconds
+        and peak memory in KiB (None if not measured) of the solve. Solvers
+        which fail with an exception, like the recursive versions on very
+        deep problems, have status "ERROR".
+
+    """
+    record = {'status': None, 'plan_length': None, 'expanded': None,
+              'seconds': None, 'peak_kib': None}
+
+    # each solve gets a fresh problem, so that operations ground lazily by
+    # one solve of a lifted problem are not reused by the next
+    try:
+        best = None
+        for _ in range(repeat):
+            result = gps.init_gps(version).run(generator(*args), timeout)
+            if best is None or result.seconds < best:
+                best = result.seconds
+            if result.status == "TIMEOUT":
+                break  # no point repeating
+    except (RuntimeError, MemoryError) as err:  # includes RecursionError
+        record['status'] = 'ERROR'
+        record['error'] = '{}: {}'.format(type(err).__name__, err)
+        return record
+
+    record['status'] = result.status
+    record['plan_length'] = len(result.plan)
+    record['expanded'] = result.expanded
+    record['seconds'] = best
+
+    if tracemalloc is not None and result.status != "TIMEOUT":
+        # the problem and solver are built first, so that only the memory
+        # allocated by the solve itself is counted
+        problem = generator(*args)
+        solver = gps.init_gps(version)
+        tracemalloc.start()
+        try:
+            solver.run(problem, timeout)
+            record['peak_kib'] = tracemalloc.get_traced_memory()[1] // 1024
+        finally:
+            tracemalloc.stop()
+
+    return record
+
+
+def run_suite(suite, versions=DEFAULT_VERSIONS, repeat=3, timeout=None):
+    """Measure every case of a suite with every GPS version.
+
+    :param suite: The (case name, generator name, generator arguments) of
+        each case.
+    :param versions: The GPS versions to measure.
+    :param int repeat: The number of timed solves to take the best of.
+    :param float timeout: Number of seconds after which to give up on each
+        solve.
+    :rtype:  generator of dict
+    :return: The measurements of :func:`measure`, along with the case name
+        and the version.
+
+    """
+    for case, generator_name, args in suite:
+        for version in versions:
+            logging.info('measuring {} with version {}'.format(case, version))
+            record = measure(GENERATORS[generator_name], args, version,
+                             repeat, timeout)
+            record['case'] = case
+            record['version'] = version
+            yield record
+
+
+def _key(record):
+    return '{}/v{}'.format(record['case'], record['version'])
+
+
+def compare(record, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Compare a measurement against its baseline. A change of status is a
+    regression, except that a solve which timed out in the baseline may now
+    finish without an error. The nodes expanded and the time taken are not
+    compared where either solve timed out, since they depend only on how far
+    the solve got before the timeout.
+
+    :param dict record: The measurement.
+    :param dict baseline: The baseline measurement of the same case and
+        version.
+    :param float tolerance: The fraction by which time and memory may exceed
+        the baseline.
+    :rtype:  list of str
+    :return: Descriptions of the regressions found, if any.
+
+    """
+    regressions = []
+    if record['status'] != baseline['status'] and \
+            (baseline['status'] != "TIMEOUT" or record['status'] == "ERROR"):
+        regressions.append('status {} was {}'.format(
+            record['status'], baseline['status']))
+        return regressions
+    if "TIMEOUT" in (record['status'], baseline['status']):
+        return regressions
+
+    if (record['expanded'] is not None and baseline['expanded'] is not None
+            and record['expanded'] > baseline['expanded']):
+        regressions.append('expanded {} was {}'.format(
+            record['expanded'], baseline['expanded']))
+
+    seconds, base_seconds = record['seconds'], baseline['seconds']
+    if (seconds is not None and base_seconds is not None and
+            seconds > base_seconds * (1 + tolerance) and
+            seconds - base_seconds > MIN_SECONDS):
+        regressions.append('seconds {:.4f} was {:.4f}'.format(
+            seconds, base_seconds))
+
+    peak, base_peak = record['peak_kib'], baseline['peak_kib']
+    if (peak is not None and base_peak is not None and
+            peak > base_peak * (1 + tolerance)):
+        regressions.append('peak_kib {} was {}'.format(peak, base_peak))
+
+    return regressions
+
+
+def load_baseline(path):
+    """Load a baseline saved by :func:`save_baseline`.
+
+    :rtype:  dict
+    :return: The measurements, keyed by case and version.
+
+    """
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path, records):
+    """Save measurements as the baseline to compare future runs against.
+
+    :param str path: The path of the baseline file.
+    :param list records: The measurements.
+
+    """
+    baseline = dict((_key(record), record) for record in records)
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def format_record(record):
+    seconds = record['seconds']
+    return '{:<18}v{:<3}{:<10}{:>8}{:>10}{:>12}{:>10}'.format(
+        record['case'], record['version'], record['status'],
+        '-' if record['plan_length'] is None else record['plan_length'],
+        '-' if record['expanded'] is None else record['expanded'],
+        '-' if seconds is None else '{:.4f}'.format(seconds),
+        '-' if record['peak_kib'] is None else record['peak_kib'])
+
+
+def setup_parser():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the GPS versions on generated problems.')
+
+    parser.add_argument(
+        '-s', '--suite', action='store', choices=sorted(SUITES),
+        default='quick',
+        help='the set of problems to benchmark (default: quick)')
+    parser.add_argument(
+        '-i', '--implementation', action='store', type=int, nargs='+',
+        default=list(DEFAULT_VERSIONS),
+        help='the GPS versions to benchmark (default: {})'.format(
+            ' '.join(map(str, DEFAULT_VERSIONS))))
+    parser.add_argument(
+        '-r', '--repeat', action='store', type=int, default=3,
+        help='number of timed solves to take the best of (default: 3)')
+    parser.add_argument(
+        '-t', '--timeout', action='store', type=float, default=30.0,
+        help='number of seconds to allow for each solve (default: 30)')
+    parser.add_argument(
+        '-b', '--baseline', action='store', default=None,
+        help='baseline file to compare against, like {}; exits with status '
+             '1 if any measurement regressed'.format(BASELINE_PATH))
+    parser.add_argument(
+        '--save', action='store', default=None,
+        help='file to save the measurements to as a new baseline')
+    parser.add_argument(
+        '--tolerance', action='store', type=float,
+        default=DEFAULT_TOLERANCE,
+        help='fraction by which time and memory may exceed the baseline '
+             '(default: {})'.format(DEFAULT_TOLERANCE))
+    parser.add_argument(
+        '-v', '--verbose', action='store_true',
+        help='print verbose output to console')
+
+    return parser
+
+
+def main():
+    parser = setup_parser()
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+
+    # the recursive versions need a deep stack on the deeper problems; they
+    # are recorded as errors where they exceed it anyway
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+
+    baseline = load_baseline(args.baseline) if args.baseline else {}
+
+    print('{:<18}{:<4}{:<10}{:>8}{:>10}{:>12}{:>10}'.format(
+        'case', 'ver', 'status', 'plan', 'expanded', 'seconds', 'peak_kib'))
+    records = []
+    regressed = False
+    for record in run_suite(SUITES[args.suite], args.implementation,
+                            args.repeat, args.timeout):
+        records.append(record)
+        print(format_record(record))
+        if _key(record) in baseline:
+            for regression in compare(record, baseline[_key(record)],
+                                      args.tolerance):
+                regressed = True
+                print('  REGRESSION: {}'.format(regression))
+        sys.stdout.flush()
+
+    if args.save:
+        save_baseline(args.save, records)
+
+    return 1 if regressed else 0
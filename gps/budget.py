@@ -0,0 +1,121 @@
+"""
+Budgets bound the work a GPS may do on a single problem. A budget limits the
+wall-clock time and the number of search nodes the solver may expand, and it
+can be cancelled cooperatively from elsewhere (another thread, a signal
+handler or another process) through a :class:`CancelToken`.
+
+Solvers charge the budget once for every node they expand. Running out of
+budget raises :class:`BudgetExceeded`, which unwinds the search; the solver
+then reports the status carried by the exception along with the best partial
+plan it had found.
+
+"""
+import time
+
+
+# statuses reported when a budget runs out
+TIMEOUT = "TIMEOUT"
+EXHAUSTED = "EXHAUSTED"
+CANCELLED = "CANCELLED"
+
+# number of nodes expanded between checks of the clock and the cancel token
+CHECK_INTERVAL = 64
+
+clock = getattr(time, 'monotonic', time.time)
+
+
+class BudgetExceeded(Exception):
+    """Raise when a solver runs out of budget."""
+
+    def __init__(self, status):
+        """
+        :param str status: TIMEOUT, EXHAUSTED or CANCELLED.
+
+        """
+        super(BudgetExceeded, self).__init__(status)
+        self.status = status
+
+
+class CancelToken(object):
+    """Flag for cooperatively cancelling a running solve. Cancellation takes
+    effect the next time the solver checks its budget.
+
+    """
+
+    def __init__(self, event=None):
+        """
+        :param event: An event, like a :class:`multiprocessing.Event`,
+            through which solves in other processes may be cancelled too. The
+            token is cancelled once the event is set.
+
+        """
+        self.event = event
+        self._cancelled = False
+
+    @property
+    def cancelled(self):
+        return self._cancelled or (self.event is not None and
+                                   self.event.is_set())
+
+    def cancel(self):
+        """Request that any solve using this token stop."""
+        self._cancelled = True
+        if self.event is not None:
+            self.event.set()
+
+
+class Budget(object):
+    """Limits on the time and nodes a single solve may use. The budget also
+    counts the nodes expanded, whether or not they are limited.
+
+    """
+
+    def __init__(self, timeout=None, max_nodes=None, cancel=None,
+                 check_interval=CHECK_INTERVAL):
+        """
+        :param float timeout: Number of seconds, from now, after which to
+            stop. By default time is not limited.
+        :param int max_nodes: The maximum number of nodes to expand. By
+            default nodes are not limited.
+        :type  cancel: :class:`CancelToken`
+        :param cancel: Token through which the solve may be cancelled.
+        :param int check_interval: Number of nodes expanded between checks
+            of the clock and the cancel token. The node limit is exact.
+
+        """
+        self.deadline = None if timeout is None else clock() + timeout
+        self.max_nodes = max_nodes
+        self.cancel = cancel
+        self.check_interval = check_interval
+        self.nodes = 0
+        self._next_check = 0
+
+    def charge(self):
+        """Account for the expansion of one node.
+
+        :raise BudgetExceeded: If the budget has run out.
+
+        """
+        if self.nodes >= self._next_check:
+            self.check()
+        self.nodes += 1
+
+    def check(self):
+        """Check whether the budget has run out.
+
+        :raise BudgetExceeded: If the solve was cancelled, max_nodes nodes
+            have already been expanded or the deadline has passed.
+
+        """
+        if self.cancel is not None and self.cancel.cancelled:
+            raise BudgetExceeded(CANCELLED)
+
+        next_check = self.nodes + self.check_interval
+        if self.max_nodes is not None:
+            if self.nodes >= self.max_nodes:
+                raise BudgetExceeded(EXHAUSTED)
+            next_check = min(next_check, self.max_nodes)
+        self._next_check = next_check
+
+        if self.deadline is not None and clock() >= self.deadline:
+            raise BudgetExceeded(TIMEOUT)
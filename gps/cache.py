@@ -0,0 +1,126 @@
+"""
+A persistent on-disk cache of compiled problems. Importing a problem module
+executes it and builds every :class:`problem.Problem` in it, including the
+condition sets and operator indexes. The cache stores the resulting problems in
+a binary pickle so that repeated runs against the same module skip both steps.
+
+Entries are keyed by the absolute path of the module and are only used while
+the module's modification time and content hash match those recorded in the
+entry.
+
+"""
+import os
+import pickle
+import hashlib
+import logging
+import tempfile
+
+from problem import Condition
+
+
+CACHE_FORMAT = 3
+DEFAULT_DIRECTORY = os.path.join('~', '.cache', 'gps')
+
+
+def content_hash(path):
+    """Compute the SHA-1 hex digest of the content of a file.
+
+    :param str path: The path of the file to hash.
+    :rtype:  str
+
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ProblemCache(object):
+    """Cache of the problems found in problem modules."""
+
+    def __init__(self, directory=None):
+        """
+        :param str directory: The directory to store cache entries in. Defaults
+            to $GPS_CACHE_DIR, or ~/.cache/gps if that is not set.
+
+        """
+        if directory is None:
+            directory = os.environ.get('GPS_CACHE_DIR', DEFAULT_DIRECTORY)
+        self.directory = os.path.expanduser(directory)
+
+    def entry_path(self, modpath):
+        """Get the path of the cache entry for a module.
+
+        :param str modpath: The path of the module.
+        :rtype:  str
+
+        """
+        key = hashlib.sha1(os.path.abspath(modpath).encode('utf-8'))
+        return os.path.join(self.directory, key.hexdigest() + '.pickle')
+
+    def _key(self, modpath):
+        return (CACHE_FORMAT, os.path.abspath(modpath),
+                os.path.getmtime(modpath), content_hash(modpath))
+
+    def load(self, modpath):
+        """Load the problems cached for a module.
+
+        :param str modpath: The path of the module.
+        :rtype:  list of (str, :class:`problem.Problem`) or None
+        :return: The (attribute name, problem) pairs stored for the module, or
+            None if there is no entry or the entry is stale or unreadable.
+
+        """
+        try:
+            with open(self.entry_path(modpath), 'rb') as f:
+                header = pickle.load(f)
+                if header['key'] != self._key(modpath):
+                    return None
+
+                # intern conditions in their original order so that they are
+                # assigned the same relative ids as when the entry was stored
+                for name in header['conditions']:
+                    Condition(name)
+                return pickle.load(f)
+        except Exception as err:  # missing, stale or incompatible entry
+            logging.debug('cache miss for {}: {}'.format(modpath, err))
+            return None
+
+    def store(self, modpath, instances):
+        """Store the problems found in a module.
+
+        :param str modpath: The path of the module.
+        :type  instances: list of (str, :class:`problem.Problem`)
+        :param instances: The (attribute name, problem) pairs to store.
+
+        """
+        conditions = set()
+        for _, problem in instances:
+            conditions.update(problem.state)
+            conditions.update(problem.goals)
+            for op in problem.ops:
+                conditions.update(op.preconditions)
+                conditions.update(op.add_list)
+                conditions.update(op.del_list)
+
+        header = {
+            'key': self._key(modpath),
+            'conditions': [cond.name for cond in
+                           sorted(conditions, key=lambda cond: cond.id)]
+        }
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        # write to a temporary file and rename it so that concurrent readers
+        # never see a partially written entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(header, f, pickle.HIGHEST_PROTOCOL)
+                pickle.dump(instances, f, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp_path, self.entry_path(modpath))
+        except Exception:
+            os.remove(tmp_path)
+            raise
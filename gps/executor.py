@@ -0,0 +1,356 @@
+"""
+Validation and execution of plans.
+
+A plan found by a solver is only a sequence of operations; nothing guarantees
+that the preconditions of each hold when it is reached, or that the goals hold
+at the end. :func:`validate` replays a plan from a start state and reports the
+first step whose preconditions do not hold, or the goals left unmet.
+
+To validate many plans against many start states, each plan is first compiled
+to a :class:`CompiledPlan`: the bitset of the conditions it needs from the
+start state, and the bitsets of the conditions it leaves set and cleared.
+Checking a compiled plan against a start state then takes a few integer
+operations, however long the plan is.
+
+An :class:`ExecutionPipeline` executes plans in a background thread, calling
+:func:`problem.Operation.execute` on each operation and then any callbacks,
+so that slow side effects do not block the solver which submitted them.
+
+"""
+import threading
+
+try:
+    import queue
+except ImportError:  # Python 2
+    import Queue as queue
+
+from problem import BitState, Condition, bitmask
+from tracing import NULL_TRACER
+
+
+class ValidationResult(object):
+    """The outcome of validating a plan."""
+
+    def __init__(self, step=None, op=None, missing=0, unmet=0):
+        """
+        :param int step: The index of the first operation whose
+            preconditions do not hold, if any.
+        :type  op: :class:`problem.Operation`
+        :param op: That operation.
+        :param int missing: Bitset of its preconditions which do not hold.
+        :param int unmet: Bitset of the goals which do not hold after the
+            plan, if it could be executed.
+
+        """
+        self.step = step
+        self.op = op
+        self.missing = missing
+        self.unmet = unmet
+
+    @property
+    def executable(self):
+        return self.step is None
+
+    @property
+    def valid(self):
+        return self.step is None and not self.unmet
+
+    def missing_conditions(self):
+        """Get the preconditions which do not hold at the failed step.
+
+        :rtype:  list of :class:`problem.Condition`
+
+        """
+        return list(Condition.from_bits(self.missing))
+
+    def unmet_goals(self):
+        """Get the goals which do not hold after the plan.
+
+        :rtype:  list of :class:`problem.Condition`
+
+        """
+        return list(Condition.from_bits(self.unmet))
+
+    def __bool__(self):
+        return self.valid
+
+    __nonzero__ = __bool__  # Python 2
+
+    def __repr__(self):
+        if self.step is not None:
+            return 'ValidationResult(step {} {} missing {})'.format(
+                self.step, self.op, self.missing_conditions())
+        if self.unmet:
+            return 'ValidationResult(unmet {})'.format(self.unmet_goals())
+        return 'ValidationResult(valid)'
+
+
+def _bits(state):
+    return state.bits if isinstance(state, BitState) else bitmask(state)
+
+
+def validate(plan, state, goals=()):
+    """Replay a plan from a start state, checking the preconditions of each
+    operation before applying it, and then check the goals.
+
+    :type  plan: sequence of :class:`problem.Operation`
+    :param plan: The plan to validate.
+    :type  state: collection of :class:`problem.Condition` or
+        :class:`problem.BitState`
+    :param state: The state the plan is executed from.
+    :type  goals: collection of :class:`problem.Condition`
+    :param goals: The conditions which must hold after the plan.
+    :rtype:  :class:`ValidationResult`
+
+    """
+    bits = _bits(state)
+    for step, op in enumerate(plan):
+        missing = op.pre_mask & ~bits
+        if missing:
+            return ValidationResult(step, op, missing)
+        bits = (bits & ~op.del_mask) | op.add_mask
+    return ValidationResult(unmet=bitmask(goals) & ~bits)
+
+
+def validate_solution(problem, plan):
+    """Validate a plan as a solution of a problem, from its initial state.
+
+    :type  problem: :class:`problem.Problem`
+    :type  plan: sequence of :class:`problem.Operation`
+    :rtype:  :class:`ValidationResult`
+
+    """
+    return validate(plan, problem.state, problem.goals)
+
+
+class CompiledPlan(object):
+    """A plan reduced to its effect on the bits of a state. A plan can be
+    executed from a state if and only if the state holds every condition in
+    `required`; it then leaves the conditions in `added` set and those in
+    `cleared` unset, and the others as they were.
+
+    """
+
+    __slots__ = ('plan', 'required', 'added', 'cleared', 'blocked')
+
+    def __init__(self, plan):
+        """
+        :type  plan: sequence of :class:`problem.Operation`
+        :param plan: The plan to compile.
+
+        """
+        self.plan = tuple(plan)
+        required = added = cleared = 0
+        blocked = None
+        for step, op in enumerate(self.plan):
+            pre = op.pre_mask
+            if pre & cleared and blocked is None:
+                # a precondition was deleted by an earlier step, so the plan
+                # cannot be executed from any state
+                blocked = step
+            required |= pre & ~added & ~cleared
+            added = (added & ~op.del_mask) | op.add_mask
+            cleared = (cleared | op.del_mask) & ~op.add_mask
+        self.required = required
+        self.added = added
+        self.cleared = cleared
+        self.blocked = blocked  # step no start state can get past, if any
+
+    def executable(self, bits):
+        """Determine if the plan can be executed from a state.
+
+        :param int bits: Bitset of the start state.
+        :rtype:  bool
+
+        """
+        return self.blocked is None and bits & self.required == self.required
+
+    def result(self, bits):
+        """Get the state the plan leaves, if executed from a state.
+
+        :param int bits: Bitset of the start state.
+        :rtype:  int
+
+        """
+        return (bits & ~self.cleared) | self.added
+
+    def achieves(self, bits, goal_mask):
+        """Determine if the plan can be executed from a state and leaves all
+        of the goals holding.
+
+        :param int bits: Bitset of the start state.
+        :param int goal_mask: Bitset of the goals.
+        :rtype:  bool
+
+        """
+        return (self.executable(bits) and
+                self.result(bits) & goal_mask == goal_mask)
+
+
+def validate_batch(plans, states, goals=()):
+    """Validate every plan from every start state.
+
+    :type  plans: sequence of sequence of :class:`problem.Operation` or of
+        :class:`CompiledPlan`
+    :param plans: The plans to validate.
+    :type  states: sequence of collection of :class:`problem.Condition` or of
+        :class:`problem.BitState`
+    :param states: The start states.
+    :type  goals: collection of :class:`problem.Condition`
+    :param goals: The conditions which must hold after each plan.
+    :rtype:  list of list of bool
+    :return: For each plan, whether it is valid from each start state.
+
+    """
+    goal_mask = bitmask(goals)
+    starts = [_bits(state) for state in states]
+    results = []
+    for plan in plans:
+        if not isinstance(plan, CompiledPlan):
+            plan = CompiledPlan(plan)
+        if plan.blocked is not None:
+            results.append([False] * len(starts))
+            continue
+
+        required, added, cleared = plan.required, plan.added, plan.cleared
+        results.append([
+            bits & required == required and
+            ((bits & ~cleared) | added) & goal_mask == goal_mask
+            for bits in starts])
+    return results
+
+
+class Execution(object):
+    """A plan submitted to an :class:`ExecutionPipeline`, which can be waited
+    on for the outcome of its execution.
+
+    """
+
+    def __init__(self, plan, state):
+        self.plan = plan
+        self.state = state
+        self.steps = 0  # operations executed so far
+        self.validation = None
+        self.error = None
+        self._done = threading.Event()
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Wait for the execution to finish.
+
+        :param float timeout: Number of seconds after which to stop waiting.
+        :rtype:  bool
+        :return: True if the execution finished, else False.
+
+        """
+        self._done.wait(timeout)
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        """Wait for the execution to finish and get its validation result.
+
+        :param float timeout: Number of seconds after which to stop waiting.
+        :rtype:  :class:`ValidationResult`
+        :raise RuntimeError: If the execution did not finish in time.
+        :raise Exception: Whatever an operation or callback raised.
+
+        """
+        if not self.wait(timeout):
+            raise RuntimeError('execution did not finish in time')
+        if self.error is not None:
+            raise self.error
+        return self.validation
+
+
+class ExecutionPipeline(object):
+    """Executes plans one after another in a background thread. Each plan is
+    validated before any of it is executed; a plan which fails validation is
+    not executed at all. Each operation is then executed on the state of the
+    plan with :func:`problem.Operation.execute`, after which every callback
+    is called with the operation, its index in the plan and the state.
+
+    """
+
+    def __init__(self, callbacks=(), tracer=None):
+        """
+        :param callbacks: Functions to call as callback(op, step, state)
+            after each operation is executed.
+        :type  tracer: :class:`tracing.Tracer`
+        :param tracer: The tracer to record the executions with. By default
+            nothing is recorded.
+
+        """
+        self.callbacks = list(callbacks)
+        self.tracer = NULL_TRACER if tracer is None else tracer
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run,
+                                        name='gps-executor')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, plan, state, goals=()):
+        """Queue a plan for execution, returning without waiting for it.
+
+        :type  plan: sequence of :class:`problem.Operation`
+        :param plan: The plan to execute.
+        :type  state: set of :class:`problem.Condition` or
+            :class:`problem.BitState`
+        :param state: The state to execute the plan on, which is altered in
+            place as each operation is executed.
+        :type  goals: collection of :class:`problem.Condition`
+        :param goals: The conditions which must hold after the plan.
+        :rtype:  :class:`Execution`
+
+        """
+        execution = Execution(tuple(plan), state)
+        self._queue.put((execution, goals))
+        return execution
+
+    def submit_solution(self, problem, plan):
+        """Queue a solution of a problem for execution on a copy of its
+        initial state.
+
+        :rtype:  :class:`Execution`
+
+        """
+        return self.submit(plan, problem.state.copy(), problem.goals)
+
+    def close(self, wait=True):
+        """Stop the pipeline once the plans already submitted are executed.
+
+        :param bool wait: Whether to wait for them.
+
+        """
+        self._queue.put(None)
+        if wait:
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            execution, goals = item
+            try:
+                self._execute(execution, goals)
+            except Exception as err:
+                execution.error = err
+            finally:
+                execution._done.set()
+
+    def _execute(self, execution, goals):
+        validation = validate(execution.plan, execution.state, goals)
+        execution.validation = validation
+        if not validation:
+            if self.tracer.enabled:
+                self.tracer.trace('Not executing invalid plan: {}',
+                                  validation)
+            return
+
+        for step, op in enumerate(execution.plan):
+            op.execute(execution.state, self.tracer)
+            for callback in self.callbacks:
+                callback(op, step, execution.state)
+            execution.steps = step + 1
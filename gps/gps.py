@@ -4,29 +4,155 @@ Adapted from ch. 4 of Peter Norvig's "Paradigms of Artificial Intelligence
 Programming."
 
 """
-MAX_VERSION = 2
-
-
-def init_gps(version):
-    if version == 1:
-        return GPSv1()
-    elif version == 2:
-        return GPSv2()
-    else:
+import time
+import heapq
+import itertools
+
+from budget import Budget, BudgetExceeded
+from heuristics import (RelaxedProblem, VectorRelaxedProblem, HEURISTICS,
+                        VECTOR_HEURISTICS)
+from graphplan import PlanningGraph
+from memo import TranspositionTable
+from problem import BitState, Condition, TrailState, bitmask
+from sas import Translation
+from stats import SolveStats, PhaseTimer
+from symbolic import SymbolicSearch
+from tracing import NULL_TRACER
+
+MAX_VERSION = 7
+DEFAULT_VERSION = 3
+DEFAULT_MEMO_SIZE = 100000
+
+# longest sequence of simulated operations memoized for a single subgoal; this
+# keeps the memo linear in the depth of long subgoal chains
+MEMO_MAX_OPS = 256
+
+
+def solver_class(version):
+    """Look up the GPS class implementing a particular version.
+
+    :param int version: The version of GPS.
+    :rtype:  type
+    :raise NotImplementedError: If there is no such version.
+
+    """
+    try:
+        return SOLVERS[version]
+    except KeyError:
         raise NotImplementedError(
             'Version {} GPS has not been implemented.'.format(version))
 
 
+def init_gps(version, **kwargs):
+    return solver_class(version)(**kwargs)
+
+
+class SolveResult(object):
+    """The outcome of a call to :func:`GPS.run`."""
+
+    def __init__(self, status, plan, expanded, seconds, stats=None):
+        """
+        :param str status: "SUCCESS", "FAILURE", or the status reported when
+            the budget ran out: "TIMEOUT", "EXHAUSTED" or "CANCELLED".
+        :type  plan: list of :class:`problem.Operation`
+        :param plan: The solution, or the best partial plan found if the
+            problem was not solved.
+        :param int expanded: The number of search nodes expanded.
+        :param float seconds: The number of seconds spent solving.
+        :type  stats: :class:`stats.SolveStats`
+        :param stats: The counters and phase timings of the solve.
+
+        """
+        self.status = status
+        self.plan = plan
+        self.expanded = expanded
+        self.seconds = seconds
+        self.stats = SolveStats() if stats is None else stats
+
+    @property
+    def solved(self):
+        return self.status == "SUCCESS"
+
+    def __str__(self):
+        return self.status
+
+    def __repr__(self):
+        return 'SolveResult({!r}, {} ops, expanded={}, seconds={:.3f})'.format(
+            self.status, len(self.plan), self.expanded, self.seconds)
+
+
 class GPS(object):
     """Template class for the general problem solver."""
 
     version = 0
 
-    def solve(self, problem):
+    # methods timed by :class:`stats.PhaseTimer`
+    PHASES = ()
+
+    def __init__(self, tracer=None):
+        """
+        :type  tracer: :class:`tracing.Tracer`
+        :param tracer: The tracer to record reasoning output with. By default
+            nothing is recorded.
+
+        """
+        self.tracer = NULL_TRACER if tracer is None else tracer
+        self.budget = Budget()
+        self.stats = SolveStats()
+
+    def solve(self, problem, budget=None):
         """Solve a particular problem using means-ends analysis.
 
         :type  problem: :class:`problem.Problem`
         :param problem: The problem to solve.
+        :type  budget: :class:`budget.Budget`
+        :param budget: The limits on the work to do. By default there are
+            none.
+
+        """
+        raise NotImplementedError('Subclasses should override this method.')
+
+    def run(self, problem, timeout=None, max_nodes=None, cancel=None,
+            timed=False, profiler=None):
+        """Solve a particular problem within a budget, stopping early rather
+        than searching indefinitely.
+
+        :type  problem: :class:`problem.Problem`
+        :param problem: The problem to solve.
+        :param float timeout: Number of seconds after which to stop.
+        :param int max_nodes: The maximum number of nodes to expand.
+        :type  cancel: :class:`budget.CancelToken`
+        :param cancel: Token through which the solve may be cancelled.
+        :param bool timed: Whether to time each of the PHASES of the solver.
+        :param profiler: A profiler to enable for the duration of the solve,
+            such as a :class:`cProfile.Profile`.
+        :rtype:  :class:`SolveResult`
+
+        """
+        budget = Budget(timeout, max_nodes, cancel)
+        timer = PhaseTimer(self, self.PHASES if timed else ())
+        start = time.time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            with timer:
+                status = self.solve(problem, budget) or "FAILURE"
+        finally:
+            if profiler is not None:
+                profiler.disable()
+        seconds = time.time() - start
+
+        self.stats.phases = timer.timings()
+        return SolveResult(status, self.plan(), budget.nodes, seconds,
+                           self.stats)
+
+    def plan(self):
+        """Get the solution found by the last call to :func:`solve`.
+
+        :rtype:  list of :class:`problem.Operation`
+        :return: The operations of the solution, in the order they are to be
+            applied. If the problem was not solved, these are the operations
+            for the goals achieved before the solver gave up.
 
         """
         raise NotImplementedError('Subclasses should override this method.')
@@ -76,22 +202,53 @@ class GPS(object):
         """
         return goal in op.add_list
 
+    def appropriate_ops(self, goal):
+        """Find all operations appropriate for solving some goal in the
+        problem currently being solved.
+
+        :type  goal: :class:`problem.Condition`
+        :param goal: The goal we are trying to achieve.
+        :rtype:  sequence of :class:`problem.Operation`
+        :return: The operations which have goal in their add-list.
+
+        """
+        return self.problem.achievers(goal)
+
 
 class GPSv1(GPS):
     """Version 1 general problem solver."""
 
     version = 1
 
-    def solve(self, problem):
+    PHASES = ('achieve_all', 'achieve', 'apply_op')
+
+    def solve(self, problem, budget=None):
         """Solve a particular problem using means-ends analysis.
 
         :type  problem: :class:`problem.Problem`
         :param problem: The problem to solve.
+        :type  budget: :class:`budget.Budget`
+        :param budget: The limits on the work to do. By default there are
+            none.
 
         """
+        self.problem = problem
         self.state = problem.state.copy()
-        self.ops = problem.ops.copy()
-        return self.achieve_all(problem.goals)
+        self.applied_ops = []
+        self.budget = Budget() if budget is None else budget
+        self.stats = SolveStats()
+        try:
+            return self.achieve_all(problem.goals)
+        except BudgetExceeded as exc:
+            return exc.status
+
+    def plan(self):
+        """Get the operations applied by the last call to :func:`solve`.
+
+        :rtype:  list of :class:`problem.Operation`
+
+        """
+        return list(self.applied_ops)
 
     def achieve_all(self, goals):
         """Attempt to achieve each goal in the set of goals.
@@ -117,16 +274,19 @@ class GPSv1(GPS):
         :return: True if the goal was achieved, else False.
 
         """
+        self.stats.goals += 1
+
         # case 1: base case (goal is in current state)
         if goal in self.state:
             return True
 
         # case 2: there exists some set of operations to put the goal in
         # the current state
-        for op in self.ops:
-            if self.is_appropriate(op, goal):
-                self.apply_op(op)
-                return True
+        self.budget.charge()
+        self.stats.searched += 1
+        for op in self.appropriate_ops(goal):
+            self.apply_op(op)
+            return True
 
         return False
 
@@ -138,8 +298,11 @@ class GPSv1(GPS):
         :param op: The operation to apply.
 
         """
+        self.stats.ops_considered += 1
         if (all(map(self.achieve, op.preconditions))):
-            op.execute(self.state)
+            op.execute(self.state, self.tracer)
+            self.applied_ops.append(op)
+            self.stats.ops_simulated += 1
 
 
 class GPSv2(GPS):
@@ -147,21 +310,48 @@ class GPSv2(GPS):
 
     version = 2
 
-    def __init__(self):
+    PHASES = ('achieve_all', 'achieve', 'simulate_op',
+              'clobbers_previous_goals', 'apply_solution')
+
+    def __init__(self, tracer=None, memo_size=DEFAULT_MEMO_SIZE,
+                 library=None):
+        """
+        :type  tracer: :class:`tracing.Tracer`
+        :param tracer: The tracer to record reasoning output with. By default
+            nothing is recorded.
+        :param int memo_size: The maximum number of subgoal outcomes to
+            memoize during a solve. Pass 0 to disable memoization.
+        :type  library: :class:`library.PlanLibrary`
+        :param library: The library of subplans to try for each goal before
+            searching, and to record the subplans of each solution in. By
+            default none is used.
+
+        """
+        super(GPSv2, self).__init__(tracer)
+        self.memo = TranspositionTable(memo_size) if memo_size else None
+        self.library = library
         self.reset()
 
-    def solve(self, problem):
+    def solve(self, problem, budget=None):
         """Solve a particular problem using means-ends analysis.
 
         :type  problem: :class:`problem.Problem`
         :param problem: The problem to solve.
+        :type  budget: :class:`budget.Budget`
+        :param budget: The limits on the work to do. By default there are
+            none. If the budget runs out, the goals achieved so far are kept
+            as the partial plan.
 
         """
         self.reset()
+        if budget is not None:
+            self.budget = budget
+        self.problem = problem
+        self.start = BitState(problem.state)
         self.state = problem.state.copy()
-        self.ops = problem.ops.copy()
         self.goals = tuple(problem.goals)
-        self.local_state = problem.state.copy()
+        self.goal_mask = bitmask(problem.goals)
+        self.local_state = TrailState(problem.state)
 
         # we want to represent local states: one for each goal
         # let's use a dictionary because we'll also need a sequence of
@@ -169,7 +359,14 @@ class GPSv2(GPS):
         for goal in problem.goals:
             self.solution_history[goal] = {'state': None, 'ops': None}
 
-        return self.achieve_all()
+        try:
+            return self.remember(self.achieve_all())
+        except BudgetExceeded as exc:
+            return exc.status
+        finally:
+            if self.memo is not None:
+                self.stats.memo_hits = self.memo.hits
+                self.stats.memo_misses = self.memo.misses
 
     def reset(self):
         """Reset all local state variables to prepare for a new problem. These
@@ -177,11 +374,18 @@ class GPSv2(GPS):
         This is called at the beginning of a call to :func:`solve`.
 
         """
+        self.goals = ()
+        self.goal_mask = 0
         self.local_state = None
         self.local_ops = []
         self.solution_history = {}
-        self.goal_stack = set()
+        self.goal_stack = BitState()
         self.problem = None
+        self.start = None  # initial state of the last solve or replan
+        self.budget = Budget()
+        self.stats = SolveStats()
+        if self.memo is not None:
+            self.memo.clear()
 
     def achieve_all(self):
         """Attempt to achieve all goals for the current problem.
@@ -191,7 +395,7 @@ class GPSv2(GPS):
 
         """
         for goal in self.goals:
-            if not self.achieve(goal):
+            if not self.recall(goal) and not self.achieve(goal):
                 return "FAILURE"
 
             # goal was achieved, store local state and ops, reset local ops
@@ -206,6 +410,177 @@ class GPSv2(GPS):
         self.apply_solution()
         return "SUCCESS"
 
+    def replan(self, add=(), delete=(), executed=0, budget=None):
+        """Solve the last problem again after the state of the world changed,
+        reusing as much of the last solution as still works. The subplan of
+        each goal in the solution history is replayed from the new state, and
+        only the goals whose subplans can no longer be executed, or no longer
+        achieve them, are searched for again. Memoized subgoal outcomes are
+        kept, since they do not depend on the initial state. If the reused
+        subplans lead to a dead end, the problem is solved again from scratch
+        from the new state.
+
+        :type  add: collection of :class:`problem.Condition`
+        :param add: The conditions which now hold.
+        :type  delete: collection of :class:`problem.Condition`
+        :param delete: The conditions which no longer hold.
+        :param int executed: The number of operations of the last solution
+            which were executed before the state changed. The state changed
+            after them, and they are not part of the new solution.
+        :type  budget: :class:`budget.Budget`
+        :param budget: The limits on the work to do. By default there are
+            none.
+        :rtype:  str
+        :return: "SUCCESS" if the problem is solved, else "FAILURE" or the
+            status reported when the budget ran out.
+        :raise ValueError: If there was no last solve, or more operations
+            were executed than it planned.
+
+        """
+        if self.problem is None:
+            raise ValueError('replanning requires a previous call to solve')
+
+        # the subplans left to execute; those not found are searched for
+        start = self.start.copy()
+        remaining = []
+        for goal in self.goals:
+            ops = self.solution_history[goal]['ops']
+            if ops is not None and executed:
+                done, ops = ops[:executed], ops[executed:]
+                executed -= len(done)
+                for op in done:
+                    op.simulate(start)
+            remaining.append((goal, ops))
+        if executed:
+            raise ValueError('more operations were executed than planned')
+        start.apply(bitmask(add), bitmask(delete))
+
+        self.start = start
+        self.state = set(start)
+        self.local_state = TrailState(bits=start.bits)
+        self.local_ops = []
+        self.goal_stack = BitState()
+        self.budget = Budget() if budget is None else budget
+        self.stats = SolveStats()
+        for goal in self.goals:
+            self.solution_history[goal] = {'state': None, 'ops': None}
+
+        try:
+            if self.achieve_reusing(remaining) is None:
+                self.apply_solution()
+                return self.remember("SUCCESS")
+
+            if self.tracer.enabled:
+                self.tracer.trace('Reused subplans failed; solving again')
+            self.local_state = TrailState(bits=start.bits)
+            self.local_ops = []
+            for goal in self.goals:
+                self.solution_history[goal] = {'state': None, 'ops': None}
+            return self.remember(self.achieve_all())
+        except BudgetExceeded as exc:
+            return exc.status
+        finally:
+            if self.memo is not None:
+                self.stats.memo_hits = self.memo.hits
+                self.stats.memo_misses = self.memo.misses
+
+    def achieve_reusing(self, subplans):
+        """Attempt to achieve the goals in order, replaying the subplan found
+        for each before and searching only where it no longer works.
+
+        :param subplans: The (goal, subplan) pairs of the goals, in the order
+            in which to achieve them. The subplan is None if there was none.
+        :rtype:  :class:`problem.Condition` or None
+        :return: The first goal which could not be achieved, or was achieved
+            only by clobbering an earlier goal, or None if all were achieved.
+
+        """
+        achieved = 0  # bits of the goals achieved so far
+        for goal, ops in subplans:
+            if self.reuse_ops(goal, ops):
+                self.stats.reused += 1
+            elif not self.recall(goal) and not self.achieve(goal):
+                return goal
+
+            # check for clobbered goals with one mask rather than one check
+            # per goal, so that replanning stays linear in the goals
+            self.update_solution_history(goal)
+            self.stats.clobber_checks += 1
+            if achieved & ~self.local_state.bits:
+                return goal
+            achieved |= goal.bit
+
+        return None
+
+    def reuse_ops(self, goal, ops, keep=0):
+        """Replay a subplan found for a goal from the local state.
+
+        :type  goal: :class:`problem.Condition`
+        :param goal: The goal the subplan was found for.
+        :param ops: The operations of the subplan, or None.
+        :param int keep: Bitset of conditions which must still hold after the
+            subplan.
+        :rtype:  bool
+        :return: True if every operation could be applied in turn and the goal
+            and the conditions to keep hold after them, in which case they are
+            simulated; else False, and the local state is left as it was.
+
+        """
+        if ops is None:
+            return False
+
+        mark = self.local_state.mark()
+        for op in ops:
+            if not op.applicable(self.local_state):
+                break
+            op.simulate(self.local_state)
+        else:
+            if goal in self.local_state and not keep & ~self.local_state.bits:
+                if self.tracer.enabled:
+                    self.tracer.trace('Reusing subplan for goal: {}', goal)
+                self.local_ops.extend(ops)
+                return True
+
+        self.local_state.undo(mark)
+        return False
+
+    def recall(self, goal):
+        """Replay a subplan stored in the plan library for a goal, if one can
+        be executed from the local state, achieves the goal and leaves the
+        goals of the problem which hold still holding.
+
+        :type  goal: :class:`problem.Condition`
+        :param goal: The goal to recall a subplan for.
+        :rtype:  bool
+        :return: True if a subplan was replayed, else False.
+
+        """
+        if self.library is None or goal in self.local_state:
+            return False
+
+        bits = self.local_state.bits
+        keep = bits & self.goal_mask
+        ops = self.library.recall(goal, bits, self.problem,
+                                  lambda ops: self.reuse_ops(goal, ops, keep))
+        if ops is None:
+            return False
+        self.stats.recalled += 1
+        return True
+
+    def remember(self, status):
+        """Record the subplan of each goal in the plan library if the problem
+        was solved.
+
+        :param str status: The status of the solve.
+        :rtype:  str
+        :return: The status.
+
+        """
+        if status == "SUCCESS" and self.library is not None:
+            self.library.record((goal, self.solution_history[goal]['ops'])
+                                for goal in self.goals)
+        return status
+
     def update_solution_history(self, goal):
         """Update the solution history for the given goal by storing its
         solution as the current value of the instance variable 'local_ops' and
@@ -220,10 +595,26 @@ class GPSv2(GPS):
         goal_history['state'] = self.local_state
         self.local_ops = []  # reset local ops list
 
+    def plan(self):
+        """Get the solution found by the last call to :func:`solve`, built
+        from the operations stored in the solution history.
+
+        :rtype:  list of :class:`problem.Operation`
+
+        """
+        ops = []
+        for goal in self.goals:
+            goal_ops = self.solution_history[goal]['ops']
+            if goal_ops is None:
+                break
+            ops.extend(goal_ops)
+        return ops
+
     def apply_solution(self):
         """Apply all operators in the solution history to solve the problem."""
         for goal in self.goals:
-            map(self.apply_op, self.solution_history[goal]['ops'])
+            for op in self.solution_history[goal]['ops']:
+                self.apply_op(op)
 
     def clobbers_previous_goals(self, goal):
         """Check to see if this goal clobbers previously achieved goals.
@@ -234,6 +625,7 @@ class GPSv2(GPS):
         """
         current_goal_index = self.goals.index(goal)
         for previous_goal in self.goals[:current_goal_index]:
+            self.stats.clobber_checks += 1
             # check for membership in this goal's solution state
             if previous_goal not in self.solution_history[goal]['state']:
                 return True  # problem solution failed (sibling clobbered)
@@ -249,47 +641,114 @@ class GPSv2(GPS):
         :return: True if the goal was achieved, else False.
 
         """
-        print 'Attempting to achieve goal: {}'.format(goal)
-        print 'Current local state: {}'.format(self.local_state)
+        tracer = self.tracer
+        if tracer.enabled:
+            tracer.trace('Attempting to achieve goal: {}', goal)
+            tracer.trace('Current local state: {}', self.local_state.copy())
+        self.stats.goals += 1
 
         # case 1: base case (goal condition is in current state)
         if goal in self.local_state:
             return True
         elif goal in self.goal_stack:  # entering infinite recursion
-            print 'Found recursive goal: {}'.format(goal)
+            self.stats.loops += 1
+            if tracer.enabled:
+                tracer.trace('Found recursive goal: {}', goal)
             return False
-        else:  # track goal to avoid infinite recursion
-            self.goal_stack.add(goal)
+
+        memo = self.memo
+        if memo is None:
+            return self.search_ops(goal)
+
+        # the outcome of searching for a goal is determined by the local state
+        # and the goal stack, so a subgoal seen before in the same situation
+        # can be answered by replaying the effects of the earlier search
+        key = self.memo_key(goal)
+        outcome = memo.get(key)
+        if outcome is not None:
+            achieved, ops, state_bits = outcome
+            if tracer.enabled:
+                tracer.trace('Reusing memoized outcome for goal: {}', goal)
+            if achieved:
+                self.local_state.assign(state_bits)
+                self.local_ops.extend(ops)
+            return achieved
+
+        ops_mark = len(self.local_ops)
+        achieved = self.search_ops(goal)
+        if len(self.local_ops) - ops_mark <= MEMO_MAX_OPS:
+            memo.put(key, (achieved, tuple(self.local_ops[ops_mark:]),
+                           self.local_state.bits))
+        return achieved
+
+    def memo_key(self, goal):
+        """Get the key under which the outcome of searching for a goal in the
+        current situation is memoized.
+
+        :type  goal: :class:`problem.Condition`
+        :rtype:  tuple
+
+        """
+        return (goal, self.local_state.bits, self.goal_stack.bits)
+
+    def search_ops(self, goal):
+        """Attempt to achieve a goal which is not in the local state by
+        simulating the operations appropriate for it.
+
+        :type  goal: :class:`problem.Condition`
+        :param goal: The goal that we are attempting to achieve.
+        :rtype:  bool
+        :return: True if the goal was achieved, else False.
+
+        """
+        self.budget.charge()
+        stats = self.stats
+        stats.searched += 1
+        stats.descend()
+        self.goal_stack.add(goal)  # track goal to avoid infinite recursion
 
         # case 2: there exists some set of operations to put the goal condition
         # in the current state
-        appropriate_ops = [op for op in self.ops if op.achieves(goal)]
-        for op in appropriate_ops:
+        for op in self.appropriate_ops(goal):
             if self.simulate_op(op):
                 self.goal_stack.remove(goal)
+                stats.depth -= 1
                 return True
 
         # case 3: no appropriate set of operations exists to achieve this goal
+        self.goal_stack.remove(goal)
+        stats.depth -= 1
         return False
 
     def simulate_op(self, op):
         """Apply a particular operation by adding all conditions in its add-list
         and removing all in its delete-list. Only modify the local state -
         that's what makes it a simulation. First ensure all preconditions can be
-        achieved.
+        achieved. If they cannot, the changes made to the local state while
+        trying to achieve them are rolled back.
 
         :type  op: :class:`problem.Operation`
         :param op: The operation to apply.
 
         """
-        print 'Considering operation: {}'.format(op)
+        tracer = self.tracer
+        if tracer.enabled:
+            tracer.trace('Considering operation: {}', op)
+        self.stats.ops_considered += 1
+        state_mark = self.local_state.mark()
+        ops_mark = len(self.local_ops)
         if (all(map(self.achieve, op.preconditions))):
-            print 'Simulating operation: {}'.format(op)
+            if tracer.enabled:
+                tracer.trace('Simulating operation: {}', op)
             op.simulate(self.local_state)  # alter state but don't execute
             self.local_ops.append(op)  # track necessary ops for solution
+            self.stats.ops_simulated += 1
             return True
 
-        print 'Could not meet preconditions for: {}'.format(op)
+        if tracer.enabled:
+            tracer.trace('Could not meet preconditions for: {}', op)
+        self.local_state.undo(state_mark)
+        del self.local_ops[ops_mark:]
         return False
 
     def apply_op(self, op):
@@ -299,4 +758,954 @@ class GPSv2(GPS):
         :param op: The operation to apply.
 
         """
-        op.execute(self.state)
+        op.execute(self.state, self.tracer)
+
+
+# frame kinds of the explicit stack used by GPSv3
+_GOAL_FRAME = 0
+_OP_FRAME = 1
+
+
+class GPSv3(GPSv2):
+    """Version 3 general problem solver. This performs the same means-ends
+    analysis as version 2, and so finds identical plans, but it keeps the
+    goals and operations being worked on in an explicit stack of frames rather
+    than recursing. There is no limit on the depth of the subgoal chains it
+    can follow and no per-subgoal Python call overhead.
+
+    """
+
+    version = 3
+
+    PHASES = ('achieve_all', 'achieve', '_enter_goal',
+              'clobbers_previous_goals', 'apply_solution')
+
+    # whether to reject an operation if achieving one of its preconditions
+    # clobbered another achieved before it
+    check_preconditions = False
+
+    def achieve(self, goal):
+        """Attempt to achieve a particular goal.
+
+        :type  goal: :class:`problem.Condition`
+        :param goal: The goal that we are attempting to achieve.
+        :rtype:  bool
+        :return: True if the goal was achieved, else False.
+
+        """
+        tracer = self.tracer
+        local_ops = self.local_ops
+        stats = self.stats
+
+        # Goal frames are [kind, goal, ops, next op index, memo key, local ops
+        # mark]. Op frames are [kind, op, iterator over preconditions, local
+        # state trail mark, local ops mark]. 'result' carries the outcome of
+        # the frame just popped to its parent; None means no frame has
+        # finished since the top frame was pushed.
+        frames = []
+        result = self._enter_goal(goal, frames)
+        while frames:
+            frame = frames[-1]
+            if frame[0] == _GOAL_FRAME:
+                if result:  # an appropriate op was simulated
+                    frames.pop()
+                    self.goal_stack.remove(frame[1])
+                    stats.depth -= 1
+                    self._memorize(frame, True)
+                    continue
+
+                ops, index = frame[2], frame[3]
+                if index < len(ops):
+                    frame[3] = index + 1
+                    op = ops[index]
+                    if tracer.enabled:
+                        tracer.trace('Considering operation: {}', op)
+                    stats.ops_considered += 1
+                    frames.append([_OP_FRAME, op, iter(op.preconditions),
+                                   self.local_state.mark(), len(local_ops)])
+                    result = None
+                else:  # no appropriate op could be simulated
+                    frames.pop()
+                    self.goal_stack.remove(frame[1])
+                    stats.depth -= 1
+                    self._memorize(frame, False)
+                    result = False
+            else:
+                op = frame[1]
+                if result is False:  # a precondition could not be achieved
+                    frames.pop()
+                    if tracer.enabled:
+                        tracer.trace('Could not meet preconditions for: {}', op)
+                    self.local_state.undo(frame[3])
+                    del local_ops[frame[4]:]
+                    continue
+
+                for precondition in frame[2]:
+                    result = self._enter_goal(precondition, frames)
+                    if result is not True:
+                        break  # failed, or a goal frame was pushed
+                else:
+                    frames.pop()
+                    if (self.check_preconditions and
+                            op.pre_mask & ~self.local_state.bits):
+                        if tracer.enabled:
+                            tracer.trace('Preconditions clobbered for: {}', op)
+                        self.local_state.undo(frame[3])
+                        del local_ops[frame[4]:]
+                        result = False
+                        continue
+
+                    if tracer.enabled:
+                        tracer.trace('Simulating operation: {}', op)
+                    op.simulate(self.local_state)
+                    local_ops.append(op)
+                    stats.ops_simulated += 1
+                    result = True
+
+        return result
+
+    def _enter_goal(self, goal, frames):
+        """Begin an attempt to achieve a goal. Goals which are already in the
+        local state, already being worked on or memoized are decided without
+        searching; otherwise a goal frame is pushed.
+
+        :return: True or False if the goal was decided, None if a frame was
+            pushed.
+
+        """
+        tracer = self.tracer
+        if tracer.enabled:
+            tracer.trace('Attempting to achieve goal: {}', goal)
+            tracer.trace('Current local state: {}', self.local_state.copy())
+        stats = self.stats
+        stats.goals += 1
+
+        if goal in self.local_state:
+            return True
+        elif goal in self.goal_stack:  # entering infinite recursion
+            stats.loops += 1
+            if tracer.enabled:
+                tracer.trace('Found recursive goal: {}', goal)
+            return False
+
+        key = None
+        memo = self.memo
+        if memo is not None:
+            key = self.memo_key(goal)
+            outcome = memo.get(key)
+            if outcome is not None:
+                achieved, ops, state_bits = outcome
+                if tracer.enabled:
+                    tracer.trace('Reusing memoized outcome for goal: {}', goal)
+                if achieved:
+                    self.local_state.assign(state_bits)
+                    self.local_ops.extend(ops)
+                return achieved
+
+        self.budget.charge()
+        stats.searched += 1
+        stats.descend()
+        frames.append([_GOAL_FRAME, goal, self.appropriate_ops(goal), 0, key,
+                       len(self.local_ops)])
+        self.goal_stack.add(goal)
+        return None
+
+    def _memorize(self, frame, achieved):
+        """Record the outcome of the goal frame being popped in the memo."""
+        key = frame[4]
+        if key is not None and len(self.local_ops) - frame[5] <= MEMO_MAX_OPS:
+            self.memo.put(key, (achieved, tuple(self.local_ops[frame[5]:]),
+                                self.local_state.bits))
+
+
+class GPSv4(GPS):
+    """Version 4 general problem solver. Rather than means-ends analysis, this
+    performs a heuristic forward search through the state space of the
+    problem, starting from its initial state and applying every applicable
+    operation to each state it expands. The frontier is a priority queue and
+    states (integer bitsets) are only expanded again if they are reached by a
+    cheaper path. If the budget runs out, the partial plan is the path to the
+    expanded state with the lowest heuristic value.
+
+    With search 'astar' and the admissible 'max' heuristic, plans are
+    optimal; the 'add' and 'ff' heuristics are inadmissible but much better
+    informed, and give near-optimal plans. Search 'gbfs' (greedy best-first)
+    ignores the cost of the path so far and finds plans fastest.
+
+    The heuristic values of all new successors of an expanded state are
+    computed in one batch, so that with vectorized heuristics (which require
+    NumPy) the cost of evaluating them is shared.
+
+    With compact states, the problem is first translated to finite-domain
+    variables (see :mod:`sas`). The states the search has reached are then
+    stored packed into a few bits per variable rather than one bit per
+    condition, operations which require mutually exclusive conditions are
+    never considered, and goals which are mutually exclusive are reported
+    unsolvable without searching.
+
+    """
+
+    version = 4
+
+    PHASES = ('successor_generator', 'search_plan', 'apply_solution')
+
+    def __init__(self, tracer=None, search='astar', heuristic='add',
+                 vectorized=False, compact=False):
+        """
+        :type  tracer: :class:`tracing.Tracer`
+        :param tracer: The tracer to record reasoning output with. By default
+            nothing is recorded.
+        :param str search: The search strategy: 'astar' or 'gbfs'.
+        :param str heuristic: The heuristic to guide the search with: 'max',
+            'add' or 'ff' (see :mod:`heuristics`).
+        :param bool vectorized: Whether to compute the heuristic with NumPy
+            array operations. Only 'max' and 'add' are vectorized.
+        :param bool compact: Whether to store the states reached in the
+            packed encoding of their finite-domain translation.
+
+        """
+        super(GPSv4, self).__init__(tracer)
+        if search not in SEARCHES:
+            raise ValueError('Unknown search strategy: {}'.format(search))
+        if heuristic not in (VECTOR_HEURISTICS if vectorized else HEURISTICS):
+            raise ValueError('Unknown {}heuristic: {}'.format(
+                'vectorized ' if vectorized else '', heuristic))
+
+        self.search = search
+        self.heuristic = heuristic
+        self.vectorized = vectorized
+        self.compact = compact
+        self.reset()
+
+    def reset(self):
+        """Reset all local state variables to prepare for a new problem. These
+        are kept around between problems in case one might want to inspect them.
+        This is called at the beginning of a call to :func:`solve`.
+
+        """
+        self.problem = None
+        self.translation = None
+        self.solution = []
+        self.expanded = 0
+        self.generated = 0
+        self.budget = Budget()
+        self.stats = SolveStats()
+
+    def solve(self, problem, budget=None):
+        """Solve a particular problem using heuristic forward search.
+
+        :type  problem: :class:`problem.Problem`
+        :param problem: The problem to solve.
+        :type  budget: :class:`budget.Budget`
+        :param budget: The limits on the work to do. By default there are
+            none.
+        :rtype:  str
+        :return: "SUCCESS" if the problem is solved, "FAILURE" if it has no
+            solution, else the status reported when the budget ran out.
+
+        """
+        self.reset()
+        if budget is not None:
+            self.budget = budget
+        # the search needs every applicable operation, so lifted problems
+        # are ground up front
+        self.problem = problem.ground()
+        self.state = problem.state.copy()
+
+        try:
+            solution = self.search_plan()
+        except BudgetExceeded as exc:
+            return exc.status
+        finally:
+            self.stats.expanded = self.expanded
+            self.stats.generated = self.generated
+        if solution is None:
+            return "FAILURE"
+
+        self.solution = solution
+        self.apply_solution()
+        return "SUCCESS"
+
+    def plan(self):
+        """Get the solution found by the last call to :func:`solve`.
+
+        :rtype:  list of :class:`problem.Operation`
+
+        """
+        return list(self.solution)
+
+    def apply_solution(self):
+        """Apply all operators in the solution to solve the problem."""
+        for op in self.solution:
+            self.apply_op(op)
+
+    def apply_op(self, op):
+        """Execute the operation, altering the current state.
+
+        :type  op: :class:`problem.Operation`
+        :param op: The operation to apply.
+
+        """
+        op.execute(self.state, self.tracer)
+
+    def successor_generator(self):
+        """Build a function which finds the operations applicable in a state.
+        Operations are grouped by their first precondition, so only the
+        groups of conditions that hold in the state need to be checked.
+
+        :rtype:  function
+        :return: A function from state bits to a list of the applicable
+            operations.
+
+        """
+        free_ops = []
+        groups = {}
+        impossible = set()
+        if self.translation is not None:
+            impossible.update(self.translation.impossible_ops(self.problem.ops))
+        for op in self.problem.ops:
+            if op in impossible:
+                continue
+            if op.pre_mask:
+                first = (op.pre_mask & -op.pre_mask).bit_length() - 1
+                groups.setdefault(first, []).append(op)
+            else:
+                free_ops.append(op)
+
+        def applicable_ops(bits):
+            ops = list(free_ops)
+            remaining = bits
+            while remaining:
+                low = remaining & -remaining
+                remaining ^= low
+                group = groups.get(low.bit_length() - 1)
+                if group is not None:
+                    ops.extend(op for op in group
+                               if bits & op.pre_mask == op.pre_mask)
+            return ops
+
+        return applicable_ops
+
+    def search_plan(self):
+        """Search for a plan from the initial state of the current problem.
+
+        :rtype:  list of :class:`problem.Operation` or None
+        :return: The plan, or None if there is none.
+
+        """
+        tracer = self.tracer
+        budget = self.budget
+        if self.vectorized:
+            relaxed = VectorRelaxedProblem(self.problem)
+        else:
+            relaxed = RelaxedProblem(self.problem)
+        heuristic = relaxed.heuristic(self.heuristic)
+        batch_heuristic = relaxed.batch_heuristic(self.heuristic)
+        goal_mask = bitmask(self.problem.goals)
+        greedy = self.search == 'gbfs'
+
+        # states are keyed by their bits, or by their packed encoding
+        pack = unpack = None
+        if self.compact:
+            self.translation = Translation(self.problem)
+            if tracer.enabled:
+                tracer.trace('Translated problem: {}', self.translation)
+            if not self.translation.consistent(goal_mask):
+                return None  # goals mutually exclusive
+            pack, unpack = self.translation.pack, self.translation.unpack
+        applicable_ops = self.successor_generator()
+
+        start = bitmask(self.problem.state)
+        h_start = heuristic(start)
+        if h_start is None:
+            return None  # goals unreachable even in the relaxation
+        if pack is not None:
+            start = pack(start)  # conditions outside the problem are dropped
+
+        # frontier entries are (priority, h, tie-breaker, g, state key); ties
+        # are broken in favour of lower h, then first in first out
+        counter = itertools.count()
+        frontier = [(h_start, h_start, next(counter), 0, start)]
+        best_g = {start: 0}
+        h_values = {start: h_start}
+        parents = {start: None}
+        closest, h_closest = start, h_start
+        while frontier:
+            _, h, _, g, key = heapq.heappop(frontier)
+            if g > best_g[key]:
+                continue  # reached again more cheaply since being queued
+
+            bits = key if unpack is None else unpack(key)
+
+            if bits & goal_mask == goal_mask:
+                return self._extract_plan(parents, key)
+
+            try:
+                budget.charge()
+            except BudgetExceeded:
+                self.solution = self._extract_plan(parents, closest)
+                raise
+
+            if h < h_closest:
+                closest, h_closest = key, h
+            self.expanded += 1
+            if tracer.enabled:
+                tracer.trace('Expanding state: {} (g={}, h={})',
+                             BitState(bits=bits), g, h)
+
+            g_next = g + 1
+            fresh = []  # successors never reached before
+            fresh_keys = []
+            for op in applicable_ops(bits):
+                successor = (bits & ~op.del_mask) | op.add_mask
+                successor_key = (successor if pack is None
+                                 else pack(successor))
+                if g_next >= best_g.get(successor_key, g_next + 1):
+                    continue
+
+                known = successor_key in best_g
+                best_g[successor_key] = g_next
+                parents[successor_key] = (key, op)
+                if not known:
+                    fresh.append(successor)
+                    fresh_keys.append(successor_key)
+                elif not greedy and h_values[successor_key] is not None:
+                    # reopen with the cheaper path; gbfs ignores path costs
+                    h_next = h_values[successor_key]
+                    heapq.heappush(frontier, (g_next + h_next, h_next,
+                                              next(counter), g_next,
+                                              successor_key))
+
+            for successor_key, h_next in zip(fresh_keys,
+                                             batch_heuristic(fresh)):
+                h_values[successor_key] = h_next
+                if h_next is None:
+                    continue  # dead end
+                self.generated += 1
+                priority = h_next if greedy else g_next + h_next
+                heapq.heappush(frontier, (priority, h_next, next(counter),
+                                          g_next, successor_key))
+
+        return None
+
+    def _extract_plan(self, parents, key):
+        ops = []
+        link = parents[key]
+        while link is not None:
+            key, op = link
+            ops.append(op)
+            link = parents[key]
+        ops.reverse()
+        return ops
+
+
+class GPSv5(GPSv3):
+    """Version 5 general problem solver. Versions 2 and 3 achieve the goals of
+    a problem strictly in the order given, and fail as soon as achieving one
+    goal clobbers a goal achieved before it. This version orders the goals
+    before achieving them, so that a goal is achieved before any goal whose
+    every achiever would delete it, and protects the goals achieved so far:
+    while achieving the next goal, operations which would delete a protected
+    goal are not considered. Operations are also only simulated if achieving
+    their later preconditions did not clobber the earlier ones, so every plan
+    found can be executed as is.
+
+    If a goal still cannot be achieved, the goals are reordered by moving it
+    ahead of the goal before it, and the problem is solved again with the
+    memoized subgoal outcomes kept. The number of reorderings is at most
+    quadratic in the number of goals.
+
+    """
+
+    version = 5
+
+    PHASES = GPSv3.PHASES + ('order_goals',)
+
+    check_preconditions = True
+
+    def reset(self):
+        """Reset all local state variables to prepare for a new problem. These
+        are kept around between problems in case one might want to inspect them.
+        This is called at the beginning of a call to :func:`solve`.
+
+        """
+        super(GPSv5, self).reset()
+        self.protected = 0  # bits of the goals achieved so far
+        self.restarts = 0
+
+    def achieve_all(self):
+        """Attempt to achieve all goals for the current problem, reordering
+        them until they can all be achieved without clobbering each other.
+
+        :rtype:  str
+        :return: "SUCCESS" if the problem is solved, else "FAILURE".
+
+        """
+        order = self.order_goals(self.goals)
+        tried = set()
+        max_restarts = len(order) * (len(order) - 1) // 2
+        while True:
+            tried.add(tuple(order))
+            failed = self.achieve_in_order(order)
+            if failed is None:
+                self.apply_solution()
+                return "SUCCESS"
+
+            # a goal at the front failed with nothing protected, so it cannot
+            # be achieved in any order
+            index = order.index(failed)
+            if index == 0 or self.restarts >= max_restarts:
+                return "FAILURE"
+
+            order[index - 1], order[index] = order[index], order[index - 1]
+            if tuple(order) in tried:
+                return "FAILURE"
+            self.restarts += 1
+            if self.tracer.enabled:
+                self.tracer.trace('Reordering goals: {}', tuple(order))
+
+    def achieve_in_order(self, order):
+        """Attempt to achieve the goals in a particular order, starting from
+        the initial state and protecting each goal once it is achieved.
+
+        :param list order: The goals of the problem, in the order in which to
+            achieve them.
+        :rtype:  :class:`problem.Condition` or None
+        :return: The first goal which could not be achieved, or was achieved
+            only by clobbering an earlier goal, or None if all were achieved.
+
+        """
+        self.goals = tuple(order)
+        self.local_state = TrailState(bits=self.start.bits)
+        self.local_ops = []
+        self.protected = 0
+        for goal in order:
+            self.solution_history[goal] = {'state': None, 'ops': None}
+
+        for goal in order:
+            if not self.recall(goal) and not self.achieve(goal):
+                return goal
+
+            self.update_solution_history(goal)
+            if self.clobbers_previous_goals(goal):
+                return goal
+
+            self.protected |= goal.bit
+
+        return None
+
+    def achieve_reusing(self, subplans):
+        """Attempt to achieve the goals in order, replaying the subplan found
+        for each before and searching only where it no longer works. Each
+        goal is protected once it is achieved, as in :func:`achieve_in_order`.
+
+        :param subplans: The (goal, subplan) pairs of the goals, in the order
+            in which to achieve them. The subplan is None if there was none.
+        :rtype:  :class:`problem.Condition` or None
+        :return: The first goal which could not be achieved, or was achieved
+            only by clobbering an earlier goal, or None if all were achieved.
+
+        """
+        self.protected = 0
+        for goal, ops in subplans:
+            if self.reuse_ops(goal, ops):
+                self.stats.reused += 1
+            elif not self.recall(goal) and not self.achieve(goal):
+                return goal
+
+            self.update_solution_history(goal)
+            self.stats.clobber_checks += 1
+            if self.protected & ~self.local_state.bits:
+                return goal
+
+            self.protected |= goal.bit
+
+        return None
+
+    def order_goals(self, goals):
+        """Order the goals so that, where every achiever of one goal deletes
+        another, the first is achieved before the second. Otherwise the goals
+        keep the order given, as do goals whose ordering constraints form a
+        cycle.
+
+        :type  goals: sequence of :class:`problem.Condition`
+        :param goals: The goals to order.
+        :rtype:  list of :class:`problem.Condition`
+
+        """
+        position = dict((goal, i) for i, goal in enumerate(goals))
+        goal_mask = bitmask(goals)
+
+        # successors[b] are the goals which must follow b; pending[a] counts
+        # the goals which must precede a
+        successors = dict((goal, []) for goal in goals)
+        pending = dict((goal, 0) for goal in goals)
+        for goal in goals:
+            achievers = self.problem.achievers(goal)
+            if not achievers:
+                continue
+
+            clobbered = -1  # goals deleted by every achiever of this goal
+            for op in achievers:
+                clobbered &= op.del_mask & ~op.add_mask
+            clobbered &= goal_mask & ~goal.bit
+            for other in Condition.from_bits(clobbered):
+                successors[goal].append(other)
+                pending[other] += 1
+
+        ready = [position[goal] for goal in goals if not pending[goal]]
+        heapq.heapify(ready)
+        ordered = []
+        placed = set()
+        while len(ordered) < len(goals):
+            if not ready:  # break a cycle at its earliest goal
+                ready.append(min(position[goal] for goal in goals
+                                 if goal not in placed))
+            goal = goals[heapq.heappop(ready)]
+            if goal in placed:
+                continue
+            placed.add(goal)
+            ordered.append(goal)
+            for other in successors[goal]:
+                pending[other] -= 1
+                if not pending[other] and other not in placed:
+                    heapq.heappush(ready, position[other])
+
+        if self.tracer.enabled and ordered != list(goals):
+            self.tracer.trace('Reordering goals: {}', tuple(ordered))
+        return ordered
+
+    def appropriate_ops(self, goal):
+        """Find all operations appropriate for solving some goal which do not
+        delete any protected goal.
+
+        :type  goal: :class:`problem.Condition`
+        :param goal: The goal we are trying to achieve.
+        :rtype:  sequence of :class:`problem.Operation`
+
+        """
+        ops = self.problem.achievers(goal)
+        protected = self.protected
+        if not protected:
+            return ops
+        return [op for op in ops if not op.del_mask & ~op.add_mask & protected]
+
+    def memo_key(self, goal):
+        """Get the key under which the outcome of searching for a goal in the
+        current situation is memoized. Operations deleting protected goals
+        are not considered, so the outcome depends on them too.
+
+        :type  goal: :class:`problem.Condition`
+        :rtype:  tuple
+
+        """
+        return (goal, self.local_state.bits, self.goal_stack.bits,
+                self.protected)
+
+
+class GroundGPS(GPS):
+    """Template class for the general problem solvers which ground every
+    operation of a problem up front, search a structure built from them for
+    a whole plan, and only then apply it. Subclasses build the structure in
+    :func:`prepare` and search it in :func:`search_plan`.
+
+    """
+
+    def __init__(self, tracer=None):
+        """
+        :type  tracer: :class:`tracing.Tracer`
+        :param tracer: The tracer to record reasoning output with. By default
+            nothing is recorded.
+
+        """
+        super(GroundGPS, self).__init__(tracer)
+        self.reset()
+
+    def reset(self):
+        """Reset all local state variables to prepare for a new problem. These
+        are kept around between problems in case one might want to inspect them.
+        This is called at the beginning of a call to :func:`solve`.
+
+        """
+        self.problem = None
+        self.solution = []
+        self.budget = Budget()
+        self.stats = SolveStats()
+
+    def solve(self, problem, budget=None):
+        """Solve a particular problem by searching for a whole plan before
+        applying any of it.
+
+        :type  problem: :class:`problem.Problem`
+        :param problem: The problem to solve.
+        :type  budget: :class:`budget.Budget`
+        :param budget: The limits on the work to do. By default there are
+            none.
+        :rtype:  str
+        :return: "SUCCESS" if the problem is solved, "FAILURE" if it has no
+            solution, else the status reported when the budget ran out.
+
+        """
+        self.reset()
+        if budget is not None:
+            self.budget = budget
+        # every operation is needed up front, so lifted problems are ground
+        self.problem = problem.ground()
+        self.state = problem.state.copy()
+        self.prepare()
+
+        try:
+            solution = self.search_plan()
+        except BudgetExceeded as exc:
+            return exc.status
+        finally:
+            self.stats.expanded = self.budget.nodes
+            self.record_stats()
+        if solution is None:
+            return "FAILURE"
+
+        self.solution = solution
+        self.apply_solution()
+        return "SUCCESS"
+
+    def prepare(self):
+        """Build the structure to search from the ground problem."""
+        raise NotImplementedError('Subclasses should override this method.')
+
+    def search_plan(self):
+        """Search for a plan.
+
+        :rtype:  list of :class:`problem.Operation` or None
+        :return: The operations of the plan, or None if there is none.
+        :raise BudgetExceeded: If the budget runs out.
+
+        """
+        raise NotImplementedError('Subclasses should override this method.')
+
+    def record_stats(self):
+        """Record the work of the search in the stats, whether or not it
+        finished.
+
+        """
+        pass
+
+    def plan(self):
+        """Get the solution found by the last call to :func:`solve`.
+
+        :rtype:  list of :class:`problem.Operation`
+
+        """
+        return list(self.solution)
+
+    def apply_solution(self):
+        """Apply all operators in the solution to solve the problem."""
+        for op in self.solution:
+            self.apply_op(op)
+
+    def apply_op(self, op):
+        """Execute the operation, altering the current state.
+
+        :type  op: :class:`problem.Operation`
+        :param op: The operation to apply.
+
+        """
+        op.execute(self.state, self.tracer)
+
+
+class GPSv6(GroundGPS):
+    """Version 6 general problem solver. This builds the planning graph of
+    the problem (see :mod:`graphplan`) one level at a time, and after each
+    level searches backward from the goals for a plan, as the Graphplan
+    planner does. Goal interactions which make means-ends analysis fail or
+    thrash, like achieving a goal only to clobber one achieved before it, are
+    caught by the mutexes of the graph, and the plan found is a shortest
+    parallel plan: a shortest sequence of steps, the operations of each of
+    which can be applied in any order.
+
+    Each action chosen during the backward search counts as a node of the
+    budget. If the budget runs out, there is no partial plan.
+
+    """
+
+    version = 6
+
+    PHASES = ('expand_graph', 'extract_plan', 'apply_solution')
+
+    def reset(self):
+        """Reset all local state variables to prepare for a new problem. These
+        are kept around between problems in case one might want to inspect them.
+        This is called at the beginning of a call to :func:`solve`.
+
+        """
+        super(GPSv6, self).reset()
+        self.graph = None
+        self.steps = []
+
+    def prepare(self):
+        """Build the first level of the planning graph."""
+        self.graph = PlanningGraph(self.problem)
+
+    def search_plan(self):
+        """Search the planning graph for a plan, extending it as needed. The
+        operations of each step of the plan are kept in :attr:`steps`.
+
+        :rtype:  list of :class:`problem.Operation` or None
+        :return: The operations of the plan, with those of each step in a
+            fixed order, or None if there is none.
+
+        """
+        steps = self.search_graph()
+        if steps is None:
+            return None
+        self.steps = steps
+        return [op for step in steps for op in step]
+
+    def record_stats(self):
+        self.stats.max_depth = len(self.graph) - 1
+
+    def search_graph(self):
+        """Alternate extending the planning graph and searching it for a plan,
+        until a plan is found or the graph has levelled off and a search
+        found no new no-goods at the level where it did.
+
+        :rtype:  list of list of :class:`problem.Operation` or None
+        :return: The steps of the plan, or None if there is none.
+
+        """
+        graph = self.graph
+        nogoods = None  # no-goods at the levelled off level after a search
+        while True:
+            self.budget.check()
+            steps = self.extract_plan()
+            if steps is not None:
+                return steps
+
+            if graph.levelled is not None:
+                count = len(graph.nogoods.get(graph.levelled, ()))
+                if not graph.reachable(graph.goals, graph.levelled) or \
+                        count == nogoods:
+                    return None
+                nogoods = count
+            self.expand_graph()
+
+    def expand_graph(self):
+        """Add the next level to the planning graph."""
+        level = self.graph.expand()
+        if self.tracer.enabled:
+            self.tracer.trace('Level {}: {} conditions, {} actions',
+                              len(self.graph) - 1, bin(level.props).count('1'),
+                              len(level.action_mutex))
+
+    def extract_plan(self):
+        """Search the planning graph backward from the goals at its last
+        level for a plan.
+
+        :rtype:  list of list of :class:`problem.Operation` or None
+        :return: The steps of the plan, or None if none was found.
+
+        """
+        steps = self.graph.extract(self.budget)
+        if steps is not None and self.tracer.enabled:
+            self.tracer.trace('Extracted plan of {} steps', len(steps))
+        return steps
+
+
+class GPSv7(GroundGPS):
+    """Version 7 general problem solver. This searches every state reachable
+    from the initial state breadth first, a layer of states at a time,
+    representing each layer symbolically as a binary decision diagram (see
+    :mod:`symbolic`). It is exhaustive: the plan found is a shortest plan,
+    and failure proves that the problem has no solution, since every
+    reachable state was searched. The number of states, the size of the node
+    table and the time taken are recorded for each layer, in the layers of
+    the stats.
+
+    The image of a layer under each operation which may lead to new states
+    counts as a node of the budget. If the budget runs out, there is no
+    partial plan.
+
+    """
+
+    version = 7
+
+    PHASES = ('expand_layer', 'extract_plan', 'apply_solution')
+
+    def reset(self):
+        """Reset all local state variables to prepare for a new problem. These
+        are kept around between problems in case one might want to inspect them.
+        This is called at the beginning of a call to :func:`solve`.
+
+        """
+        super(GPSv7, self).reset()
+        self.symbolic = None
+
+    def prepare(self):
+        """Encode the initial state and the transitions as BDDs."""
+        self.symbolic = SymbolicSearch(self.problem)
+
+    def search_plan(self):
+        """Search layers of states until one holds a goal state, and recover a
+        shortest plan from them.
+
+        :rtype:  list of :class:`problem.Operation` or None
+        :return: The operations of the plan, or None if there is none.
+
+        """
+        if self.search_layers() is None:
+            return None
+        return self.extract_plan()
+
+    def record_stats(self):
+        layers = self.symbolic.layers
+        self.stats.max_depth = len(layers) - 1
+        self.stats.layers = [layer.as_tuple() for layer in layers]
+
+    def search_layers(self):
+        """Search layers of states until one holds a goal state or no new
+        states are reached.
+
+        :rtype:  int or None
+        :return: The length of a shortest plan, or None if there is none.
+
+        """
+        symbolic = self.symbolic
+        self.trace_layer(symbolic.start())
+        while not symbolic.finished:
+            self.budget.check()
+            self.expand_layer()
+        return symbolic.solved
+
+    def expand_layer(self):
+        """Search the next layer of states."""
+        self.trace_layer(self.symbolic.expand(self.budget))
+
+    def trace_layer(self, layer):
+        """Record the work of searching a layer of states."""
+        if self.tracer.enabled:
+            self.tracer.trace('Layer {}: {} states, {} BDD nodes, {} in table, '
+                              '{:.6f}s', layer.index, layer.states,
+                              layer.frontier, layer.nodes, layer.seconds)
+
+    def extract_plan(self):
+        """Recover a shortest plan from the layers searched.
+
+        :rtype:  list of :class:`problem.Operation`
+
+        """
+        plan = self.symbolic.extract()
+        if self.tracer.enabled:
+            self.tracer.trace('Extracted plan of {} operations', len(plan))
+        return plan
+
+
+SEARCHES = ('astar', 'gbfs')
+
+SOLVERS = {
+    GPSv1.version: GPSv1,
+    GPSv2.version: GPSv2,
+    GPSv3.version: GPSv3,
+    GPSv4.version: GPSv4,
+    GPSv5.version: GPSv5,
+    GPSv6.version: GPSv6,
+    GPSv7.version: GPSv7,
+}
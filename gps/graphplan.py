@@ -0,0 +1,315 @@
+"""
+Planning graphs, as built and searched by the Graphplan planner.
+
+A planning graph alternates levels of conditions and of actions. Level 0 holds
+the conditions of the initial state; the actions after level k are the
+operations whose preconditions are all in level k, along with a no-op for each
+condition, which carries it to the next level unchanged; and level k + 1 holds
+every condition they add. Pairs which cannot occur together are marked
+mutually exclusive (mutex):
+
+*   two actions are mutex if one deletes a precondition or added condition of
+    the other (interference), or if a precondition of one is mutex with a
+    precondition of the other (competing needs)
+*   two conditions are mutex if every action adding one is mutex with every
+    action adding the other
+
+Actions whose preconditions are mutex are left out of the graph. Conditions
+and actions are numbered densely, and each level keeps the conditions and
+actions it holds, and the mutexes of each, as integer bitsets, so a level is
+built with a few integer operations per action and condition. Levels only
+grow until the graph levels off, when a level has the same conditions and
+mutexes as the level before it; from then on the same level is reused.
+
+Plans are extracted by searching backward from the goals at the last level:
+each goal is assigned an action adding it which is not mutex with those
+already chosen, trying its no-op first, and the preconditions of the chosen
+actions become the goals at the level below. Sets of goals which cannot be
+achieved at a level are memoized as no-goods, and are not searched again. The
+actions chosen at each level can be applied in any order, so the plan found
+is a shortest parallel plan: a shortest sequence of such steps.
+
+If the graph has levelled off and a search adds no new no-goods at the level
+where it levelled off, the problem has no solution (Blum and Furst, 1997).
+
+"""
+
+
+def _indices(mask):
+    """Generate the positions of the bits set in a mask, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class Level(object):
+    """A level of conditions of a planning graph, with the actions leading to
+    it from the level before.
+
+    """
+
+    __slots__ = ('props', 'prop_mutex', 'actions', 'action_mutex',
+                 'achievers')
+
+    def __init__(self, props, prop_mutex, actions=0, action_mutex=None,
+                 achievers=None):
+        """
+        :param int props: Bitset of the conditions of the level.
+        :param list prop_mutex: For each condition, the bitset of the
+            conditions mutex with it.
+        :param int actions: Bitset of the actions leading to the level.
+        :param dict action_mutex: For each of those actions, the bitset of
+            the actions mutex with it.
+        :param list achievers: For each condition, the bitset of those
+            actions which add it.
+
+        """
+        self.props = props
+        self.prop_mutex = prop_mutex
+        self.actions = actions
+        self.action_mutex = {} if action_mutex is None else action_mutex
+        self.achievers = achievers
+
+
+class PlanningGraph(object):
+    """The planning graph of a problem, extended one level at a time."""
+
+    def __init__(self, problem):
+        """
+        :type  problem: :class:`problem.Problem`
+        :param problem: The problem to build the graph of. Every operation
+            must be ground (see :func:`problem.Problem.ground`).
+
+        """
+        self.conditions = sorted(problem.conditions(), key=lambda c: c.id)
+        position = dict((cond, i) for i, cond in enumerate(self.conditions))
+        self.size = size = len(self.conditions)
+
+        def dense(conditions):
+            return sum(1 << position[cond] for cond in conditions)
+
+        # actions are the operations, in a fixed order, then the no-op of
+        # each condition; adding a condition takes precedence over deleting it
+        self.ops = sorted(problem.ops, key=lambda op: op.action)
+        self.noop_base = len(self.ops)
+        self.pre = [dense(op.preconditions) for op in self.ops]
+        self.add = [dense(op.add_list) for op in self.ops]
+        self.dele = [dense(op.del_list) & ~self.add[a]
+                     for a, op in enumerate(self.ops)]
+        for p in range(size):
+            self.pre.append(1 << p)
+            self.add.append(1 << p)
+            self.dele.append(0)
+
+        # for each condition, the actions which require, add or delete it
+        self.consumers = [0] * size
+        self.adders = [0] * size
+        self.deleters = [0] * size
+        self.free = 0  # actions without preconditions
+        for a in range(len(self.pre)):
+            bit = 1 << a
+            if not self.pre[a]:
+                self.free |= bit
+            for p in _indices(self.pre[a]):
+                self.consumers[p] |= bit
+            for p in _indices(self.add[a]):
+                self.adders[p] |= bit
+            for p in _indices(self.dele[a]):
+                self.deleters[p] |= bit
+
+        self.goals = dense(problem.goals)
+        self.levels = [Level(dense(problem.state), [0] * size)]
+        self.levelled = None  # index of the level where the graph levelled off
+        self.nogoods = {}  # level -> goal sets which cannot be achieved there
+
+    def __len__(self):
+        return len(self.levels)
+
+    def reachable(self, goals, k):
+        """Determine if a set of goals all hold, and are not pairwise mutex,
+        at a level.
+
+        :param int goals: Bitset of the goals, numbered as in the graph.
+        :param int k: The level.
+        :rtype:  bool
+
+        """
+        level = self.levels[k]
+        if goals & ~level.props:
+            return False
+        return not any(level.prop_mutex[p] & goals for p in _indices(goals))
+
+    def expand(self):
+        """Add the next level to the graph.
+
+        :rtype:  :class:`Level`
+        :return: The new level.
+
+        """
+        last = self.levels[-1]
+        if self.levelled is not None:
+            self.levels.append(last)
+            return last
+
+        props, prop_mutex = last.props, last.prop_mutex
+        pre, add, dele = self.pre, self.add, self.dele
+        consumers, adders, deleters = self.consumers, self.adders, self.deleters
+
+        # actions whose preconditions hold and are pairwise not mutex; no-ops
+        # are numbered by condition, so those of the props are a shifted copy
+        candidates = self.free
+        for p in _indices(props):
+            candidates |= consumers[p]
+        actions = props << self.noop_base
+        for a in _indices(candidates & ((1 << self.noop_base) - 1)):
+            need = pre[a]
+            if need & ~props:
+                continue
+            if any(prop_mutex[p] & need for p in _indices(need)):
+                continue
+            actions |= 1 << a
+
+        # actions which require a condition mutex with each condition
+        competing = {}
+        for p in _indices(props):
+            if prop_mutex[p]:
+                row = 0
+                for q in _indices(prop_mutex[p]):
+                    row |= consumers[q]
+                competing[p] = row & actions
+
+        action_mutex = {}
+        for a in _indices(actions):
+            row = 0
+            for p in _indices(dele[a]):  # a interferes with these
+                row |= consumers[p] | adders[p]
+            for p in _indices(pre[a] | add[a]):  # these interfere with a
+                row |= deleters[p]
+            for p in _indices(pre[a]):
+                row |= competing.get(p, 0)
+            action_mutex[a] = row & actions & ~(1 << a)
+
+        achievers = [0] * self.size
+        next_props = 0
+        for p in range(self.size):
+            achieved = adders[p] & actions
+            if achieved:
+                achievers[p] = achieved
+                next_props |= 1 << p
+
+        # the actions compatible with some achiever of each condition; two
+        # conditions are mutex if no achiever of one is compatible with any
+        # achiever of the other
+        props_list = list(_indices(next_props))
+        compatible = {}
+        for p in props_list:
+            row = 0
+            for a in _indices(achievers[p]):
+                row |= ~action_mutex[a]
+            compatible[p] = row & actions
+
+        next_mutex = [0] * self.size
+        for i, p in enumerate(props_list):
+            row = next_mutex[p]
+            compatible_p = compatible[p]
+            for q in props_list[i + 1:]:
+                if not achievers[q] & compatible_p:
+                    row |= 1 << q
+                    next_mutex[q] |= 1 << p
+            next_mutex[p] = row
+
+        level = Level(next_props, next_mutex, actions, action_mutex,
+                      achievers)
+        self.levels.append(level)
+        if next_props == props and next_mutex == prop_mutex:
+            self.levelled = len(self.levels) - 1
+        return level
+
+    def extract(self, budget):
+        """Search backward from the goals at the last level for a plan.
+
+        :type  budget: :class:`budget.Budget`
+        :param budget: The budget to charge each action chosen to.
+        :rtype:  list of list of :class:`problem.Operation` or None
+        :return: The steps of the plan, each a list of operations which can
+            be applied in any order, or None if the goals cannot be achieved
+            at the last level.
+        :raise BudgetExceeded: If the budget runs out.
+
+        """
+        top = len(self.levels) - 1
+        if not self.reachable(self.goals, top):
+            return None
+        if top == 0:
+            return []
+
+        # frames are (level, goals, assignments of actions to the goals);
+        # chosen[i] is the assignment being tried by frame i
+        frames = [(top, self.goals, self._assignments(self.goals, top,
+                                                      budget))]
+        chosen = []
+        while frames:
+            k, goals, assignments = frames[-1]
+            actions = next(assignments, None)
+            if actions is None:
+                self.nogoods.setdefault(k, set()).add(goals)
+                frames.pop()
+                if chosen:
+                    chosen.pop()
+                continue
+
+            if k == 1:
+                chosen.append(actions)
+                return [self._operations(step) for step in reversed(chosen)]
+
+            subgoals = 0
+            for a in _indices(actions):
+                subgoals |= self.pre[a]
+            if subgoals in self.nogoods.get(k - 1, ()):
+                continue
+            chosen.append(actions)
+            frames.append((k - 1, subgoals,
+                           self._assignments(subgoals, k - 1, budget)))
+        return None
+
+    def _assignments(self, goals, k, budget):
+        """Generate the sets of pairwise non-mutex actions at a level which
+        add all of some goals, as bitsets of actions.
+
+        """
+        level = self.levels[k]
+        goal_list = list(_indices(goals))
+        add = self.add
+        # frames are [goal index, actions, added, excluded, options, next]
+        frames = [[0, 0, 0, 0, None, 0]]
+        while frames:
+            frame = frames[-1]
+            i, actions, added, excluded, options, pos = frame
+            if options is None:
+                while i < len(goal_list) and added >> goal_list[i] & 1:
+                    i += 1  # already added by a chosen action
+                if i == len(goal_list):
+                    frames.pop()
+                    yield actions
+                    continue
+
+                goal = goal_list[i]
+                frame[0] = i
+                candidates = level.achievers[goal] & ~excluded
+                noop = self.noop_base + goal
+                options = frame[4] = list(_indices(candidates & ~(1 << noop)))
+                if candidates >> noop & 1:
+                    options.insert(0, noop)
+
+            if pos == len(options):
+                frames.pop()
+                continue
+            frame[5] = pos + 1
+            a = options[pos]
+            budget.charge()
+            frames.append([i + 1, actions | (1 << a), added | add[a],
+                           excluded | level.action_mutex[a], None, 0])
+
+    def _operations(self, actions):
+        return [self.ops[a] for a in _indices(actions) if a < self.noop_base]
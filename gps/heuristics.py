@@ -0,0 +1,476 @@
+"""
+Domain-independent heuristics for informed search over a
+:class:`problem.Problem`. All of them are computed on the delete relaxation of
+the problem, in which operations only add conditions and never delete them:
+
+*   h_max: the cost of the most expensive goal in the relaxation (admissible)
+*   h_add: the sum of the costs of the goals in the relaxation
+*   h_ff: the number of operations in a relaxed plan extracted from the best
+    supporters found while computing h_add (as in the FF planner)
+
+Every operation costs 1. States are given as integer bitsets (see
+:class:`problem.BitState`). A heuristic value of None means the goals cannot
+be reached from the state even in the relaxation, so the state is a dead end.
+
+:class:RelaxedProblem evaluates heuristics one state at a time in pure Python.
+If NumPy is installed, :class:VectorRelaxedProblem evaluates h_max and h_add
+for whole batches of states at once with array operations.
+
+"""
+import heapq
+
+from problem import Condition, bitmask
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class RelaxedProblem(object):
+    """The delete relaxation of a problem, compiled for fast evaluation of
+    heuristics from many states.
+
+    """
+
+    def __init__(self, problem, goals=None):
+        """
+        :type  problem: :class:`problem.Problem`
+        :param problem: The problem to relax.
+        :type  goals: collection of :class:`problem.Condition`
+        :param goals: The goals to estimate the cost of. Defaults to the goals
+            of the problem.
+
+        """
+        self.ops = list(problem.ops)
+        self.goal_ids = sorted(cond.id for cond in
+                               (problem.goals if goals is None else goals))
+
+        self.pre_count = [len(op.preconditions) for op in self.ops]
+        self.adds = [[cond.id for cond in op.add_list] for op in self.ops]
+        self.free_ops = [i for i, count in enumerate(self.pre_count)
+                         if count == 0]
+
+        # ops indexed by each of their preconditions
+        self.consumers = {}
+        for i, op in enumerate(self.ops):
+            for cond in op.preconditions:
+                self.consumers.setdefault(cond.id, []).append(i)
+
+    def costs(self, bits, combine):
+        """Compute the relaxed cost of every condition reachable from a state.
+
+        :param int bits: The state to compute costs from.
+        :param function combine: How to combine the costs of an operation's
+            preconditions: :func:`max` for h_max, addition for h_add.
+        :rtype:  (dict, dict)
+        :return: The cost of each reachable condition id, and the best
+            supporting operation index of each condition not in the state.
+
+        """
+        cost = {}
+        heap = []
+        while bits:
+            low = bits & -bits
+            cond_id = low.bit_length() - 1
+            cost[cond_id] = 0
+            heap.append((0, cond_id))
+            bits ^= low
+
+        supporter = {}
+        unsatisfied = list(self.pre_count)
+        op_cost = [0] * len(self.ops)
+        adds = self.adds
+        consumers = self.consumers
+
+        def relax(op_index, cost_of_pre):
+            new_cost = cost_of_pre + 1
+            for added in adds[op_index]:
+                if new_cost < cost.get(added, new_cost + 1):
+                    cost[added] = new_cost
+                    supporter[added] = op_index
+                    heapq.heappush(heap, (new_cost, added))
+
+        for op_index in self.free_ops:
+            relax(op_index, 0)
+
+        # goals still to be popped; once all are final we can stop early
+        remaining = set(self.goal_ids)
+        while heap and remaining:
+            cond_cost, cond_id = heapq.heappop(heap)
+            if cond_cost > cost[cond_id]:
+                continue  # stale entry
+            remaining.discard(cond_id)
+            for op_index in consumers.get(cond_id, ()):
+                op_cost[op_index] = combine(op_cost[op_index], cond_cost)
+                unsatisfied[op_index] -= 1
+                if unsatisfied[op_index] == 0:
+                    relax(op_index, op_cost[op_index])
+
+        return cost, supporter
+
+    def h_max(self, bits):
+        """Estimate the cost of reaching the goals by the most expensive goal.
+
+        :param int bits: The state to estimate from.
+        :rtype:  int or None
+
+        """
+        cost, _ = self.costs(bits, max)
+        try:
+            return max([cost[goal] for goal in self.goal_ids] or [0])
+        except KeyError:
+            return None
+
+    def h_add(self, bits):
+        """Estimate the cost of reaching the goals by the sum of their costs.
+
+        :param int bits: The state to estimate from.
+        :rtype:  int or None
+
+        """
+        cost, _ = self.costs(bits, _add)
+        try:
+            return sum(cost[goal] for goal in self.goal_ids)
+        except KeyError:
+            return None
+
+    def h_ff(self, bits):
+        """Estimate the cost of reaching the goals by the length of a relaxed
+        plan.
+
+        :param int bits: The state to estimate from.
+        :rtype:  int or None
+
+        """
+        relaxed_plan = self.relaxed_plan(bits)
+        return None if relaxed_plan is None else len(relaxed_plan)
+
+    def relaxed_plan(self, bits):
+        """Extract a plan for the relaxed problem by chaining back from the
+        goals through their best supporters under h_add.
+
+        :param int bits: The state to plan from.
+        :rtype:  set of int or None
+        :return: The indexes of the operations in the relaxed plan, or None
+            if the goals are unreachable.
+
+        """
+        cost, supporter = self.costs(bits, _add)
+        if any(goal not in cost for goal in self.goal_ids):
+            return None
+
+        plan = set()
+        seen = set()
+        open_conds = list(self.goal_ids)
+        while open_conds:
+            cond_id = open_conds.pop()
+            if cond_id in seen or cond_id not in supporter:
+                continue  # already handled or true in the state
+            seen.add(cond_id)
+            op_index = supporter[cond_id]
+            if op_index not in plan:
+                plan.add(op_index)
+                open_conds.extend(
+                    cond.id for cond in self.ops[op_index].preconditions)
+
+        return plan
+
+    def heuristic(self, name):
+        """Look up a heuristic by name.
+
+        :param str name: One of 'max', 'add' or 'ff'.
+        :rtype:  function
+        :return: A function from state bits to a heuristic value or None.
+        :raise ValueError: If there is no heuristic with the given name.
+
+        """
+        if name not in HEURISTICS:
+            raise ValueError('Unknown heuristic: {}'.format(name))
+        return getattr(self, 'h_' + name)
+
+    def batch_heuristic(self, name):
+        """Look up a heuristic by name, for evaluation on batches of states.
+
+        :param str name: One of 'max', 'add' or 'ff'.
+        :rtype:  function
+        :return: A function from a list of state bits to a list of heuristic
+            values, with None for dead ends.
+        :raise ValueError: If there is no heuristic with the given name.
+
+        """
+        heuristic = self.heuristic(name)
+        return lambda states: [heuristic(bits) for bits in states]
+
+
+def _add(x, y):
+    return x + y
+
+
+def _csr(rows):
+    """Pack lists of column indexes into compressed sparse row arrays.
+
+    :rtype:  (:class:`numpy.ndarray`, :class:`numpy.ndarray`)
+    :return: The row pointers (one more than the number of rows) and the
+        concatenated column indexes.
+
+    """
+    ptr = np.zeros(len(rows) + 1, dtype=np.intp)
+    ptr[1:] = np.cumsum([len(row) for row in rows])
+    idx = np.fromiter((col for row in rows for col in row), dtype=np.intp,
+                      count=ptr[-1])
+    return ptr, idx
+
+
+class VectorRelaxedProblem(object):
+    """The delete relaxation of a problem, compiled into sparse precondition,
+    add and delete matrices over the conditions of the problem so that h_max
+    and h_add can be computed for many states at once with NumPy.
+
+    Costs are computed by iterating the relaxed Bellman equations to a
+    fixpoint over a (states x conditions) cost array, so each iteration costs
+    a few array operations over the nonzeros of the matrices no matter how
+    many states are being evaluated. Unreachable conditions cost infinity.
+
+    """
+
+    def __init__(self, problem, goals=None):
+        """
+        :type  problem: :class:`problem.Problem`
+        :param problem: The problem to relax.
+        :type  goals: collection of :class:`problem.Condition`
+        :param goals: The goals to estimate the cost of. Defaults to the goals
+            of the problem.
+        :raise ImportError: If NumPy is not installed.
+
+        """
+        if np is None:
+            raise ImportError('VectorRelaxedProblem requires NumPy')
+
+        goals = problem.goals if goals is None else goals
+        self.ops = list(problem.ops)
+
+        conditions = set(goals) | set(problem.state)
+        for op in self.ops:
+            conditions.update(op.preconditions, op.add_list, op.del_list)
+
+        # columns are the conditions of the problem, in order of interned id
+        self.conditions = sorted(conditions, key=lambda cond: cond.id)
+        column = dict((cond.id, col) for col, cond in
+                      enumerate(self.conditions))
+        self.ids = np.array([cond.id for cond in self.conditions],
+                            dtype=np.intp)
+        self.mask = bitmask(self.conditions)
+        self.goal_columns = np.array(sorted(column[cond.id] for cond in goals),
+                                     dtype=np.intp)
+
+        self.pre_ptr, self.pre_idx = _csr(
+            [[column[cond.id] for cond in op.preconditions] for op in self.ops])
+        self.add_ptr, self.add_idx = _csr(
+            [[column[cond.id] for cond in op.add_list] for op in self.ops])
+        self.del_ptr, self.del_idx = _csr(
+            [[column[cond.id] for cond in op.del_list] for op in self.ops])
+
+        # segments of pre_idx belonging to ops with at least one precondition,
+        # for reducing precondition costs into op costs with reduceat
+        pre_counts = np.diff(self.pre_ptr)
+        self.ops_with_pre = np.flatnonzero(pre_counts)
+        self.pre_starts = self.pre_ptr[:-1][self.ops_with_pre]
+
+        # (condition, op) add pairs sorted by condition, for reducing op costs
+        # into the cheapest achiever cost of each condition with reduceat
+        add_ops = np.repeat(np.arange(len(self.ops), dtype=np.intp),
+                            np.diff(self.add_ptr))
+        order = np.argsort(self.add_idx, kind='mergesort')
+        self.achiever_ops = add_ops[order]
+        added = self.add_idx[order]
+        self.achieved, self.achiever_starts = np.unique(added,
+                                                        return_index=True)
+
+    def matrices(self):
+        """Build the dense (ops x conditions) boolean precondition, add and
+        delete matrices. Columns are ordered as :attr:`conditions`.
+
+        :rtype:  tuple of 3 :class:`numpy.ndarray`
+
+        """
+        dense = []
+        for ptr, idx in ((self.pre_ptr, self.pre_idx),
+                         (self.add_ptr, self.add_idx),
+                         (self.del_ptr, self.del_idx)):
+            matrix = np.zeros((len(self.ops), len(self.conditions)),
+                              dtype=bool)
+            rows = np.repeat(np.arange(len(self.ops)), np.diff(ptr))
+            matrix[rows, idx] = True
+            dense.append(matrix)
+        return tuple(dense)
+
+    def states_array(self, states):
+        """Convert integer bitset states into a (states x conditions) boolean
+        array. Conditions outside of the problem are ignored.
+
+        :param list states: The state bits to convert.
+        :rtype:  :class:`numpy.ndarray`
+
+        """
+        if not len(states):
+            return np.zeros((0, len(self.conditions)), dtype=bool)
+
+        if hasattr(int, 'to_bytes'):
+            nbytes = (int(self.ids[-1]) + 8) // 8 if len(self.ids) else 1
+            raw = b''.join((bits & self.mask).to_bytes(nbytes, 'little')
+                           for bits in states)
+            by_id = np.unpackbits(
+                np.frombuffer(raw, dtype=np.uint8).reshape(len(states), -1),
+                axis=1, bitorder='little')
+            return by_id[:, self.ids].astype(bool)
+
+        array = np.zeros((len(states), len(self.conditions)), dtype=bool)
+        column = dict((cond_id, col) for col, cond_id in enumerate(self.ids))
+        for row, bits in enumerate(states):
+            array[row, [column[cond.id] for cond in
+                        Condition.from_bits(bits & self.mask)]] = True
+        return array
+
+    def costs(self, states, reduce_pre):
+        """Compute the relaxed cost of every condition from each of a batch of
+        states.
+
+        :param list states: The state bits to compute costs from.
+        :param reduce_pre: The ufunc combining the costs of an operation's
+            preconditions: :data:`numpy.maximum` for h_max, :data:`numpy.add`
+            for h_add.
+        :rtype:  :class:`numpy.ndarray`
+        :return: A (states x conditions) float32 array of costs.
+
+        """
+        # work on (conditions x states) arrays, so that gathering and reducing
+        # the costs of conditions operates on contiguous rows, in chunks of
+        # states small enough for the working arrays to stay in cache
+        cost = np.where(self.states_array(states).T, np.float32(0), np.inf)
+        cost = cost.astype(np.float32)
+        if len(self.achieved):
+            for start in range(0, cost.shape[1], BATCH_CHUNK):
+                chunk = cost[:, start:start + BATCH_CHUNK]
+                chunk[...] = self._fixpoint(chunk.copy(), reduce_pre)
+        return cost.T
+
+    def _fixpoint(self, cost, reduce_pre):
+        # only states whose costs changed in the last iteration can change in
+        # the next one, so converged states drop out of the computation
+        active = np.arange(cost.shape[1])
+        op_cost = np.zeros((len(self.ops), cost.shape[1]), dtype=np.float32)
+        for _ in range(len(self.conditions) + 1):
+            sub_cost = cost[:, active] if len(active) < cost.shape[1] else cost
+            sub_op_cost = op_cost[:, :len(active)]
+            if len(self.ops_with_pre):
+                sub_op_cost[self.ops_with_pre] = reduce_pre.reduceat(
+                    sub_cost[self.pre_idx], self.pre_starts, axis=0)
+
+            best = np.minimum.reduceat(sub_op_cost[self.achiever_ops],
+                                       self.achiever_starts, axis=0)
+            best += 1
+            current = sub_cost[self.achieved]
+            improved = best < current
+            changed = improved.any(axis=0)
+            if not changed.any():
+                break
+
+            np.copyto(current, best, where=improved)
+            sub_cost[self.achieved] = current
+            if sub_cost is not cost:
+                cost[:, active] = sub_cost
+            active = active[changed]
+
+        return cost
+
+    def h_max_batch(self, states):
+        """Compute h_max for a batch of states.
+
+        :param list states: The state bits to estimate from.
+        :rtype:  :class:`numpy.ndarray`
+        :return: The heuristic values, infinite for dead ends.
+
+        """
+        cost = self.costs(states, np.maximum)[:, self.goal_columns]
+        return cost.max(axis=1, initial=0.0)
+
+    def h_add_batch(self, states):
+        """Compute h_add for a batch of states.
+
+        :param list states: The state bits to estimate from.
+        :rtype:  :class:`numpy.ndarray`
+        :return: The heuristic values, infinite for dead ends.
+
+        """
+        return self.costs(states, np.add)[:, self.goal_columns].sum(axis=1)
+
+    def h_max(self, bits):
+        """Estimate the cost of reaching the goals by the most expensive goal.
+
+        :param int bits: The state to estimate from.
+        :rtype:  int or None
+
+        """
+        return _to_values(self.h_max_batch([bits]))[0]
+
+    def h_add(self, bits):
+        """Estimate the cost of reaching the goals by the sum of their costs.
+
+        :param int bits: The state to estimate from.
+        :rtype:  int or None
+
+        """
+        return _to_values(self.h_add_batch([bits]))[0]
+
+    def reachable(self, states):
+        """Find the conditions reachable in the relaxation from each of a
+        batch of states.
+
+        :param list states: The state bits to compute reachability from.
+        :rtype:  :class:`numpy.ndarray`
+        :return: A (states x conditions) boolean array.
+
+        """
+        return np.isfinite(self.costs(states, np.maximum))
+
+    def heuristic(self, name):
+        """Look up a heuristic by name.
+
+        :param str name: One of 'max' or 'add'.
+        :rtype:  function
+        :return: A function from state bits to a heuristic value or None.
+        :raise ValueError: If there is no vectorized heuristic with the given
+            name.
+
+        """
+        if name not in VECTOR_HEURISTICS:
+            raise ValueError('Unknown vectorized heuristic: {}'.format(name))
+        return getattr(self, 'h_' + name)
+
+    def batch_heuristic(self, name):
+        """Look up a heuristic by name, for evaluation on batches of states.
+
+        :param str name: One of 'max' or 'add'.
+        :rtype:  function
+        :return: A function from a list of state bits to a list of heuristic
+            values, with None for dead ends.
+        :raise ValueError: If there is no vectorized heuristic with the given
+            name.
+
+        """
+        if name not in VECTOR_HEURISTICS:
+            raise ValueError('Unknown vectorized heuristic: {}'.format(name))
+        batch = getattr(self, 'h_{}_batch'.format(name))
+        return lambda states: _to_values(batch(states))
+
+
+def _to_values(array):
+    return [int(value) if value != np.inf else None for value in array]
+
+
+# number of states whose costs VectorRelaxedProblem computes together
+BATCH_CHUNK = 64
+
+HEURISTICS = ('max', 'add', 'ff')
+VECTOR_HEURISTICS = ('max', 'add')
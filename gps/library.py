@@ -0,0 +1,248 @@
+"""
+A persistent library of the subplans found for goals, shared across problems.
+
+Problems from the same domain tend to repeat goals from similar start states,
+and the subplan found for a goal in one solve usually works again in the next.
+After each successful solve, a means-ends GPS given a :class:`PlanLibrary`
+records the subplan it found for each goal, taken from its solution history.
+Before searching for a goal, it looks the goal up in the library and replays
+the stored subplans from its local state; the first one which can be executed
+and achieves the goal is used instead of searching.
+
+An entry is keyed by the goal and the actions of its subplan, and records the
+conditions the subplan needs from the state it starts from: those of its
+preconditions which no earlier operation of the subplan adds. That is the part
+of the initial state relevant to the subplan, and an entry is only replayed
+from states which hold all of it. Entries refer to conditions and operations
+by name, so they apply to any problem with operations of the same names;
+replaying checks every precondition, so a stale or foreign entry is never used
+wrongly. The operations of a :class:`lifted.LiftedProblem` are ground as the
+entries using them are replayed.
+
+The library holds at most max_entries entries, evicting the least recently
+used, and is stored as a JSON file.
+
+"""
+import os
+import json
+import logging
+import tempfile
+from collections import OrderedDict
+
+from problem import Condition, bitmask
+from executor import CompiledPlan
+
+
+LIBRARY_FORMAT = 1
+DEFAULT_PATH = os.path.join('~', '.cache', 'gps', 'library.json')
+DEFAULT_MAX_ENTRIES = 10000
+
+
+class PlanLibrary(object):
+    """Library of the subplans found for goals, keyed by goal and bounded in
+    size by evicting the least recently used entry.
+
+    """
+
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        :param str path: The file to load the library from, if it exists,
+            and to save it to. By default the library is only kept in memory.
+        :param int max_entries: The maximum number of entries to hold.
+
+        """
+        if max_entries < 1:
+            raise ValueError(
+                'max_entries must be positive, got {}'.format(max_entries))
+
+        self.path = None if path is None else os.path.expanduser(path)
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (goal, actions) -> required conditions
+        self._by_goal = {}  # goal name -> keys of its entries, oldest first
+        self._masks = {}  # key -> bits of the required conditions
+        self.changed = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.path is not None:
+            self.load()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def recall(self, goal, bits, problem, accept):
+        """Find a stored subplan for a goal which can be used from a state,
+        trying the most recently used first. Only subplans whose required
+        conditions hold in the state and whose operations are all
+        operations of the problem are offered.
+
+        :type  goal: :class:`problem.Condition`
+        :param goal: The goal to find a subplan for.
+        :param int bits: Bitset of the state the subplan would start from.
+        :type  problem: :class:`problem.Problem`
+        :param problem: The problem whose operations the subplan must use.
+        :param accept: Function called with the operations of each subplan
+            offered, returning True if it is used.
+        :rtype:  list of :class:`problem.Operation` or None
+        :return: The operations of the subplan used, or None if none was.
+
+        """
+        keys = self._by_goal.get(goal.name)
+        if keys:
+            for key in reversed(keys):
+                mask = self._masks.get(key)
+                if mask is None:
+                    mask = self._masks[key] = bitmask(
+                        Condition(name) for name in self.entries[key])
+                if mask & ~bits:
+                    continue
+
+                ops = self._resolve(key[1], problem)
+                if ops is not None and accept(ops):
+                    self._touch(key)
+                    self.hits += 1
+                    return ops
+
+        self.misses += 1
+        return None
+
+    def _resolve(self, actions, problem):
+        ops = []
+        for action in actions:
+            op = problem.operation(action)
+            if op is None:
+                return None
+            ops.append(op)
+        return ops
+
+    def _touch(self, key):
+        required = self.entries.pop(key)
+        self.entries[key] = required
+        keys = self._by_goal[key[0]]
+        keys.remove(key)
+        keys.append(key)
+
+    def record(self, subplans):
+        """Store the subplans found for some goals. Subplans which are empty,
+        cannot be executed from any state, or do not achieve their goal are
+        not stored.
+
+        :param subplans: The (goal, subplan) pairs to store. The subplan is a
+            sequence of :class:`problem.Operation`, or None.
+        :rtype:  int
+        :return: The number of subplans stored which were not already.
+
+        """
+        stored = 0
+        for goal, ops in subplans:
+            if not ops:
+                continue
+            key = (goal.name, tuple(op.action for op in ops))
+            if key in self.entries:
+                self._touch(key)
+                continue
+
+            compiled = CompiledPlan(ops)
+            if compiled.blocked is not None or goal.bit & compiled.cleared:
+                continue
+            if not goal.bit & (compiled.added | compiled.required):
+                continue
+
+            while len(self.entries) >= self.max_entries:
+                self._evict()
+            self._add(key, tuple(cond.name for cond in
+                                 Condition.from_bits(compiled.required)))
+            self._masks[key] = compiled.required
+            stored += 1
+
+        if stored:
+            self.changed = True
+        return stored
+
+    def _add(self, key, required):
+        self.entries[key] = required
+        self._by_goal.setdefault(key[0], []).append(key)
+
+    def _evict(self):
+        key, _ = self.entries.popitem(last=False)
+        self._masks.pop(key, None)
+        keys = self._by_goal[key[0]]
+        keys.remove(key)
+        if not keys:
+            del self._by_goal[key[0]]
+        self.evictions += 1
+        self.changed = True
+
+    def clear(self):
+        """Remove all entries and reset the counters."""
+        self.entries.clear()
+        self._by_goal.clear()
+        self._masks.clear()
+        self.changed = True
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def load(self, path=None):
+        """Load the entries stored in a file, replacing those held. A missing
+        or unreadable file leaves the library empty.
+
+        :param str path: The file to load. Defaults to the path of the
+            library.
+
+        """
+        path = self.path if path is None else os.path.expanduser(path)
+        self.clear()
+        self.changed = False
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            if data['format'] != LIBRARY_FORMAT:
+                raise ValueError('unknown format {}'.format(data['format']))
+            entries = data['entries'][-self.max_entries:]
+            for goal, actions, required in entries:
+                self._add((goal, tuple(actions)), tuple(required))
+        except Exception as err:  # missing, incompatible or corrupt file
+            logging.debug('plan library not loaded from {}: {}'.format(
+                path, err))
+            self.clear()
+            self.changed = False
+
+    def save(self, path=None):
+        """Store the entries in a file, least recently used first, if they
+        changed since they were last loaded or saved.
+
+        :param str path: The file to store them in. Defaults to the path of
+            the library.
+
+        """
+        path = self.path if path is None else os.path.expanduser(path)
+        if path is None:
+            raise ValueError('the library has no path to save to')
+        if not self.changed and path == self.path:
+            return
+
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        data = {'format': LIBRARY_FORMAT,
+                'entries': [[goal, list(actions), list(required)]
+                            for (goal, actions), required
+                            in self.entries.items()]}
+
+        # write to a temporary file and rename it so that concurrent readers
+        # never see a partially written library
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            os.rename(tmp_path, path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        if path == self.path:
+            self.changed = False
@@ -0,0 +1,382 @@
+"""
+Lifted problems, whose operations are described by parameterized schemas over
+typed objects and ground only when a solver asks for them.
+
+Conditions are predicates applied to objects, like at(door) or
+chair-at(middle-room). They are ordinary interned :class:`problem.Condition`
+objects, named by :func:`atom`; predicates without arguments are named by the
+predicate alone, so they mix freely with hand-written conditions.
+
+A :class:`Schema` describes a family of operations, like
+
+    Schema('walk', [('?from', 'room'), ('?to', 'room')],
+           [('at', '?from'), ('on-floor',)], [('at', '?to')],
+           [('at', '?from')], distinct=[('?from', '?to')])
+
+where each literal is a predicate followed by its arguments, which are either
+parameters of the schema (conventionally starting with '?') or objects. A
+:class:`LiftedProblem` grounds the schemas lazily: when a solver asks for the
+achievers of a goal, the add-list literals of each schema are unified with the
+goal, and only the instantiations which add the goal are built. Memory and
+time then grow with the part of the domain the search touches, rather than
+with every combination of objects.
+
+"""
+import re
+import itertools
+
+from problem import Condition, Operation, Problem
+
+
+_ATOM = re.compile(r'^([^()]+)\((.*)\)$')
+
+# characters which would make the name of an atom ambiguous
+_RESERVED = re.compile(r'[(),]')
+
+_parsed = {}  # condition -> (predicate, args)
+
+
+def atom(predicate, *args):
+    """Get the condition for a predicate applied to some objects.
+
+    :param str predicate: The name of the predicate.
+    :param args: The names of the objects.
+    :rtype:  :class:`problem.Condition`
+    :raise ValueError: If the predicate or an object is named with a comma
+        or parenthesis, which would not be parsed back by :func:`parse_atom`.
+
+    """
+    _check_name(predicate)
+    for arg in args:
+        _check_name(arg)
+    return Condition(_atom_name(predicate, args))
+
+
+def _check_name(name):
+    if _RESERVED.search(name):
+        raise ValueError('invalid name {!r}: commas and parentheses are '
+                         'reserved'.format(name))
+
+
+def _atom_name(predicate, args):
+    if not args:
+        return predicate
+    return '{}({})'.format(predicate, ', '.join(args))
+
+
+def parse_atom(cond):
+    """Split a condition into its predicate and arguments.
+
+    :type  cond: :class:`problem.Condition`
+    :rtype:  (str, tuple of str)
+
+    """
+    try:
+        return _parsed[cond]
+    except KeyError:
+        pass
+
+    parsed = _parsed[cond] = _split(cond.name)
+    return parsed
+
+
+def _split(name):
+    match = _ATOM.match(name)
+    if match is None:
+        return (name, ())
+    return (match.group(1), tuple(arg.strip() for arg in
+                                  match.group(2).split(',')))
+
+
+class Schema(object):
+    """A parameterized operation."""
+
+    def __init__(self, action, parameters, preconditions=(), add_list=(),
+                 del_list=(), distinct=()):
+        """
+        :param str action: The name of the action; ground operations are
+            named by applying it to the objects bound to the parameters.
+        :param parameters: The (name, type) pairs of the parameters.
+        :param preconditions: The literals of the preconditions.
+        :param add_list: The literals of the conditions added.
+        :param del_list: The literals of the conditions deleted.
+        :param distinct: Tuples of parameters which must be bound to pairwise
+            different objects.
+        :raise ValueError: If a literal mentions an undeclared parameter, or
+            the action, a parameter, a predicate or an object is named with a
+            comma or parenthesis.
+
+        """
+        self.action = action
+        self.parameters = tuple(name for name, _ in parameters)
+        self.types = dict(parameters)
+        self.preconditions = tuple(tuple(lit) for lit in preconditions)
+        self.add_list = tuple(tuple(lit) for lit in add_list)
+        self.del_list = tuple(tuple(lit) for lit in del_list)
+        self.distinct = tuple(tuple(group) for group in distinct)
+
+        _check_name(action)
+        for name in self.parameters:
+            _check_name(name)
+        for lit in self.preconditions + self.add_list + self.del_list:
+            _check_name(lit[0])
+            for term in lit[1:]:
+                _check_name(term)
+                if term.startswith('?') and term not in self.types:
+                    raise ValueError('{}: undeclared parameter {}'.format(
+                        action, term))
+
+    def __repr__(self):
+        return '{}({})'.format(self.action.upper(), ', '.join(self.parameters))
+
+    def allows(self, binding):
+        """Determine if a complete binding satisfies the distinct
+        constraints.
+
+        :param dict binding: The object bound to each parameter.
+        :rtype:  bool
+
+        """
+        for group in self.distinct:
+            values = [binding[name] for name in group]
+            if len(set(values)) < len(values):
+                return False
+        return True
+
+    def instantiate(self, values):
+        """Build the ground operation for some objects.
+
+        :param tuple values: The objects bound to the parameters, in order.
+        :rtype:  :class:`problem.Operation`
+
+        """
+        binding = dict(zip(self.parameters, values))
+
+        def ground(literals):
+            return [atom(lit[0], *[binding.get(term, term)
+                                   for term in lit[1:]])
+                    for lit in literals]
+
+        return Operation(atom(self.action, *values).name,
+                         ground(self.preconditions), ground(self.add_list),
+                         ground(self.del_list))
+
+
+class LiftedProblem(Problem):
+    """A problem whose operations are ground on demand from schemas. The
+    `ops` of the problem are only those ground so far; use :func:`ground` to
+    get a copy with every operation ground.
+
+    """
+
+    def __init__(self, goals, state, schemas, objects, name='unnamed'):
+        """
+        :type  goals: ordered collection of :class:`problem.Condition`
+        :param goals: The conditions to achieve.
+        :type  state: collection of :class:`problem.Condition`
+        :param state: The conditions that currently stand.
+        :type  schemas: sequence of :class:`Schema`
+        :param schemas: The schemas of the allowable operations, in the order
+            in which their operations are to be considered.
+        :param dict objects: The names of the objects of each type, in the
+            order in which they are to be considered.
+        :raise ValueError: If an object is named with a comma or parenthesis.
+
+        """
+        super(LiftedProblem, self).__init__(goals, state, (), name)
+        self.schemas = list(schemas)
+        self.objects = dict((kind, tuple(names))
+                            for kind, names in objects.items())
+        for names in self.objects.values():
+            for name in names:
+                _check_name(name)
+        self._members = dict((kind, set(names))
+                             for kind, names in self.objects.items())
+        self._ground = {}  # (schema index, objects) -> operation
+        self._added = []  # operations added other than from the schemas
+        self._removed = set()  # operations of the schemas removed
+
+    def _operation(self, index, values):
+        key = (index, values)
+        op = self._ground.get(key)
+        if op is None:
+            op = self._ground[key] = self.schemas[index].instantiate(values)
+            self.ops.add(op)
+        return op
+
+    def _forget(self, op):
+        # the achievers of the conditions an operation adds are found again
+        # the next time they are asked about
+        for cond in op.add_list:
+            self._achievers.pop(cond, None)
+
+    def add_op(self, op):
+        """Add an operation to the allowable operations. It is an achiever
+        of the conditions it adds after those ground from the schemas.
+
+        :type  op: :class:`problem.Operation`
+        :param op: The operation to add.
+
+        """
+        if op in self._removed:
+            self._removed.discard(op)
+            self.ops.add(op)
+        elif op not in self.ops:
+            self.ops.add(op)
+            self._added.append(op)
+        else:
+            return
+        self._forget(op)
+
+    def remove_op(self, op):
+        """Remove an operation from the allowable operations, whether it was
+        added or ground from the schemas; it is not ground again.
+
+        :type  op: :class:`problem.Operation`
+        :param op: The operation to remove.
+        :raise KeyError: If op is not one of the allowable operations.
+
+        """
+        self.ops.remove(op)
+        if op in self._added:
+            self._added.remove(op)
+        else:
+            self._removed.add(op)
+        self._forget(op)
+
+    def achievers(self, goal):
+        """Find the operations which achieve a particular goal, grounding
+        them the first time the goal is asked about. They are ordered by
+        schema, and then by the order of the objects bound to the remaining
+        parameters.
+
+        :type  goal: :class:`problem.Condition`
+        :param goal: The goal to find achievers for.
+        :rtype:  sequence of :class:`problem.Operation`
+
+        """
+        achievers = self._achievers.get(goal)
+        if achievers is None:
+            achievers = self._achievers[goal] = self._ground_achievers(goal)
+        return achievers
+
+    def _ground_achievers(self, goal):
+        predicate, args = parse_atom(goal)
+        achievers = []
+        seen = set()
+        for index, schema in enumerate(self.schemas):
+            for lit in schema.add_list:
+                if lit[0] != predicate or len(lit) - 1 != len(args):
+                    continue
+                binding = self._unify(schema, lit[1:], args)
+                if binding is None:
+                    continue
+
+                free = [name for name in schema.parameters
+                        if name not in binding]
+                domains = [self.objects.get(schema.types[name], ())
+                           for name in free]
+                for values in itertools.product(*domains):
+                    binding.update(zip(free, values))
+                    if not schema.allows(binding):
+                        continue
+                    op = self._operation(index, tuple(
+                        binding[name] for name in schema.parameters))
+                    if op not in seen and op not in self._removed:
+                        seen.add(op)
+                        achievers.append(op)
+        achievers.extend(op for op in self._added
+                         if goal in op.add_list and op not in seen)
+        return achievers
+
+    def operation(self, action):
+        """Find the operation with a particular action name, grounding it if
+        it has not been ground yet.
+
+        :param str action: The name of the action, as named by :func:`atom`.
+        :rtype:  :class:`problem.Operation` or None
+        :return: The operation, or None if no schema has an instantiation
+            with the name.
+
+        """
+        name, values = _split(action)
+        for index, schema in enumerate(self.schemas):
+            if schema.action != name or len(schema.parameters) != len(values):
+                continue
+            binding = dict(zip(schema.parameters, values))
+            if all(value in self._members.get(schema.types[param], ())
+                   for param, value in binding.items()) and \
+                    schema.allows(binding):
+                op = self._operation(index, values)
+                return None if op in self._removed else op
+        for op in self._added:
+            if op.action == action:
+                return op
+        return None
+
+    def condition(self, name):
+        """Find the condition of the problem with a particular name, without
+        interning one which no operation of the problem could mention: the
+        name must be a goal or initial condition, or the atom of a literal of
+        a schema with objects of the right types bound to its parameters.
+
+        :param str name: The name of the condition, as named by :func:`atom`.
+        :rtype:  :class:`problem.Condition` or None
+
+        """
+        for cond in itertools.chain(self.goals, self.state):
+            if cond.name == name:
+                return cond
+
+        predicate, args = _split(name)
+        if _atom_name(predicate, args) != name:
+            return None  # not named as the atom would be
+        for schema in self.schemas:
+            for lit in itertools.chain(schema.preconditions, schema.add_list,
+                                       schema.del_list):
+                if lit[0] == predicate and len(lit) - 1 == len(args) and \
+                        self._unify(schema, lit[1:], args) is not None:
+                    return Condition(name)
+        return None
+
+    def _unify(self, schema, terms, args):
+        binding = {}
+        for term, value in zip(terms, args):
+            if term in schema.types:
+                if binding.setdefault(term, value) != value:
+                    return None
+                if value not in self._members.get(schema.types[term], ()):
+                    return None
+            elif term != value:
+                return None
+        return binding
+
+    def ground(self):
+        """Build a copy of the problem with every operation ground, for
+        solvers which need all of them up front. Operations already ground
+        are shared with the copy; the rest are ground for the copy alone, so
+        the problem itself is left as it was.
+
+        :rtype:  :class:`problem.Problem`
+
+        """
+        ops = []
+        for index, schema in enumerate(self.schemas):
+            domains = [self.objects.get(schema.types[name], ())
+                       for name in schema.parameters]
+            for values in itertools.product(*domains):
+                if schema.allows(dict(zip(schema.parameters, values))):
+                    op = self._ground.get((index, values))
+                    if op is None:
+                        op = schema.instantiate(values)
+                    if op not in self._removed:
+                        ops.append(op)
+        return Problem(self.goals, self.state, ops + self._added, self.name)
+
+    def prune(self):
+        """Prune the fully ground problem (see :func:`problem.Problem.prune`).
+
+        :rtype:  (:class:`problem.Problem`, :class:`problem.PruneReport`)
+
+        """
+        return self.ground().prune()
@@ -0,0 +1,224 @@
+"""
+A declarative problem file format, and a streaming loader and writer for it.
+
+Problem files are JSON lines: every non-blank line is a JSON object describing
+either an operation or a problem. Lines starting with '#' are comments.
+
+    # the "Driving to School" domain
+    {"op": "drive-son-to-school", "pre": ["son-at-home", "car-works"],
+     "add": ["son-at-school"], "del": ["son-at-home"]}
+    {"op": "look-up-number", "pre": ["have-phone-book"],
+     "add": ["know-phone-number"]}
+    {"problem": "drive-son-to-school", "goals": ["son-at-school"],
+     "state": ["son-at-home", "car-needs-battery", "have-money"]}
+
+(each record is on a single line in a file). Operation records hold the name
+of the action and the names of the conditions in its precondition, add and
+delete lists; "pre", "add" and "del" may be omitted when empty. Problem records
+hold the name of the problem and its goals (in the order they are to be
+achieved) and initial state, which may be omitted when empty. Conditions are
+always given as lists of names, even when there is only one. Every problem in a file may use every operation
+in the file, wherever the records appear. Optionally, a conditions record,
+like {"conditions": ["son-at-home", "car-works"]}, declares conditions ahead of
+their use, so that they are interned in that order.
+
+Files are read one line at a time, and conditions and operations are built as
+each line is read, so the raw text of a file is never held in memory.
+
+"""
+import json
+import heapq
+import itertools
+
+from problem import Condition, Operation, Problem
+
+try:
+    _STRING_TYPES = (basestring,)
+except NameError:  # Python 3
+    _STRING_TYPES = (str,)
+
+
+FILE_EXTENSIONS = ('.jsonl',)
+
+# conditions declared per line by :func:`write_problems`, to keep lines short
+CONDITIONS_PER_RECORD = 1000
+
+
+class FormatError(ValueError):
+    """Raise when a problem file is malformed."""
+    pass
+
+
+def _conditions(record, key, required=False):
+    if key not in record:
+        if required:
+            raise FormatError('missing "{}"'.format(key))
+        return []
+    names = record[key]
+    if not isinstance(names, list) or \
+            not all(isinstance(name, _STRING_TYPES) for name in names):
+        raise FormatError('"{}" is not a list of condition names'.format(key))
+    return [Condition(name) for name in names]
+
+
+def _parse(path):
+    """Parse the records of a problem file, building the operations as they
+    are read.
+
+    :rtype:  (list of :class:`problem.Operation`, list of dict)
+    :return: The operations and the problem records.
+    :raise FormatError: If a line is not a valid record.
+
+    """
+    ops = []
+    problems = []
+    with open(path) as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise FormatError('record is not an object')
+                elif 'op' in record:
+                    ops.append(Operation(record['op'],
+                                         _conditions(record, 'pre'),
+                                         _conditions(record, 'add'),
+                                         _conditions(record, 'del')))
+                elif 'conditions' in record:
+                    _conditions(record, 'conditions', True)
+                elif 'problem' in record:
+                    problems.append({
+                        'name': record['problem'],
+                        'goals': _conditions(record, 'goals', True),
+                        'state': _conditions(record, 'state')})
+                else:
+                    raise FormatError('unknown record type')
+            except (ValueError, TypeError, AttributeError) as err:
+                raise FormatError('{}:{}: {}'.format(path, lineno, err))
+
+    return ops, problems
+
+
+def load_problems(path):
+    """Load all problems from a problem file.
+
+    :param str path: The path of the problem file.
+    :rtype:  list of (str, :class:`problem.Problem`)
+    :return: The (name, problem) pairs of the problems in the file, in the
+        order they appear.
+    :raise FormatError: If the file is malformed, or two problems in it have
+        the same name.
+
+    """
+    ops, records = _parse(path)
+
+    instances = []
+    names = set()
+    for record in records:
+        name = record['name']
+        if name in names:
+            raise FormatError('{}: duplicate problem name: {}'.format(
+                path, name))
+        names.add(name)
+        instances.append((name, Problem(record['goals'], record['state'], ops,
+                                        name)))
+
+    return instances
+
+
+def _op_order(problems):
+    """Order the operations shared by some problems so that, when loaded again, the
+    achievers of every condition are indexed in the same order as they are
+    now. The achievers lists of one problem are subsequences of the order its
+    operations were given in, so they can always be ordered topologically;
+    ties are broken by action name. Problems given their operations in
+    different orders may not be.
+
+    :rtype:  list of :class:`problem.Operation`
+    :raise ValueError: If the problems order some achievers differently.
+
+    """
+    successors = dict((op, set()) for op in problems[0].ops)
+    predecessors = dict((op, 0) for op in problems[0].ops)
+    for problem in problems:
+        for achievers in problem._achievers.values():
+            for before, after in zip(achievers, achievers[1:]):
+                if after not in successors.setdefault(before, set()):
+                    successors[before].add(after)
+                    predecessors[after] = predecessors.get(after, 0) + 1
+                predecessors.setdefault(before, 0)
+
+    # heap entries are (action, tie-breaker, op), since ops are not orderable
+    counter = itertools.count()
+    ready = [(op.action, next(counter), op)
+             for op, count in predecessors.items() if not count]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        op = heapq.heappop(ready)[2]
+        order.append(op)
+        for after in successors[op]:
+            predecessors[after] -= 1
+            if not predecessors[after]:
+                heapq.heappush(ready, (after.action, next(counter), after))
+
+    if len(order) != len(successors):
+        raise ValueError('problems written to one file must order the '
+                         'achievers of each condition the same way')
+    return order
+
+
+def write_problems(path, problems):
+    """Write problems to a problem file. The operations are written once, in
+    an order which preserves the order in which solvers consider them.
+
+    :param str path: The path of the problem file to write.
+    :type  problems: collection of :class:`problem.Problem`
+    :param problems: The problems to write. They must all have the same
+        operations, since every problem in a file has every operation.
+    :raise ValueError: If the problems have different operations, or order
+        the achievers of a condition differently.
+
+    """
+    if any(problem.ops != problems[0].ops for problem in problems[1:]):
+        raise ValueError('problems written to one file must have the same '
+                         'operations')
+
+    def names(conditions):
+        return [cond.name for cond in conditions]
+
+    ops = _op_order(problems)
+    conditions = set()
+    for problem in problems:
+        conditions.update(problem.state)
+        conditions.update(problem.goals)
+    for op in ops:
+        conditions.update(op.preconditions)
+        conditions.update(op.add_list)
+        conditions.update(op.del_list)
+
+    with open(path, 'w') as f:
+        # declare the conditions in their current order so that they keep the
+        # same relative ids when loaded
+        ordered = [cond.name for cond in
+                   sorted(conditions, key=lambda cond: cond.id)]
+        for start in range(0, len(ordered), CONDITIONS_PER_RECORD):
+            record = {'conditions':
+                      ordered[start:start + CONDITIONS_PER_RECORD]}
+            f.write(json.dumps(record) + '\n')
+
+        for op in ops:
+            record = {'op': op.action, 'pre': names(op.preconditions),
+                      'add': names(op.add_list)}
+            if op.del_list:
+                record['del'] = names(op.del_list)
+            f.write(json.dumps(record) + '\n')
+
+        for problem in problems:
+            record = {'problem': problem.name,
+                      'goals': [cond.name for cond in problem.goals],
+                      'state': names(problem.state)}
+            f.write(json.dumps(record) + '\n')
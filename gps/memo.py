@@ -0,0 +1,75 @@
+"""
+A bounded transposition table for memoizing the outcome of subproblems the GPS
+has already solved (or failed to solve) during a search.
+
+"""
+from collections import OrderedDict
+
+
+class TranspositionTable(object):
+    """Map from subproblem keys to their outcomes, bounded in size by evicting
+    the least recently used entry. Lookups are counted as hits or misses.
+
+    """
+
+    def __init__(self, size):
+        """
+        :param int size: The maximum number of entries to hold.
+
+        """
+        if size < 1:
+            raise ValueError('size must be positive, got {}'.format(size))
+
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key):
+        """Look up the outcome stored for a key, marking it as most recently
+        used.
+
+        :param key: The hashable key of the subproblem.
+        :return: The stored outcome, or None if there is none.
+
+        """
+        entries = self.entries
+        try:
+            value = entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+
+        entries[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """Store the outcome for a key, evicting the least recently used entry
+        if the table is full.
+
+        :param key: The hashable key of the subproblem.
+        :param value: The outcome to store. Must not be None.
+
+        """
+        entries = self.entries
+        if key in entries:
+            del entries[key]
+        elif len(entries) >= self.size:
+            entries.popitem(last=False)
+            self.evictions += 1
+        entries[key] = value
+
+    def clear(self):
+        """Remove all entries and reset the counters."""
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
@@ -0,0 +1,369 @@
+"""
+A parallel engine which splits the means-ends search of a single problem
+across worker processes.
+
+Means-ends analysis tries the operations appropriate for a goal one after
+another, backtracking out of each that fails; on hard problems most of the
+time goes into or-branches which turn out to be dead ends. The engine picks a
+goal of the problem with several appropriate operations, divides those
+operations into contiguous branches, and has each worker solve the whole
+problem with the goal restricted to the operations of one branch. The first
+valid plan found by any worker is the solution, and the other workers are
+stopped as soon as it is found.
+
+The workers are forked from the solving process, so they share the compiled
+problem (its interned conditions, operation bitmasks and achievers index)
+copy-on-write rather than each building or unpickling its own. Where fork is
+unavailable, the problem is pickled to each worker once, when it starts.
+Plans are sent back as indices into the operations of the problem.
+
+Every branch is queued for the workers up front. Once a plan is found, the
+workers skip the branches left in the queue and cancel the ones they are
+solving, and then exit of their own accord; they are only killed if they do
+not exit in time, since killing a worker while it holds a lock of a queue
+would leave the queue unusable.
+
+"""
+import signal
+import multiprocessing
+
+try:
+    from queue import Empty
+except ImportError:  # Python 2
+    from Queue import Empty
+
+import gps
+from budget import Budget, CancelToken, clock, CANCELLED, TIMEOUT, EXHAUSTED
+from executor import validate_solution
+from stats import SolveStats
+
+# branches to split the search into per worker, so that workers which finish
+# their branches early pick up more
+BRANCHES_PER_WORKER = 4
+
+# number of seconds between checks for cancellation while waiting on workers
+POLL_INTERVAL = 0.05
+
+# number of seconds to wait for the workers to exit once the search is over
+# before killing them
+SHUTDOWN_TIMEOUT = 5.0
+
+
+class WorkerError(RuntimeError):
+    """Raise when a worker process fails or dies before reporting the outcome
+    of its branch."""
+    pass
+
+
+def _context():
+    """Get the multiprocessing context to start workers with, preferring fork
+    so that the problem is shared rather than copied.
+
+    """
+    get_context = getattr(multiprocessing, 'get_context', None)
+    if get_context is None:  # Python 2 always forks on Unix
+        return multiprocessing
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return get_context('fork')
+    return get_context()
+
+
+def restrict_branch(solver, goal, ops):
+    """Restrict the operations a solver may use to achieve a goal of the
+    problem to those of one branch. The restriction applies only where the
+    goal is attempted as a goal of the problem, not as a subgoal of another.
+
+    :type  solver: :class:`gps.GPSv2`
+    :param solver: The solver to restrict.
+    :type  goal: :class:`problem.Condition`
+    :param goal: The goal to restrict.
+    :param ops: The operations of the branch.
+
+    """
+    appropriate_ops = solver.appropriate_ops
+    branch = set(ops)
+
+    def branch_ops(subgoal):
+        found = appropriate_ops(subgoal)
+        # no other goal is being worked on when a goal of the problem is
+        if subgoal is goal and not solver.goal_stack.bits & ~goal.bit:
+            return [op for op in found if op in branch]
+        return found
+
+    solver.appropriate_ops = branch_ops
+
+
+# the problem and solver settings of a worker process, set when it starts
+_worker = {}
+
+
+def _init_worker(problem, ops, version, options, stop):
+    # the solving process handles interrupts and stops the workers through
+    # the stop event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker['problem'] = problem
+    _worker['index'] = dict((op, i) for i, op in enumerate(ops))
+    _worker['version'] = version
+    _worker['options'] = options
+    _worker['stop'] = stop
+
+
+def _run_worker(problem, ops, version, options, stop, tasks, results):
+    _init_worker(problem, ops, version, options, stop)
+    for task in iter(tasks.get, None):
+        if stop.is_set():
+            continue  # drain the branches left once the search is over
+        try:
+            results.put((None, _solve_branch(task)))
+        except Exception as err:
+            results.put(('branch {}: {}: {}'.format(
+                task[0], type(err).__name__, err), None))
+
+
+def _solve_branch(task):
+    branch, goal, start, end, deadline, max_nodes = task
+    problem = _worker['problem']
+    solver = gps.init_gps(_worker['version'], **_worker['options'])
+    restrict_branch(solver, goal, problem.achievers(goal)[start:end])
+
+    timeout = None if deadline is None else deadline - clock()
+    result = solver.run(problem, timeout, max_nodes,
+                        CancelToken(_worker['stop']))
+    index = _worker['index']
+    return (branch, result.status, [index[op] for op in result.plan],
+            result.expanded, result.stats)
+
+
+class ParallelGPS(gps.GPS):
+    """Solver which splits the or-branches of the means-ends search of a
+    problem across worker processes, each running a means-ends GPS (version
+    2, 3 or 5). The plan found is the first valid plan found by any worker,
+    which may not be the plan the GPS would find on its own, since that
+    tries the branches in order.
+
+    When budgeted, the timeout applies to the solve as a whole and the node
+    limit to each branch; the nodes expanded are those of all the branches
+    which finished.
+
+    Plans are validated before they are returned, and a plan which cannot be
+    executed is rejected as a failure, whether it was found by a branch or
+    by the GPS solving in this process. Versions 2 and 3 on their own may
+    return such plans, since they do not check that the preconditions they
+    achieve first still hold, so where they report success with an invalid
+    plan this reports failure.
+
+    """
+
+    def __init__(self, version=gps.DEFAULT_VERSION, workers=None, tracer=None,
+                 **options):
+        """
+        :param int version: The version of GPS the workers use.
+        :param int workers: Number of worker processes. Defaults to the
+            number of CPUs.
+        :type  tracer: :class:`tracing.Tracer`
+        :param tracer: The tracer to record the splitting of the search
+            with. The workers do not trace their reasoning.
+        :param options: Additional keyword arguments for the GPS constructor
+            of the workers.
+        :raise ValueError: If the version is not a means-ends GPS which can be
+            split.
+
+        """
+        super(ParallelGPS, self).__init__(tracer)
+        if not issubclass(gps.solver_class(version), gps.GPSv2):
+            raise ValueError('parallel search requires a means-ends GPS '
+                             '(version 2, 3 or 5)')
+        self.solver_version = version
+        self.workers = workers or multiprocessing.cpu_count()
+        self.options = options
+        self.problem = None
+        self.state = None
+        self.solution = []
+        self.branches = 0
+
+    def split_goal(self, problem):
+        """Choose the goal to split the search on: the first goal of the
+        problem which does not already hold and has more than one appropriate
+        operation.
+
+        :type  problem: :class:`problem.Problem`
+        :rtype:  :class:`problem.Condition` or None
+        :return: The goal, or None if no goal can be split on.
+
+        """
+        for goal in problem.goals:
+            if goal not in problem.state and len(problem.achievers(goal)) > 1:
+                return goal
+        return None
+
+    def solve(self, problem, budget=None):
+        """Solve a particular problem by means-ends analysis split across the
+        worker processes. Problems with no goal to split on, or a single
+        worker, are solved in this process.
+
+        :type  problem: :class:`problem.Problem`
+        :param problem: The problem to solve.
+        :type  budget: :class:`budget.Budget`
+        :param budget: The limits on the work to do. By default there are
+            none. If the problem is not solved, the longest partial plan of
+            any branch is kept.
+        :raise WorkerError: If a worker process fails or dies.
+
+        """
+        self.budget = Budget() if budget is None else budget
+        self.stats = SolveStats()
+        self.problem = problem
+        self.state = problem.state.copy()
+        self.solution = []
+        self.branches = 0
+
+        goal = self.split_goal(problem)
+        if goal is None or self.workers < 2:
+            if self.tracer.enabled:
+                self.tracer.trace('Solving in a single process')
+            solver = gps.init_gps(self.solver_version, tracer=self.tracer,
+                                  **self.options)
+            status = solver.solve(problem, self.budget) or "FAILURE"
+            self.solution = solver.plan()
+            self.stats = solver.stats
+            self.state = solver.state
+            if status == "SUCCESS" and \
+                    not validate_solution(problem, self.solution):
+                if self.tracer.enabled:
+                    self.tracer.trace('Rejecting invalid plan')
+                self.state = problem.state.copy()
+                return "FAILURE"
+            return status
+
+        status = self._search(problem, goal)
+        if status == "SUCCESS":
+            for op in self.solution:
+                op.execute(self.state, self.tracer)
+        return status
+
+    def _search(self, problem, goal):
+        # plans come back as indices into the operations, so they must all
+        # exist before the workers start
+        problem = problem.ground()
+        budget = self.budget
+        achievers = problem.achievers(goal)
+        count = min(len(achievers), self.workers * BRANCHES_PER_WORKER)
+        bounds = [len(achievers) * i // count for i in range(count + 1)]
+        tasks = [(branch, goal, bounds[branch], bounds[branch + 1],
+                  budget.deadline, budget.max_nodes)
+                 for branch in range(count)]
+        self.branches = count
+        if self.tracer.enabled:
+            self.tracer.trace('Splitting goal {} into {} branches', goal,
+                              count)
+
+        ops = list(problem.ops)
+        context = _context()
+        stop = context.Event()
+        queued = context.Queue()
+        results = context.Queue()
+        workers = [context.Process(
+            target=_run_worker,
+            args=(problem, ops, self.solver_version, self.options, stop,
+                  queued, results))
+            for _ in range(min(self.workers, count))]
+        for task in tasks:
+            queued.put(task)
+        for _ in workers:
+            queued.put(None)
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+
+        statuses = set()
+        partial = []
+        try:
+            for _ in range(count):
+                error, outcome = self._next_result(workers, results, stop)
+                if error is not None:
+                    raise WorkerError(error)
+                branch, status, plan, expanded, stats = outcome
+
+                budget.nodes += expanded
+                self.stats.merge(stats)
+                plan = [ops[i] for i in plan]
+                if status == "SUCCESS":
+                    if validate_solution(problem, plan):
+                        if self.tracer.enabled:
+                            self.tracer.trace('Branch {} found a plan', branch)
+                        self.solution = plan
+                        return status
+                    if self.tracer.enabled:
+                        self.tracer.trace('Rejecting invalid plan of '
+                                          'branch {}', branch)
+                    status = "FAILURE"
+
+                statuses.add(status)
+                if len(plan) > len(partial):
+                    partial = plan
+        finally:
+            stop.set()
+            _shutdown(workers, results)
+            # branches never taken by a worker are dropped
+            queued.cancel_join_thread()
+
+        self.solution = partial
+        for status in (CANCELLED, TIMEOUT, EXHAUSTED):
+            if status in statuses:
+                return status
+        return "FAILURE"
+
+    def _next_result(self, workers, results, stop):
+        # wait for the next branch to finish, passing cancellation on to the
+        # workers and checking that they are still alive
+        cancel = self.budget.cancel
+        while True:
+            try:
+                return results.get(True, POLL_INTERVAL)
+            except Empty:
+                pass
+            if cancel is not None and cancel.cancelled:
+                stop.set()
+            # workers only exit once every branch has been taken, so one
+            # which exits while results are outstanding has died, and one
+            # which exited normally may only have results in flight
+            if any(worker.exitcode not in (None, 0) for worker in workers):
+                raise WorkerError('a worker process died (exit codes {})'
+                                  .format([worker.exitcode
+                                           for worker in workers]))
+            if all(worker.exitcode == 0 for worker in workers):
+                try:
+                    return results.get(True, POLL_INTERVAL)
+                except Empty:
+                    raise WorkerError('the workers exited without reporting '
+                                      'every branch')
+
+    def plan(self):
+        """Get the solution found by the last call to :func:`solve`.
+
+        :rtype:  list of :class:`problem.Operation`
+
+        """
+        return list(self.solution)
+
+
+def _shutdown(workers, results):
+    """Wait for workers to exit, killing any which do not in time. Results
+    are drained meanwhile, since a worker does not exit until the results it
+    has sent are read.
+
+    """
+    deadline = clock() + SHUTDOWN_TIMEOUT
+    while any(worker.is_alive() for worker in workers) and \
+            clock() < deadline:
+        try:
+            while True:
+                results.get_nowait()
+        except Empty:
+            pass
+        for worker in workers:
+            worker.join(POLL_INTERVAL / len(workers))
+    for worker in workers:
+        if worker.is_alive():
+            worker.terminate()
+        worker.join()
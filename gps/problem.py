@@ -7,21 +7,73 @@ composed of:
 2.  A starting state: a set of Condition objects
 3.  Allowable operations: a set of Operation objects
 
+Conditions are interned, and each one is assigned a small integer id. This
+allows a set of conditions to be represented as an integer bitset (see
+:class:BitState), so that membership tests and the application of operations
+become bitwise operations.
+
 """
+import copy
+
+from tracing import NULL_TRACER
+
+
+def bitmask(conditions):
+    """Build the integer bitset representing a collection of conditions.
+
+    :type  conditions: collection of :class:Condition
+    :param conditions: The conditions to set bits for.
+    :rtype:  int
+    :return: The bitwise-or of the bits of all conditions.
+
+    """
+    mask = 0
+    for cond in conditions:
+        mask |= cond.bit
+    return mask
 
 
 class Condition(object):
-    """Represent a condition: some information about the world."""
+    """Represent a condition: some information about the world.
+
+    Conditions are interned: constructing a Condition with a name that has been
+    seen before returns the existing instance. Equality and hashing are
+    therefore by identity, which agrees with equality by name.
+
+    """
+
+    __slots__ = ('name', 'id', 'bit')
+
+    _table = {}  # name -> Condition
+    _by_id = []  # id -> Condition
+
+    def __new__(cls, name):
+        try:
+            return Condition._table[name]
+        except KeyError:
+            pass
+
+        cond = super(Condition, cls).__new__(cls)
+        cond.name = name
+        cond.id = len(Condition._by_id)
+        cond.bit = 1 << cond.id
+        Condition._table[name] = cond
+        Condition._by_id.append(cond)
+        return cond
 
     def __init__(self, name):
         """
         :param str name: The unique name of the condition.
 
         """
-        self.name = name
+        pass  # all initialization happens when the condition is interned
 
-    def __eq__(self, other_condition):
-        return self.name == other_condition.name
+    def __reduce__(self):
+        # ids are only stable within a process, so re-intern by name
+        return (Condition, (self.name,))
+
+    def __hash__(self):
+        return self.id
 
     def __repr__(self):
         return self.name.upper()
@@ -29,6 +81,172 @@ class Condition(object):
     def __str__(self):
         return repr(self)
 
+    @classmethod
+    def from_id(cls, cond_id):
+        """Look up an interned condition by its integer id.
+
+        :param int cond_id: The id of the condition.
+        :rtype:  :class:Condition
+        :raise IndexError: If no condition has been assigned cond_id.
+
+        """
+        return Condition._by_id[cond_id]
+
+    @classmethod
+    def from_bits(cls, bits):
+        """Generate the interned conditions whose bits are set in bits.
+
+        :param int bits: The bitset to decode.
+        :rtype:  generator of :class:Condition
+
+        """
+        by_id = Condition._by_id
+        while bits:
+            low = bits & -bits
+            yield by_id[low.bit_length() - 1]
+            bits ^= low
+
+
+class BitState(object):
+    """A set of Conditions stored as an integer bitset. This supports the
+    subset of the set interface used to represent the state of the world.
+
+    """
+
+    __slots__ = ('bits',)
+
+    def __init__(self, conditions=(), bits=0):
+        """
+        :type  conditions: collection of :class:Condition
+        :param conditions: The conditions that initially stand.
+        :param int bits: Bits to set in addition to those of conditions.
+
+        """
+        self.bits = bits | bitmask(conditions)
+
+    def __contains__(self, cond):
+        return self.bits & cond.bit
+
+    def __iter__(self):
+        return Condition.from_bits(self.bits)
+
+    def __len__(self):
+        return bin(self.bits).count('1')
+
+    def __eq__(self, other):
+        if isinstance(other, BitState):
+            return self.bits == other.bits
+        return set(self) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None  # mutable
+
+    def __repr__(self):
+        return 'BitState({})'.format(list(self))
+
+    def copy(self):
+        return BitState(bits=self.bits)
+
+    def add(self, cond):
+        self.bits |= cond.bit
+
+    def discard(self, cond):
+        self.bits &= ~cond.bit
+
+    def remove(self, cond):
+        if not self.bits & cond.bit:
+            raise KeyError(cond)
+        self.bits ^= cond.bit
+
+    def update(self, conditions):
+        self.bits |= bitmask(conditions)
+
+    def difference_update(self, conditions):
+        self.bits &= ~bitmask(conditions)
+
+    def issuperset(self, conditions):
+        mask = bitmask(conditions)
+        return self.bits & mask == mask
+
+    def apply(self, add_mask, del_mask):
+        """Delete the conditions in del_mask and then add those in add_mask.
+
+        :param int add_mask: Bitset of the conditions to add.
+        :param int del_mask: Bitset of the conditions to delete.
+
+        """
+        self.bits = (self.bits & ~del_mask) | add_mask
+
+    def assign(self, bits):
+        """Replace the conditions in the state with those in bits.
+
+        :param int bits: Bitset of the conditions that now stand.
+
+        """
+        self.bits = bits
+
+
+class TrailState(BitState):
+    """A BitState which records each change made by :func:`apply` or
+    :func:`assign` on a trail (an undo log), so that a sequence of changes can
+    be rolled back in time proportional to the number of changes rather than
+    the size of the state.
+
+    Use :func:`mark` to get a position on the trail and :func:`undo` to restore
+    the state to what it was at that position. Changes made through the other
+    set methods are not recorded.
+
+    """
+
+    __slots__ = ('trail',)
+
+    def __init__(self, conditions=(), bits=0):
+        """
+        :type  conditions: collection of :class:Condition
+        :param conditions: The conditions that initially stand.
+        :param int bits: Bits to set in addition to those of conditions.
+
+        """
+        super(TrailState, self).__init__(conditions, bits)
+        self.trail = []
+
+    def __repr__(self):
+        return 'TrailState({})'.format(list(self))
+
+    def apply(self, add_mask, del_mask):
+        # ints are immutable, so the previous bits are saved in O(1)
+        self.trail.append(self.bits)
+        self.bits = (self.bits & ~del_mask) | add_mask
+
+    apply.__doc__ = BitState.apply.__doc__
+
+    def assign(self, bits):
+        self.trail.append(self.bits)
+        self.bits = bits
+
+    assign.__doc__ = BitState.assign.__doc__
+
+    def mark(self):
+        """Get the current position on the trail.
+
+        :rtype:  int
+
+        """
+        return len(self.trail)
+
+    def undo(self, mark):
+        """Roll back all changes recorded since the trail was at mark.
+
+        :param int mark: A position returned by :func:`mark`.
+
+        """
+        trail = self.trail
+        if mark < len(trail):
+            self.bits = trail[mark]
+            del trail[mark:]
+
 
 class Problem(object):
     """A problem which can be solved by the GPS."""
@@ -45,11 +263,25 @@ class Problem(object):
             achieve our goal conditions.
 
         """
+        ops = list(ops)
         self.goals = goals
         self.state = set(state)
         self.ops = set(ops)
         self.name = name
 
+        # map each condition to the operations that add it, so solvers can
+        # find the appropriate ops for a goal without scanning every op; ops
+        # are indexed in the order given so that solvers consider them in a
+        # deterministic order
+        self._achievers = {}
+        indexed = set()
+        for op in ops:
+            if op not in indexed:
+                indexed.add(op)
+                self._index_op(op)
+        self._actions = None  # action -> op, built on first lookup
+        self._names = None  # name -> condition, built on first lookup
+
     def __repr__(self):
         header = '{} PROBLEM'.format(self.name.upper())
         rep = [header, '-' * len(header)]
@@ -64,6 +296,292 @@ class Problem(object):
     def __str__(self):
         return repr(self)
 
+    def _index_op(self, op):
+        for cond in op.add_list:
+            self._achievers.setdefault(cond, []).append(op)
+        self._actions = None
+        self._names = None
+
+    def add_op(self, op):
+        """Add an operation to the set of allowable operations, keeping the
+        achievers index up to date.
+
+        :type  op: :class:Operation
+        :param op: The operation to add.
+
+        """
+        if op not in self.ops:
+            self.ops.add(op)
+            self._index_op(op)
+
+    def remove_op(self, op):
+        """Remove an operation from the set of allowable operations, keeping
+        the achievers index up to date.
+
+        :type  op: :class:Operation
+        :param op: The operation to remove.
+        :raise KeyError: If op is not one of the allowable operations.
+
+        """
+        self.ops.remove(op)
+        for cond in op.add_list:
+            achievers = self._achievers[cond]
+            achievers.remove(op)
+            if not achievers:
+                del self._achievers[cond]
+        self._actions = None
+        self._names = None
+
+    def achievers(self, goal):
+        """Find the operations which achieve a particular goal. This is an
+        index lookup, so it costs time proportional to the number of matching
+        operations rather than the number of allowable operations.
+
+        :type  goal: :class:Condition
+        :param goal: The goal to find achievers for.
+        :rtype:  sequence of :class:Operation
+        :return: The operations with goal in their add-list. The sequence is
+            owned by the problem and must not be modified.
+
+        """
+        return self._achievers.get(goal, ())
+
+    def operation(self, action):
+        """Find the allowable operation with a particular action name. If
+        several have the name, any one of them may be found.
+
+        :param str action: The name of the action.
+        :rtype:  :class:Operation or None
+        :return: The operation, or None if there is none with the name.
+
+        """
+        if self._actions is None:
+            self._actions = dict((op.action, op) for op in self.ops)
+        return self._actions.get(action)
+
+    def condition(self, name):
+        """Find the condition of the problem with a particular name, without
+        interning a new one.
+
+        :param str name: The name of the condition.
+        :rtype:  :class:Condition or None
+        :return: The condition, or None if the problem does not mention one
+            with the name.
+
+        """
+        if self._names is None:
+            self._names = dict((cond.name, cond)
+                               for cond in self.conditions())
+        return self._names.get(name)
+
+    def restate(self, goals=None, state=None):
+        """Build a copy of the problem with other goals or another initial
+        state. The copy shares the operations and the achievers index of the
+        problem, so nothing is indexed again.
+
+        :type  goals: ordered collection of :class:Condition
+        :param goals: The goals of the copy. Defaults to those of the problem.
+        :type  state: collection of :class:Condition
+        :param state: The initial state of the copy. Defaults to that of the
+            problem.
+        :rtype:  :class:Problem
+
+        """
+        restated = copy.copy(self)
+        if goals is not None:
+            restated.goals = goals
+        if state is not None:
+            restated.state = set(state)
+        restated._names = None
+        return restated
+
+    def ground(self):
+        """Get a problem with every operation ground, for solvers which need
+        all of them up front. The operations of a Problem always are, so this
+        is the problem itself (see :class:`lifted.LiftedProblem`).
+
+        :rtype:  :class:Problem
+
+        """
+        return self
+
+    def conditions(self):
+        """Collect every condition mentioned by the problem.
+
+        :rtype:  set of :class:Condition
+
+        """
+        conditions = set(self.goals) | self.state
+        for op in self.ops:
+            conditions.update(op.preconditions, op.add_list, op.del_list)
+        return conditions
+
+    def reachable(self):
+        """Find the conditions and operations reachable from the initial
+        state, ignoring delete-lists. Operations which are not reachable can
+        never be applied, and conditions which are not reachable can never
+        stand.
+
+        :rtype:  (set of :class:Condition, set of :class:Operation)
+        :return: The reachable conditions and operations.
+
+        """
+        unsatisfied = {}
+        consumers = {}
+        ready = []
+        for op in self.ops:
+            unsatisfied[op] = len(op.preconditions)
+            if not op.preconditions:
+                ready.append(op)
+            for cond in op.preconditions:
+                consumers.setdefault(cond, []).append(op)
+
+        reached = set(self.state)
+        frontier = list(reached)
+        reached_ops = set()
+        while ready or frontier:
+            while ready:
+                op = ready.pop()
+                reached_ops.add(op)
+                for cond in op.add_list:
+                    if cond not in reached:
+                        reached.add(cond)
+                        frontier.append(cond)
+
+            if frontier:
+                for op in consumers.get(frontier.pop(), ()):
+                    unsatisfied[op] -= 1
+                    if not unsatisfied[op]:
+                        ready.append(op)
+
+        return reached, reached_ops
+
+    def relevant(self, ops=None):
+        """Find the conditions and operations relevant to the goals: the goals
+        themselves, the operations which add a relevant condition and the
+        preconditions of relevant operations.
+
+        :type  ops: collection of :class:Operation
+        :param ops: The operations to consider. Defaults to all of them.
+        :rtype:  (set of :class:Condition, set of :class:Operation)
+        :return: The relevant conditions and operations.
+
+        """
+        relevant = set(self.goals)
+        frontier = list(relevant)
+        relevant_ops = set()
+        while frontier:
+            for op in self.achievers(frontier.pop()):
+                if op in relevant_ops or (ops is not None and op not in ops):
+                    continue
+                relevant_ops.add(op)
+                for cond in op.preconditions:
+                    if cond not in relevant:
+                        relevant.add(cond)
+                        frontier.append(cond)
+
+        return relevant, relevant_ops
+
+    def prune(self):
+        """Build a copy of the problem with only the operations which are both
+        reachable from the initial state and relevant to the goals (see
+        :func:`reachable` and :func:`relevant`). If a goal is not reachable,
+        the problem cannot be solved.
+
+        The copy shares the kept Operation objects and the whole initial
+        state, so executing a plan for it has the same effects as executing
+        the plan for the original problem. Achievers keep their original
+        order, so means-ends analysis considers operations in the same order
+        as for the original problem.
+
+        :rtype:  (:class:Problem, :class:PruneReport)
+        :return: The pruned problem and a report of what was pruned.
+
+        """
+        reached, reached_ops = self.reachable()
+        relevant, relevant_ops = self.relevant(reached_ops)
+
+        pruned = Problem(self.goals, self.state, relevant_ops, self.name)
+        pruned._achievers = {}
+        for cond, achievers in self._achievers.items():
+            kept = [op for op in achievers if op in relevant_ops]
+            if kept:
+                pruned._achievers[cond] = kept
+
+        report = PruneReport(
+            ops_before=len(self.ops),
+            ops_after=len(relevant_ops),
+            unreachable_ops=len(self.ops) - len(reached_ops),
+            conditions_before=len(self.conditions()),
+            conditions_after=len(relevant & reached),
+            unreachable_goals=[goal for goal in self.goals
+                               if goal not in reached])
+        return pruned, report
+
+
+class PruneReport(object):
+    """Summary of the operations and conditions stripped from a problem by
+    :func:`Problem.prune`.
+
+    """
+
+    def __init__(self, ops_before, ops_after, unreachable_ops,
+                 conditions_before, conditions_after, unreachable_goals):
+        """
+        :param int ops_before: Number of operations of the original problem.
+        :param int ops_after: Number of operations kept.
+        :param int unreachable_ops: Number of operations removed because they
+            can never be applied.
+        :param int conditions_before: Number of conditions of the original
+            problem.
+        :param int conditions_after: Number of conditions which are both
+            reachable and relevant.
+        :type  unreachable_goals: list of :class:Condition
+        :param unreachable_goals: The goals which can never be achieved.
+
+        """
+        self.ops_before = ops_before
+        self.ops_after = ops_after
+        self.unreachable_ops = unreachable_ops
+        self.conditions_before = conditions_before
+        self.conditions_after = conditions_after
+        self.unreachable_goals = unreachable_goals
+
+    @property
+    def solvable(self):
+        """False if the problem was found to be unsolvable."""
+        return not self.unreachable_goals
+
+    @property
+    def irrelevant_ops(self):
+        """Number of reachable operations removed as irrelevant."""
+        return self.ops_before - self.unreachable_ops - self.ops_after
+
+    def as_dict(self):
+        return {'ops_before': self.ops_before,
+                'ops_after': self.ops_after,
+                'unreachable_ops': self.unreachable_ops,
+                'irrelevant_ops': self.irrelevant_ops,
+                'conditions_before': self.conditions_before,
+                'conditions_after': self.conditions_after,
+                'unreachable_goals': [cond.name for cond in
+                                      self.unreachable_goals]}
+
+    def __repr__(self):
+        rep = ('pruned {} of {} operations ({} unreachable, {} irrelevant) '
+               'and {} of {} conditions').format(
+            self.ops_before - self.ops_after, self.ops_before,
+            self.unreachable_ops, self.irrelevant_ops,
+            self.conditions_before - self.conditions_after,
+            self.conditions_before)
+        if self.unreachable_goals:
+            rep += '; unreachable goals: {}'.format(
+                ', '.join(str(goal) for goal in self.unreachable_goals))
+        return rep
+
+    def __str__(self):
+        return repr(self)
+
 
 class Operation(object):
     """Some means to an end (goal)."""
@@ -86,6 +604,24 @@ class Operation(object):
         self.preconditions = set(preconditions)
         self.add_list = set(add_list)
         self.del_list = set(del_list)
+        self._compute_masks()
+
+    def _compute_masks(self):
+        self.pre_mask = bitmask(self.preconditions)
+        self.add_mask = bitmask(self.add_list)
+        self.del_mask = bitmask(self.del_list)
+
+    def __getstate__(self):
+        # condition ids are only stable within a process; recompute the masks
+        # from the (re-interned) conditions when unpickling
+        state = self.__dict__.copy()
+        for key in ('pre_mask', 'add_mask', 'del_mask'):
+            state.pop(key, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._compute_masks()
 
     def __repr__(self):
         return self.action.upper()
@@ -100,30 +636,42 @@ class Operation(object):
         :param goal: The goal to check.
 
         """
-        return goal in self.add_list
+        return self.add_mask & goal.bit != 0
+
+    def applicable(self, state):
+        """Determine if all preconditions of the operation hold in a state.
+
+        :type  state: :class:BitState
+        :param state: The state to check.
+
+        """
+        return state.bits & self.pre_mask == self.pre_mask
 
     def simulate(self, state):
         """Simulate an execution of the operation. In other words, apply the
         operation to the state of the executor but don't actually perform the
         action that 'executes' this operation.
 
-        :type  state: set of :class:Condition
+        :type  state: set of :class:Condition or :class:BitState
         :param state: The state to apply the operation to.
 
         """
         self._apply(state)
 
-    def execute(self, state):
+    def execute(self, state, tracer=NULL_TRACER):
         """Perform some action that 'executes' this operation. The default
-        action simply prints 'Executing <action_name>'. This can be overriden to
-        execute some callback or perform some set of operations. The execution
-        of an operation will alter the state of the executor.
+        action simply traces 'Executing <action_name>'. This can be overriden
+        to execute some callback or perform some set of operations. The
+        execution of an operation will alter the state of the executor.
 
-        :type  state: set of :class:Condition
+        :type  state: set of :class:Condition or :class:BitState
         :param state: The state to apply the operation to.
+        :type  tracer: :class:`tracing.Tracer`
+        :param tracer: The tracer to record the execution with.
 
         """
-        print 'Executing {}'.format(self.action)
+        if tracer.enabled:
+            tracer.trace('Executing {}', self.action)
         self._apply(state)
 
     def _apply(self, state):
@@ -131,5 +679,8 @@ class Operation(object):
         and removing all in its delete-list.
 
         """
-        state.difference_update(self.del_list)
-        state.update(self.add_list)
+        if isinstance(state, BitState):
+            state.apply(self.add_mask, self.del_mask)
+        else:
+            state.difference_update(self.del_list)
+            state.update(self.add_list)
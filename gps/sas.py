@@ -0,0 +1,245 @@
+"""
+Translation of problems to a finite-domain (SAS+) representation.
+
+The conditions of a domain often come in mutually exclusive groups: the
+monkey is at the door or in the middle of the room, on the floor or on the
+chair, hungry or not. A :class:`problem.Problem` treats each condition as an
+independent boolean, so a state of n conditions takes n bits, and most of the
+2^n bitsets are states which can never be reached.
+
+:func:`find_mutex_groups` finds groups of conditions of which at most one
+holds in any state reachable from the initial state. It first computes which
+pairs of conditions can hold together, by a fixpoint over the operations: a
+pair holds together initially if both conditions are in the initial state,
+and after an operation if it adds both, or adds one while the other can hold
+together with all of its preconditions and is not deleted by it. An operation
+only counts once every pair of its preconditions can hold together. Pairs
+which never can are mutually exclusive, and the groups are cliques of
+mutually exclusive conditions, found greedily. Each set of conditions which
+can hold together is kept as a bitset, so the fixpoint takes a few integer
+operations per operation and pass.
+
+A :class:`Translation` turns the groups into multi-valued variables, whose
+value is the condition of the group which holds, or none. Conditions not in
+any group are binary variables. States are then encoded as a vector of
+values, or packed into an integer of a few bits per variable, and states in
+which two conditions of a group hold, along with the operations which require
+them, are known to be impossible.
+
+"""
+from problem import Condition, bitmask
+
+
+def reachable_pairs(problem):
+    """Find which conditions of a problem can hold together with each
+    condition, in some state reachable from its initial state. The result
+    over-approximates the pairs of conditions which truly can.
+
+    :type  problem: :class:`problem.Problem`
+    :rtype:  dict
+    :return: Bitset of the conditions which can hold together with each
+        condition which can hold at all, including itself.
+
+    """
+    initial = bitmask(problem.state)
+    together = dict((cond, initial) for cond in problem.state)
+    reached = initial
+    changed = True
+    while changed:
+        changed = False
+        for op in problem.ops:
+            pre = op.pre_mask
+            if pre & ~reached:
+                continue
+
+            # the conditions which can hold together with every precondition
+            candidates = reached
+            for cond in Condition.from_bits(pre):
+                candidates &= together[cond]
+            if pre & ~candidates:
+                continue  # two preconditions can never hold together
+
+            pairs = op.add_mask | (candidates & ~op.del_mask)
+            for cond in Condition.from_bits(op.add_mask):
+                new = pairs & ~together.get(cond, 0)
+                if not new:
+                    continue
+                changed = True
+                together[cond] = together.get(cond, 0) | new
+                for other in Condition.from_bits(new & ~cond.bit):
+                    together[other] = together.get(other, 0) | cond.bit
+            reached |= op.add_mask
+    return together
+
+
+def find_mutex_groups(problem):
+    """Find groups of conditions of a problem of which at most one holds in
+    any reachable state. Each condition is in at most one group, and groups
+    have at least two conditions.
+
+    :type  problem: :class:`problem.Problem`
+    :rtype:  list of list of :class:`problem.Condition`
+    :return: The groups, each in the order its conditions were found.
+
+    """
+    together = reachable_pairs(problem)
+    reached = bitmask(together)
+
+    groups = []
+    covered = 0
+    for seed in sorted(together, key=lambda cond: cond.id):
+        if covered & seed.bit:
+            continue
+
+        group = [seed]
+        candidates = reached & ~together[seed] & ~covered
+        while candidates:
+            low = candidates & -candidates
+            cond = Condition.from_id(low.bit_length() - 1)
+            group.append(cond)
+            candidates &= ~together[cond]
+
+        if len(group) > 1:
+            groups.append(group)
+            covered |= bitmask(group)
+    return groups
+
+
+class Translation(object):
+    """The finite-domain variables of a problem, and the encoding of its
+    states as vectors of their values. Only the conditions of the problem are
+    encoded; others are dropped.
+
+    Each variable takes the value of the condition of its group which holds,
+    or None if none does. Packed, the value of each variable is a field of
+    just enough bits to number its conditions, 0 being none.
+
+    """
+
+    def __init__(self, problem, groups=None):
+        """
+        :type  problem: :class:`problem.Problem`
+        :param problem: The problem to translate.
+        :param groups: Disjoint groups of conditions of which at most one
+            holds in any reachable state. By default they are found with
+            :func:`find_mutex_groups`.
+
+        """
+        if groups is None:
+            groups = find_mutex_groups(problem)
+        grouped = set()
+        self.variables = []  # tuples of the conditions of each variable
+        for group in groups:
+            self.variables.append(tuple(group))
+            grouped.update(group)
+        for cond in sorted(problem.conditions(), key=lambda cond: cond.id):
+            if cond not in grouped:
+                self.variables.append((cond,))
+
+        self.group_masks = [bitmask(group) for group in self.variables
+                            if len(group) > 1]
+        self.mask = 0
+        self._codes = {}  # condition bit -> its value shifted into its field
+        self._fields = []  # (shift, field mask, bits of each value)
+        shift = 0
+        for group in self.variables:
+            width = len(group).bit_length()
+            values = [0]
+            for code, cond in enumerate(group, 1):
+                self._codes[cond.bit] = code << shift
+                values.append(cond.bit)
+                self.mask |= cond.bit
+            self._fields.append((shift, (1 << width) - 1, values))
+            shift += width
+        self.state_bits = shift
+
+    def __repr__(self):
+        return 'Translation({} variables, {} groups, {} bits per state)'.format(
+            len(self.variables), len(self.group_masks), self.state_bits)
+
+    @property
+    def state_bytes(self):
+        """The number of bytes a packed state takes."""
+        return (self.state_bits + 7) // 8
+
+    def consistent(self, bits):
+        """Determine if a state could be reachable: no two conditions of a
+        group hold in it.
+
+        :param int bits: Bitset of the state.
+        :rtype:  bool
+
+        """
+        for mask in self.group_masks:
+            held = bits & mask
+            if held & (held - 1):
+                return False
+        return True
+
+    def impossible_ops(self, ops):
+        """Find the operations which can never be applied, since their
+        preconditions include two conditions of a group.
+
+        :type  ops: collection of :class:`problem.Operation`
+        :rtype:  list of :class:`problem.Operation`
+
+        """
+        return [op for op in ops if not self.consistent(op.pre_mask)]
+
+    def encode(self, bits):
+        """Get the value of each variable in a state.
+
+        :param int bits: Bitset of a consistent state.
+        :rtype:  tuple of :class:`problem.Condition` or None
+
+        """
+        values = []
+        for group in self.variables:
+            value = None
+            for cond in group:
+                if bits & cond.bit:
+                    value = cond
+                    break
+            values.append(value)
+        return tuple(values)
+
+    def decode(self, values):
+        """Get the state in which each variable has a value.
+
+        :param values: The value of each variable, as from :func:`encode`.
+        :rtype:  int
+        :return: Bitset of the state.
+
+        """
+        return bitmask(value for value in values if value is not None)
+
+    def pack(self, bits):
+        """Pack a state into the fields of the variables.
+
+        :param int bits: Bitset of a consistent state.
+        :rtype:  int
+
+        """
+        codes = self._codes
+        packed = 0
+        remaining = bits & self.mask
+        while remaining:
+            low = remaining & -remaining
+            remaining ^= low
+            packed |= codes[low]
+        return packed
+
+    def unpack(self, packed):
+        """Unpack a state packed by :func:`pack`.
+
+        :param int packed: The packed state.
+        :rtype:  int
+        :return: Bitset of the state.
+
+        """
+        bits = 0
+        for shift, field, values in self._fields:
+            code = (packed >> shift) & field
+            if code:
+                bits |= values[code]
+        return bits
@@ -0,0 +1,411 @@
+"""
+A long-running solver service, which saves clients the interpreter startup and
+problem import of running the CLI once per problem. Requires Python 3.
+
+The service listens on a local TCP port or Unix socket. Clients send requests
+as JSON lines and receive one JSON line in response to each, in the order the
+requests were sent. A request names the problem module (or problem file) and
+optionally the problem in it, and may replace the goals or initial state of
+the problem:
+
+    {"id": 1, "module": "problems/drive_to_school.py", "version": 3,
+     "goals": ["son-at-school"], "state": ["son-at-home", "car-works"],
+     "timeout": 5}
+
+"problem" is the attribute name of the problem in a module, or its name in a
+problem file, and defaults to the first problem found. Goals and initial
+conditions must be conditions the problem already knows. "version", "timeout"
+and "max_nodes" are as for the CLI. The response holds the status, the plan
+as a list of actions, the nodes expanded and the seconds spent solving, along
+with the "id" of the request if it had one. A request of {"stats": true} is
+answered with the counters of the service.
+
+Importing a problem module runs its code, so clients cannot name just any
+module: the service only serves the modules it was told to preload, and
+problem files (which hold no code) in the directories it was told to serve
+them from.
+
+Solves run in a pool of worker processes, each of which keeps the problems it
+has imported in memory until their module changes. Identical requests which
+arrive while one is being solved share its solve rather than starting their
+own. At most max_pending distinct solves may be outstanding at once; requests
+beyond that are answered immediately with status "BUSY", and each connection
+has at most max_pipelined requests in flight before the service stops reading
+from it.
+
+"""
+import os
+import sys
+import json
+import asyncio
+import logging
+import argparse
+import concurrent.futures
+
+import gps
+import solve
+import loader
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_MAX_PENDING = 256
+DEFAULT_MAX_PIPELINED = 16
+
+# statuses reported for requests which are not solved
+BUSY = "BUSY"
+ERROR = "ERROR"
+
+# the problems imported by each worker process, keyed by module path and
+# recorded with the modification time of the module they were imported at
+_worker_problems = {}
+
+
+def _init_worker(preload):
+    for modpath in preload:
+        try:
+            _load_problems(modpath)
+        except Exception as err:
+            logging.warning('could not preload {}: {}'.format(modpath, err))
+
+
+def _load_problems(modpath):
+    mtime = os.path.getmtime(modpath)
+    entry = _worker_problems.get(modpath)
+    if entry is None or entry[0] != mtime:
+        entry = _worker_problems[modpath] = (
+            mtime, solve.import_problems(modpath))
+    return entry[1]
+
+
+def _conditions(problem, names):
+    conditions = []
+    for name in names:
+        cond = problem.condition(name)
+        if cond is None:
+            raise ValueError('unknown condition: {}'.format(name))
+        conditions.append(cond)
+    return conditions
+
+
+def solve_request(modpath, attr=None, version=gps.DEFAULT_VERSION, goals=None,
+                  state=None, timeout=None, max_nodes=None):
+    """Solve the problem of a request. This is the unit of work of the worker
+    processes of the service.
+
+    :param str modpath: Path of the module or problem file with the problem.
+    :param str attr: The name of the problem. Defaults to the first problem
+        found.
+    :param int version: The version of GPS to use to solve the problem.
+    :param list goals: The names of the goals to solve for instead of the
+        goals of the problem.
+    :param list state: The names of the conditions of the initial state to
+        solve from instead of that of the problem.
+    :param float timeout: Number of seconds after which to give up.
+    :param int max_nodes: The maximum number of search nodes to expand.
+    :rtype:  dict
+    :return: The status, the plan as a list of actions, the number of nodes
+        expanded and the number of seconds spent solving.
+    :raise NoProblemFound: If the module has no such problem.
+    :raise ValueError: If a goal or initial condition is not a condition of
+        the problem.
+
+    """
+    instances = _load_problems(modpath)
+    if not instances:
+        raise solve.NoProblemFound(
+            'No instance of Problem was found in {}'.format(modpath))
+    if attr is None:
+        problem = instances[0][1]
+    else:
+        problem = dict(instances).get(attr)
+        if problem is None:
+            raise solve.NoProblemFound(
+                'No problem named {} was found in {}'.format(attr, modpath))
+
+    if goals is not None or state is not None:
+        # conditions are interned for good, so clients may not add new ones
+        problem = problem.restate(
+            None if goals is None else _conditions(problem, goals),
+            None if state is None else _conditions(problem, state))
+
+    outcome = gps.init_gps(version).run(problem, timeout, max_nodes)
+    return {'status': outcome.status,
+            'plan': [op.action for op in outcome.plan],
+            'expanded': outcome.expanded,
+            'seconds': outcome.seconds}
+
+
+def _request_key(request):
+    """Get the key identifying the solve a request asks for, so that
+    identical requests can share it. The initial state is unordered.
+
+    :raise ValueError: If the request is malformed.
+
+    """
+    if not isinstance(request.get('module'), str):
+        raise ValueError('request has no module')
+    goals, state = request.get('goals'), request.get('state')
+    return (os.path.realpath(request['module']), request.get('problem'),
+            int(request.get('version', gps.DEFAULT_VERSION)),
+            None if goals is None else tuple(goals),
+            None if state is None else frozenset(state),
+            request.get('timeout'), request.get('max_nodes'))
+
+
+class SolverService(object):
+    """Service which solves the requests of its clients in a pool of worker
+    processes.
+
+    """
+
+    def __init__(self, workers=None, max_pending=DEFAULT_MAX_PENDING,
+                 max_pipelined=DEFAULT_MAX_PIPELINED, preload=(),
+                 problem_dirs=()):
+        """
+        :param int workers: Number of worker processes. Defaults to the
+            number of CPUs.
+        :param int max_pending: The maximum number of distinct solves to have
+            outstanding at once.
+        :param int max_pipelined: The maximum number of requests of a single
+            connection to have in flight at once.
+        :param preload: Paths of the problem modules for each worker to import
+            when it starts, rather than on first use. Only these modules are
+            served.
+        :param problem_dirs: Paths of directories from which problem files
+            are served too, on first use.
+
+        """
+        self.modules = frozenset(os.path.realpath(path) for path in preload)
+        self.problem_dirs = tuple(os.path.join(os.path.realpath(path), '')
+                                  for path in problem_dirs)
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=_init_worker, initargs=(tuple(self.modules),))
+        self.max_pending = max_pending
+        self.max_pipelined = max_pipelined
+        self.pending = {}  # request key -> future of the solve
+        self.requests = 0
+        self.solves = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.errors = 0
+
+    def serves(self, modpath):
+        """Determine if the service solves the problems of a module.
+
+        :param str modpath: The real path of the module or problem file.
+        :rtype:  bool
+
+        """
+        if modpath in self.modules:
+            return True
+        return (os.path.splitext(modpath)[1].lower() in
+                loader.FILE_EXTENSIONS and
+                any(modpath.startswith(path) for path in self.problem_dirs))
+
+    def stats(self):
+        """Get the counters of the service.
+
+        :rtype:  dict
+
+        """
+        return {'requests': self.requests, 'solves': self.solves,
+                'coalesced': self.coalesced, 'rejected': self.rejected,
+                'errors': self.errors, 'pending': len(self.pending)}
+
+    async def handle(self, request):
+        """Answer a single request.
+
+        :param dict request: The request.
+        :rtype:  dict
+        :return: The response.
+
+        """
+        if request.get('stats'):
+            return self.stats()
+
+        self.requests += 1
+        try:
+            key = _request_key(request)
+            hash(key)  # the names in it must be hashable
+        except (ValueError, TypeError) as err:
+            self.errors += 1
+            return {'status': ERROR, 'error': str(err)}
+        if not self.serves(key[0]):
+            self.errors += 1
+            return {'status': ERROR,
+                    'error': 'module not served: {}'.format(request['module'])}
+
+        future = self.pending.get(key)
+        if future is not None:
+            self.coalesced += 1
+        elif len(self.pending) >= self.max_pending:
+            self.rejected += 1
+            return {'status': BUSY}
+        else:
+            self.solves += 1
+            future = asyncio.get_running_loop().run_in_executor(
+                self.executor, _solve_task, key)
+            self.pending[key] = future
+            future.add_done_callback(lambda _: self.pending.pop(key, None))
+
+        try:
+            # shielded, so that a client which goes away does not cancel a
+            # solve shared with others
+            return dict(await asyncio.shield(future))
+        except Exception as err:
+            self.errors += 1
+            return {'status': ERROR,
+                    'error': '{}: {}'.format(type(err).__name__, err)}
+
+    async def serve_connection(self, reader, writer):
+        """Answer the requests sent over a connection until it is closed.
+        Requests are answered concurrently, but responses are written in the
+        order the requests were read.
+
+        """
+        slots = asyncio.Semaphore(self.max_pipelined)
+        responses = asyncio.Queue()
+
+        async def write_responses():
+            while True:
+                response = await responses.get()
+                if response is None:
+                    break
+                writer.write(json.dumps(await response).encode() + b'\n')
+                await writer.drain()
+                slots.release()
+
+        writer_task = asyncio.ensure_future(write_responses())
+        try:
+            while True:
+                await slots.acquire()
+                line = await reader.readline()
+                if not line:
+                    break
+                line = line.strip()
+                if not line:
+                    slots.release()
+                    continue
+                await responses.put(asyncio.ensure_future(self._answer(line)))
+            await responses.put(None)
+            await writer_task
+        except (ConnectionError, asyncio.IncompleteReadError) as err:
+            logging.info('connection lost: {}'.format(err))
+            writer_task.cancel()
+        finally:
+            writer.close()
+
+    async def _answer(self, line):
+        try:
+            request = json.loads(line.decode())
+            if not isinstance(request, dict):
+                raise ValueError('request is not an object')
+        except ValueError as err:
+            self.errors += 1
+            return {'status': ERROR, 'error': str(err)}
+
+        response = await self.handle(request)
+        if 'id' in request:
+            response['id'] = request['id']
+        return response
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+def _solve_task(key):
+    modpath, attr, version, goals, state, timeout, max_nodes = key
+    return solve_request(modpath, attr, version, goals,
+                         None if state is None else sorted(state),
+                         timeout, max_nodes)
+
+
+async def start_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT,
+                       path=None):
+    """Start serving the requests of clients.
+
+    :type  service: :class:`SolverService`
+    :param service: The service to answer the requests with.
+    :param str host: The host to listen on.
+    :param int port: The port to listen on.
+    :param str path: The path of a Unix socket to listen on instead of a
+        TCP port.
+    :rtype:  :class:`asyncio.AbstractServer`
+
+    """
+    if path is not None:
+        return await asyncio.start_unix_server(service.serve_connection,
+                                               path)
+    return await asyncio.start_server(service.serve_connection, host, port)
+
+
+def setup_parser():
+    parser = argparse.ArgumentParser(
+        description='Serve requests to solve problems using the GPS.')
+
+    parser.add_argument(
+        '--host', action='store', default=DEFAULT_HOST,
+        help='host to listen on (default: {})'.format(DEFAULT_HOST))
+    parser.add_argument(
+        '--port', action='store', type=int, default=DEFAULT_PORT,
+        help='port to listen on (default: {})'.format(DEFAULT_PORT))
+    parser.add_argument(
+        '--unix', action='store', default=None,
+        help='path of a Unix socket to listen on instead of a port')
+    parser.add_argument(
+        '-j', '--workers', action='store', type=int, default=None,
+        help='number of worker processes (default: CPU count)')
+    parser.add_argument(
+        '--max-pending', action='store', type=int,
+        default=DEFAULT_MAX_PENDING,
+        help='maximum number of distinct solves outstanding before requests '
+             'are rejected (default: {})'.format(DEFAULT_MAX_PENDING))
+    parser.add_argument(
+        '--max-pipelined', action='store', type=int,
+        default=DEFAULT_MAX_PIPELINED,
+        help='maximum number of requests in flight per connection '
+             '(default: {})'.format(DEFAULT_MAX_PIPELINED))
+    parser.add_argument(
+        '--preload', action='store', nargs='+', default=[],
+        help='problem modules for each worker to import on startup; only '
+             'these modules are served')
+    parser.add_argument(
+        '--problem-dir', action='store', nargs='+', default=[],
+        help='directories to serve problem files ({}) from'.format(
+            ', '.join(loader.FILE_EXTENSIONS)))
+    parser.add_argument(
+        '-v', '--verbose', action='store_true',
+        help='print verbose output to console')
+
+    return parser
+
+
+def main():
+    parser = setup_parser()
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+
+    service = SolverService(args.workers, args.max_pending,
+                            args.max_pipelined, args.preload,
+                            args.problem_dir)
+
+    async def serve():
+        server = await start_server(service, args.host, args.port, args.unix)
+        logging.info('listening on {}'.format(
+            args.unix or '{}:{}'.format(args.host, args.port)))
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
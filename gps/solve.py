@@ -5,32 +5,61 @@ a properly specified and solving it using the GPS.
 """
 import os
 import sys
-import imp
+import time
+import json
+import pstats
+import signal
+import cProfile
+import hashlib
 import argparse
 import logging
 
+try:
+    from importlib.util import spec_from_file_location, module_from_spec
+    from importlib.machinery import SourcelessFileLoader
+except ImportError:  # Python 2
+    import imp
+    spec_from_file_location = None
+
 import gps
+import loader
+import parallel
+from budget import CancelToken
+from cache import ProblemCache
+from library import PlanLibrary, DEFAULT_PATH as LIBRARY_PATH
+from heuristics import HEURISTICS, VECTOR_HEURISTICS
 from problem import Problem
+from stats import SamplingProfiler
+from tracing import LoggingTracer
 
 
 class NotModule(Exception):
-    """Raise when path is specified for file which is not a Python module."""
+    """Raise when path is specified for file which is neither a Python module
+    nor a problem file."""
     status_code = 1
     pass
 
 
+class SolveTimeout(Exception):
+    """Raise when solving a problem in batch mode overruns its timeout by
+    more than :data:`HARD_TIMEOUT_GRACE`."""
+    pass
+
+
 class NoProblemFound(Exception):
     """Raise when no problem is found in specified module."""
     status_code = 2
     pass
 
 
-def load_instance_from_file(klass, modpath):
-    """Load an instance of klass from the module at modpath.
+def load_instances_from_file(klass, modpath):
+    """Load all instances of klass from the module at modpath.
 
-    :param str klass: The name of the class to find an instance of.
-    :param str modpath: The path of the module to load an instance from.
-    :return:  The first instance of klass found in the imported module.
+    :param str klass: The name of the class to find instances of.
+    :param str modpath: The path of the module to load instances from.
+    :rtype:  list of (str, object)
+    :return: The (attribute name, instance) pairs of all instances of klass
+        found in the imported module, ordered by attribute name.
     :raise NotModule: If modpath is not the path of a .py or .pyc file.
 
     """
@@ -38,50 +67,351 @@ def load_instance_from_file(klass, modpath):
     logging.info('attempting problem import from {} module'.format(mod_name))
 
     ext = file_ext.lower()
-    if ext == '.py':
-        py_mod = imp.load_source(mod_name, modpath)
-    elif ext == '.pyc':
-        py_mod = imp.load_compiled(mod_name, modpath)
-    else:
+    if ext not in ('.py', '.pyc'):
         raise NotModule('{} is not Python source or bytecode'.format(modpath))
+    py_mod = _load_module(mod_name, modpath, ext == '.pyc')
 
+    instances = []
     for attr in dir(py_mod):
         mod_obj = getattr(py_mod, attr)
         if isinstance(mod_obj, klass):
-            return mod_obj
+            instances.append((attr, mod_obj))
 
-    return None
+    return instances
 
 
-def import_problem(modpath):
+def _load_module(mod_name, modpath, compiled):
+    """Import the module at a path. Modules are named by their file name and
+    a digest of their real path, so that modules with the same file name in
+    different directories do not replace each other in sys.modules.
+
+    """
+    digest = hashlib.md5(os.path.realpath(modpath).encode('utf-8'))
+    name = '{}_{}'.format(mod_name, digest.hexdigest()[:12])
+    if spec_from_file_location is None:
+        if compiled:
+            return imp.load_compiled(name, modpath)
+        return imp.load_source(name, modpath)
+
+    file_loader = SourcelessFileLoader(name, modpath) if compiled else None
+    spec = spec_from_file_location(name, modpath, loader=file_loader)
+    module = module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return module
+
+
+def load_instance_from_file(klass, modpath):
+    """Load an instance of klass from the module at modpath.
+
+    :param str klass: The name of the class to find an instance of.
+    :param str modpath: The path of the module to load an instance from.
+    :return:  The first instance of klass found in the imported module.
+    :raise NotModule: If modpath is not the path of a .py or .pyc file.
+
+    """
+    instances = load_instances_from_file(klass, modpath)
+    return instances[0][1] if instances else None
+
+
+def import_problems(modpath, cache=None):
+    """Import all instances of :class:Problem from the specified module path,
+    using the cache of compiled problems if one is given. Problem files in the
+    declarative format of :mod:`loader` are loaded rather than executed; their
+    problems are named by their problem names rather than attribute names.
+
+    :type  cache: :class:`cache.ProblemCache`
+    :param cache: The cache to load the problems from, if they have been
+        stored for the current content of the module, and to store them in
+        otherwise.
+    :rtype:  list of (str, :class:Problem)
+    :return: The (attribute name, problem) pairs found in the module.
+    :raise NotModule: If modpath is not the path of a .py, .pyc or problem
+        file.
+    :raise loader.FormatError: If a problem file is malformed.
+
+    """
+    if cache is not None:
+        instances = cache.load(modpath)
+        if instances is not None:
+            logging.info('loaded problems for {} from cache'.format(modpath))
+            return instances
+
+    if os.path.splitext(modpath)[1].lower() in loader.FILE_EXTENSIONS:
+        logging.info('loading problems from {}'.format(modpath))
+        instances = loader.load_problems(modpath)
+    else:
+        instances = load_instances_from_file(Problem, modpath)
+    if cache is not None and instances:
+        try:
+            cache.store(modpath, instances)
+        except Exception as err:
+            logging.warning(
+                'could not cache problems for {}: {}'.format(modpath, err))
+
+    return instances
+
+
+def import_problem(modpath, cache=None):
     """Import the first instance of :class:Problem from the
     specified module path and return it.
 
+    :type  cache: :class:`cache.ProblemCache`
+    :param cache: The cache of compiled problems to use, if any.
     :rtype:  :class:Problem
     :return: The imported problem.
     :raise NoProblemFound: If no instance of :class:Problem was found
         in the module specified by modpath.
 
     """
-    problem = load_instance_from_file(Problem, modpath)
-    if problem is None:
+    instances = import_problems(modpath, cache)
+    if not instances:
         raise NoProblemFound(
             'No instance of Problem was found in {}'.format(modpath))
 
-    return load_instance_from_file(Problem, modpath)
+    return instances[0][1]
 
 
-def solve(modpath, version):
+def _interrupt_handler(cancel):
+    def handle(signum, frame):
+        if cancel.cancelled:
+            raise KeyboardInterrupt()
+        cancel.cancel()
+    return handle
+
+
+def solve(modpath, version, tracer=None, cache=None, prune=False,
+          timeout=None, max_nodes=None, cancel=None, timed=False,
+          profiler=None, parallel_workers=None, interruptible=False,
+          **options):
     """Find the problem in the given module and solve it using the GPS.
 
     :param str modpath: Path of the python module with the problem
         specification (instance).
     :param int version: The version of GPS to use to solve the problem.
+    :type  tracer: :class:`tracing.Tracer`
+    :param tracer: The tracer to record the reasoning of the GPS with.
+    :type  cache: :class:`cache.ProblemCache`
+    :param cache: The cache of compiled problems to use, if any.
+    :param bool prune: Whether to strip unreachable and irrelevant operations
+        from the problem before solving it (see :func:`Problem.prune`).
+    :param float timeout: Number of seconds after which to stop solving.
+    :param int max_nodes: The maximum number of search nodes to expand.
+    :type  cancel: :class:`budget.CancelToken`
+    :param cancel: Token through which solving may be cancelled.
+    :param bool timed: Whether to time each phase of the solver.
+    :param profiler: A profiler to enable while solving, if any.
+    :param int parallel_workers: Number of worker processes to split the
+        search across (see :mod:`parallel`). By default the problem is
+        solved in this process.
+    :param bool interruptible: Whether an interrupt (SIGINT) while solving
+        cancels the solve, so that its status and best partial plan are still
+        returned. A second interrupt raises :class:`KeyboardInterrupt`. Only
+        available in the main thread.
+    :param options: Additional keyword arguments for the GPS constructor.
+    :rtype:  :class:`gps.SolveResult`
+
+    """
+    problem = import_problem(modpath, cache)
+    if prune:
+        problem, report = problem.prune()
+        logging.info(str(report))
+        if not report.solvable:
+            return gps.SolveResult("FAILURE", [], 0, 0.0)
+
+    if parallel_workers:
+        solver = parallel.ParallelGPS(version, parallel_workers, tracer,
+                                      **options)
+    else:
+        solver = gps.init_gps(version, tracer=tracer, **options)
+
+    if interruptible:
+        if cancel is None:
+            cancel = CancelToken()
+        previous_handler = signal.signal(signal.SIGINT,
+                                         _interrupt_handler(cancel))
+    try:
+        result = solver.run(problem, timeout, max_nodes, cancel, timed,
+                            profiler)
+    finally:
+        if interruptible:
+            signal.signal(signal.SIGINT, previous_handler)
+    logging.info(repr(result))
+    return result
+
+
+def find_modules(paths):
+    """Expand a list of module and directory paths into module paths. Each
+    directory is replaced by the Python modules (excluding package __init__
+    modules) and problem files it contains.
+
+    :param list paths: Paths of modules and directories of modules.
+    :rtype:  list of str
+    :return: The module paths.
+
+    """
+    modpaths = []
+    for path in paths:
+        if os.path.isdir(path):
+            modpaths.extend(
+                os.path.join(path, fname) for fname in sorted(os.listdir(path))
+                if (fname.endswith('.py') and fname != '__init__.py') or
+                os.path.splitext(fname)[1].lower() in loader.FILE_EXTENSIONS)
+        else:
+            modpaths.append(path)
+
+    return modpaths
+
+
+# problems loaded by each batch worker, keyed by module path, so that a module
+# is only executed once per worker no matter how many problems it holds;
+# workers forked by :func:`solve_batch` inherit the problems it loaded
+_worker_problems = {}
+
+# seconds a batch solve may overrun its timeout before it is interrupted,
+# rather than waiting for the solver to check its budget
+HARD_TIMEOUT_GRACE = 1.0
+
+
+def _raise_timeout(signum, frame):
+    raise SolveTimeout()
+
+
+def solve_named(modpath, attr, version, timeout=None, cache=None,
+                options=None, prune=False, max_nodes=None, timed=False):
+    """Solve the problem bound to a particular attribute of a module and
+    summarize the outcome. This is the unit of work of batch mode.
+
+    :param str modpath: Path of the python module with the problem.
+    :param str attr: Name of the module attribute the problem is bound to.
+    :param int version: The version of GPS to use to solve the problem.
+    :param float timeout: Number of seconds after which to give up on the
+        problem. Solvers stop cooperatively once it passes, and are
+        interrupted if they overrun it by :data:`HARD_TIMEOUT_GRACE` seconds,
+        on platforms with :func:`signal.setitimer`. Importing the problem
+        does not count towards it.
+    :type  cache: :class:`cache.ProblemCache`
+    :param cache: The cache of compiled problems to use, if any.
+    :param dict options: Additional keyword arguments for the GPS constructor.
+    :param bool prune: Whether to strip unreachable and irrelevant operations
+        from the problem before solving it.
+    :param int max_nodes: The maximum number of search nodes to expand.
+    :param bool timed: Whether to time each phase of the solver and include
+        the solver's counters and timings as 'stats'.
+    :rtype:  dict
+    :return: The module, attribute and problem names, the status ("SUCCESS",
+        "FAILURE", "TIMEOUT", "EXHAUSTED" or "ERROR"), the plan (or best
+        partial plan) as a list of actions, the number of nodes expanded and
+        the number of seconds spent. When pruning, the prune report is
+        included as 'pruned'.
+
+    """
+    result = {'module': modpath, 'problem': attr, 'name': None,
+              'status': None, 'plan': [], 'expanded': 0, 'seconds': None}
+
+    alarmed = False
+    start = time.time()
+    try:
+        if modpath not in _worker_problems:
+            _worker_problems[modpath] = dict(import_problems(modpath, cache))
+        problem = _worker_problems[modpath][attr]
+        result['name'] = problem.name
+
+        # a single step of a search, like an image of the symbolic search,
+        # may take long enough to overrun the budget before it is checked
+        # again
+        if timeout is not None and hasattr(signal, 'setitimer'):
+            previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+            signal.setitimer(signal.ITIMER_REAL, timeout + HARD_TIMEOUT_GRACE)
+            alarmed = True
+
+        if prune:
+            problem, report = problem.prune()
+            result['pruned'] = report.as_dict()
+
+        if prune and not report.solvable:
+            result['status'] = 'FAILURE'
+        else:
+            solver = gps.init_gps(version, **(options or {}))
+            outcome = solver.run(problem, timeout, max_nodes, timed=timed)
+            result['status'] = outcome.status
+            result['plan'] = [op.action for op in outcome.plan]
+            result['expanded'] = outcome.expanded
+            if timed:
+                result['stats'] = outcome.stats.as_dict()
+    except SolveTimeout:
+        result['status'] = 'TIMEOUT'
+    except Exception as err:
+        result['status'] = 'ERROR'
+        result['error'] = '{}: {}'.format(type(err).__name__, err)
+    finally:
+        if alarmed:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+
+    result['seconds'] = time.time() - start
+    return result
+
+
+def _solve_named(task):
+    return solve_named(*task)
+
+
+def solve_batch(paths, version, workers=None, timeout=None, cache=None,
+                options=None, prune=False, max_nodes=None, timed=False):
+    """Solve every problem in every module found from the given paths across a
+    pool of worker processes.
+
+    :param list paths: Paths of modules and directories of modules.
+    :param int version: The version of GPS to use to solve the problems.
+    :param int workers: Number of worker processes. Defaults to the number of
+        CPUs.
+    :param float timeout: Number of seconds after which to give up on each
+        individual problem.
+    :type  cache: :class:`cache.ProblemCache`
+    :param cache: The cache of compiled problems to use, if any.
+    :param dict options: Additional keyword arguments for the GPS constructor.
+    :param bool prune: Whether to strip unreachable and irrelevant operations
+        from each problem before solving it.
+    :param int max_nodes: The maximum number of search nodes to expand for
+        each individual problem.
+    :param bool timed: Whether to include the counters and phase timings of
+        the solver in each result.
+    :rtype:  generator of dict
+    :return: The results of :func:`solve_named`, in order of completion.
+    :raise NotModule: If a path is not a directory or a Python module.
 
     """
-    problem = import_problem(modpath)
-    solver = gps.init_gps(version)
-    return solver.solve(problem)
+    # the modules are imported here to list their problems, and the problems
+    # kept for the workers, which are forked where possible and so need not
+    # import the modules again
+    tasks = []
+    modpaths = find_modules(paths)
+    try:
+        for modpath in modpaths:
+            problems = import_problems(modpath, cache)
+            _worker_problems[modpath] = dict(problems)
+            for attr, _ in problems:
+                tasks.append((modpath, attr, version, timeout, cache,
+                              options, prune, max_nodes, timed))
+
+        pool = parallel._context().Pool(workers)
+        try:
+            for result in pool.imap_unordered(_solve_named, tasks):
+                yield result
+        finally:
+            pool.terminate()
+            pool.join()
+    finally:
+        for modpath in modpaths:
+            _worker_problems.pop(modpath, None)
+
+
+PROFILERS = ('cprofile', 'sample')
 
 
 def setup_parser():
@@ -89,15 +419,77 @@ def setup_parser():
         description='Solve problems using the GPS.')
 
     parser.add_argument(
-        'modpath', action='store',
-        help='path of module with problem specification')
+        'modpath', action='store', nargs='+',
+        help='path of module with problem specification; in batch mode, '
+             'any number of module or directory paths')
     parser.add_argument(
         '-v', '--verbose', action='store_true',
         help='print verbose output to console')
     parser.add_argument(
         '-i', '--implementation', action='store',
-        type=int, default=gps.MAX_VERSION,
-        help='the GPS version to use to solve the problem')
+        type=int, default=gps.DEFAULT_VERSION,
+        help='the GPS version to use to solve the problem (1-{}, default: {})'
+             .format(gps.MAX_VERSION, gps.DEFAULT_VERSION))
+    parser.add_argument(
+        '--search', action='store', choices=gps.SEARCHES, default=None,
+        help='the search strategy of the forward-search GPS (version 4)')
+    parser.add_argument(
+        '--heuristic', action='store', choices=HEURISTICS, default=None,
+        help='the heuristic of the forward-search GPS (version 4)')
+    parser.add_argument(
+        '--vectorized', action='store_const', const=True, default=None,
+        help='compute the heuristic of the forward-search GPS with NumPy '
+             '(only {})'.format(' or '.join(VECTOR_HEURISTICS)))
+    parser.add_argument(
+        '--compact', action='store_const', const=True, default=None,
+        help='store the states reached by the forward-search GPS packed by '
+             'their finite-domain translation')
+    parser.add_argument(
+        '-p', '--prune', action='store_true',
+        help='strip operations which are unreachable from the initial state '
+             'or irrelevant to the goals before solving')
+    parser.add_argument(
+        '-b', '--batch', action='store_true',
+        help='solve every problem in every module, printing one JSON result '
+             'per line; implied by multiple paths or a directory path')
+    parser.add_argument(
+        '-j', '--workers', action='store',
+        type=int, default=None,
+        help='number of worker processes in batch mode (default: CPU count)')
+    parser.add_argument(
+        '-w', '--parallel', action='store',
+        type=int, default=None, metavar='WORKERS',
+        help='split the search for a single problem across this many worker '
+             'processes (means-ends versions 2, 3 and 5)')
+    parser.add_argument(
+        '-t', '--timeout', action='store',
+        type=float, default=None,
+        help='number of seconds to allow for solving each problem')
+    parser.add_argument(
+        '-n', '--max-nodes', action='store',
+        type=int, default=None,
+        help='maximum number of search nodes to expand for each problem')
+    parser.add_argument(
+        '-s', '--stats', action='store_true',
+        help='report the work done by the solver and the time spent in each '
+             'phase')
+    parser.add_argument(
+        '--profile', action='store', choices=PROFILERS, default=None,
+        help='profile the solver, printing the report to stderr (not '
+             'available in batch mode)')
+    parser.add_argument(
+        '--cache-dir', action='store', default=None,
+        help='directory of the compiled problem cache (default: '
+             '$GPS_CACHE_DIR or ~/.cache/gps)')
+    parser.add_argument(
+        '--no-cache', action='store_true',
+        help='always import problem modules, bypassing the cache')
+    parser.add_argument(
+        '-l', '--library', action='store', nargs='?', default=None,
+        const=LIBRARY_PATH, metavar='PATH',
+        help='reuse the subplans stored in a plan library, and store those '
+             'found (means-ends versions 2, 3 and 5; default path: {})'
+             .format(LIBRARY_PATH))
 
     return parser
 
@@ -108,16 +500,85 @@ def main():
 
     if args.verbose:
         log_level = logging.INFO
+        tracer = LoggingTracer()
     else:
         log_level = logging.ERROR
+        tracer = None
 
     logging.basicConfig(level=log_level)
 
+    options = {}
+    for option in ('search', 'heuristic', 'vectorized', 'compact'):
+        if getattr(args, option) is not None:
+            options[option] = getattr(args, option)
+    try:
+        solver_class = gps.solver_class(args.implementation)
+    except NotImplementedError as err:
+        parser.error(str(err))
+    if options and not issubclass(solver_class, gps.GPSv4):
+        parser.error('--search, --heuristic, --vectorized and --compact '
+                     'require the forward-search GPS')
+    if args.vectorized and args.heuristic is not None and \
+            args.heuristic not in VECTOR_HEURISTICS:
+        parser.error('--vectorized requires --heuristic {}'.format(
+            ' or '.join(VECTOR_HEURISTICS)))
+
+    cache = None if args.no_cache else ProblemCache(args.cache_dir)
+    batch = (args.batch or len(args.modpath) > 1 or
+             os.path.isdir(args.modpath[0]))
+    if batch and args.profile:
+        parser.error('--profile is not available in batch mode')
+    if args.parallel is not None:
+        if batch:
+            parser.error('--parallel is not available in batch mode')
+        if not issubclass(solver_class, gps.GPSv2):
+            parser.error('--parallel requires a means-ends GPS')
+    library = None
+    if args.library is not None:
+        if batch or args.parallel is not None:
+            parser.error('--library is not available in batch mode or with '
+                         '--parallel')
+        if not issubclass(solver_class, gps.GPSv2):
+            parser.error('--library requires a means-ends GPS')
+        library = options['library'] = PlanLibrary(args.library)
+
+    profiler = None
+    if args.profile == 'cprofile':
+        profiler = cProfile.Profile()
+    elif args.profile == 'sample':
+        profiler = SamplingProfiler()
+
     try:
-        print solve(args.modpath, args.implementation)
+        if batch:
+            for result in solve_batch(args.modpath, args.implementation,
+                                      args.workers, args.timeout, cache,
+                                      options, args.prune, args.max_nodes,
+                                      args.stats):
+                print(json.dumps(result))
+                sys.stdout.flush()
+        else:
+            # interrupting stops the search cooperatively, so that the status
+            # and the best partial plan are still reported
+            result = solve(args.modpath[0], args.implementation, tracer, cache,
+                           args.prune, args.timeout, args.max_nodes, None,
+                           args.stats, profiler, args.parallel,
+                           interruptible=True, **options)
+            print(result)
+            if library is not None:
+                library.save()
+            if args.stats:
+                print(result.stats.format())
+            if args.profile == 'cprofile':
+                pstats.Stats(profiler, stream=sys.stderr).sort_stats(
+                    'cumulative').print_stats(20)
+            elif args.profile == 'sample':
+                sys.stderr.write(profiler.format() + '\n')
     except (NotModule, NoProblemFound) as err:
         logging.error(str(err))
         return err.status_code
+    except loader.FormatError as err:
+        logging.error(str(err))
+        return 3
 
     return 0
 
@@ -0,0 +1,237 @@
+"""
+Instrumentation for measuring how much work a GPS does on a problem.
+
+Every solver keeps a :class:`SolveStats` of cheap counters (goals attempted,
+operations considered and simulated, the deepest subgoal chain, goal loops
+detected and so on), which is reset at the start of each solve. Timing is
+opt-in: a :class:`PhaseTimer` wraps the phase methods of a solver for the
+duration of one solve and records the number of calls to each and the time
+spent in each, excluding the time spent in the other phases it calls, so the
+phase times add up to the total.
+
+Solvers which search a layer of states at a time, like the symbolic search of
+version 7, also record the number of states, the size of the decision
+diagram of the layer and of the node table, and the time taken, for each
+layer.
+
+Any profiler with enable() and disable() methods, like
+:class:`cProfile.Profile` or the :class:`SamplingProfiler` here, can be
+attached to one solve with :func:`gps.GPS.run`.
+
+"""
+import time
+import signal
+from collections import defaultdict
+
+
+clock = getattr(time, 'perf_counter', time.time)
+
+
+class SolveStats(object):
+    """Counters of the work done by a solver during one solve."""
+
+    COUNTERS = ('goals', 'searched', 'ops_considered', 'ops_simulated',
+                'max_depth', 'loops', 'memo_hits', 'memo_misses',
+                'clobber_checks', 'expanded', 'generated', 'reused',
+                'recalled')
+
+    def __init__(self):
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        self.depth = 0  # current depth of the subgoal chain
+        self.phases = {}
+        self.layers = []  # (layer, states, nodes, table nodes, seconds)
+
+    def descend(self):
+        """Record entering one level deeper in the subgoal chain."""
+        self.depth += 1
+        if self.depth > self.max_depth:
+            self.max_depth = self.depth
+
+    def merge(self, other):
+        """Add the counters of another solve to these, as when a problem is
+        split across several solvers. The deepest subgoal chain is the
+        deepest of either.
+
+        :type  other: :class:`SolveStats`
+        :param other: The counters to add.
+
+        """
+        for name in self.COUNTERS:
+            if name == 'max_depth':
+                self.max_depth = max(self.max_depth, other.max_depth)
+            else:
+                setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def as_dict(self):
+        """Get the counters, along with the (calls, seconds) of each timed
+        phase under 'phases' and the record of each layer searched, if any,
+        under 'layers'.
+
+        :rtype:  dict
+
+        """
+        stats = dict((name, getattr(self, name)) for name in self.COUNTERS)
+        stats['phases'] = dict((phase, list(timing))
+                               for phase, timing in self.phases.items())
+        if self.layers:
+            stats['layers'] = [list(layer) for layer in self.layers]
+        return stats
+
+    def format(self):
+        """Format the counters, phase timings and layers as tables, one per
+        line.
+
+        :rtype:  str
+
+        """
+        lines = ['{:<16}{:>12}'.format(name, getattr(self, name))
+                 for name in self.COUNTERS]
+        if self.phases:
+            lines.append('{:<24}{:>8}{:>12}'.format('phase', 'calls',
+                                                   'seconds'))
+            for phase, (calls, seconds) in sorted(
+                    self.phases.items(), key=lambda item: -item[1][1]):
+                lines.append('{:<24}{:>8}{:>12.6f}'.format(phase, calls,
+                                                          seconds))
+        if self.layers:
+            lines.append('{:<8}{:>16}{:>10}{:>12}{:>12}'.format(
+                'layer', 'states', 'nodes', 'table', 'seconds'))
+            for layer, states, nodes, table, seconds in self.layers:
+                lines.append('{:<8}{:>16}{:>10}{:>12}{:>12.6f}'.format(
+                    layer, states, nodes, table, seconds))
+        return '\n'.join(lines)
+
+
+class PhaseTimer(object):
+    """Context manager which times the phase methods of a solver. While
+    active, each phase method is shadowed by a timed wrapper bound to the
+    solver instance, so recursive calls through self are timed too; outside
+    of it the solver pays nothing.
+
+    """
+
+    def __init__(self, solver, phases=None):
+        """
+        :type  solver: :class:`gps.GPS`
+        :param solver: The solver to time.
+        :param phases: The names of the methods to time. Defaults to the
+            PHASES of the solver.
+
+        """
+        self.solver = solver
+        self.phases = solver.PHASES if phases is None else phases
+        self.calls = defaultdict(int)
+        self.seconds = defaultdict(float)
+        self._stack = []
+        self._last = None
+
+    def __enter__(self):
+        for name in self.phases:
+            method = getattr(self.solver, name, None)
+            if method is not None:
+                setattr(self.solver, name, self._wrap(name, method))
+        self._last = clock()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for name in self.phases:
+            self.solver.__dict__.pop(name, None)
+
+    def timings(self):
+        """Get the (calls, seconds) of each phase that was called.
+
+        :rtype:  dict
+
+        """
+        return dict((name, (self.calls[name], self.seconds[name]))
+                    for name in self.calls)
+
+    def _switch(self):
+        # charge the time since the last switch to the phase on top
+        now = clock()
+        if self._stack:
+            self.seconds[self._stack[-1]] += now - self._last
+        self._last = now
+
+    def _wrap(self, name, method):
+        stack = self._stack
+
+        def timed(*args, **kwargs):
+            self._switch()
+            stack.append(name)
+            self.calls[name] += 1
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self._switch()
+                stack.pop()
+
+        return timed
+
+
+class SamplingProfiler(object):
+    """Statistical profiler which samples the Python stack at a fixed
+    interval of CPU time. It has much lower overhead than
+    :class:`cProfile.Profile` on the deeply recursive solvers. It relies on
+    SIGPROF, so it is only available on Unix and only from the main thread.
+
+    """
+
+    def __init__(self, interval=0.001):
+        """
+        :param float interval: Number of seconds of CPU time between samples.
+
+        """
+        if not hasattr(signal, 'setitimer'):
+            raise RuntimeError('sampling requires signal.setitimer')
+
+        self.interval = interval
+        self.samples = 0
+        self.own = defaultdict(int)  # samples in which a function was on top
+        self.total = defaultdict(int)  # samples in which it was on the stack
+        self._previous_handler = None
+
+    def enable(self):
+        self._previous_handler = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def disable(self):
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, self._previous_handler)
+
+    def _sample(self, signum, frame):
+        self.samples += 1
+        if frame is None:
+            return
+
+        self.own[self._label(frame)] += 1
+        seen = set()
+        while frame is not None:
+            label = self._label(frame)
+            if label not in seen:
+                seen.add(label)
+                self.total[label] += 1
+            frame = frame.f_back
+
+    @staticmethod
+    def _label(frame):
+        code = frame.f_code
+        return '{}:{}({})'.format(code.co_filename, code.co_firstlineno,
+                                  code.co_name)
+
+    def format(self, limit=20):
+        """Format the functions with the most samples, one per line.
+
+        :param int limit: The number of functions to include.
+        :rtype:  str
+
+        """
+        lines = ['{} samples'.format(self.samples),
+                 '{:>8}{:>8}  {}'.format('own', 'total', 'function')]
+        top = sorted(self.total, key=lambda label: (-self.own[label],
+                                                    -self.total[label]))
+        for label in top[:limit]:
+            lines.append('{:>8}{:>8}  {}'.format(self.own[label],
+                                                 self.total[label], label))
+        return '\n'.join(lines)
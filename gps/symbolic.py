@@ -0,0 +1,330 @@
+"""
+Exhaustive breadth-first search over sets of states, represented symbolically
+as binary decision diagrams (see :mod:`bdd`).
+
+Each condition of a problem is a boolean variable, and a set of states is the
+BDD of the function true of exactly those states. The transition relation of
+an operation holds between a state satisfying its preconditions and the state
+its effects lead to, in which the conditions it adds are true, those it only
+deletes are false and all others are unchanged. The image of a set of states
+under an operation, the set of states it leads to from them, is then computed
+without building the relation over pairs of states: the states satisfying the
+preconditions are found by conjunction, the conditions the operation changes
+are quantified out of them, and the result is conjoined with the effects.
+Operations which cannot lead anywhere new from a set of states are found in
+one pass over its BDD and skipped.
+
+The search starts from the initial state, and each layer holds the states
+first reached after one more operation: the union of the images of the last
+layer under every operation, less the states reached before. The first layer
+holding a goal state gives the length of a shortest plan, which is recovered
+by walking back from a goal state through the layers, one concrete state at a
+time. If a layer is empty before any goal state is reached, every state
+reachable from the initial state has been searched, which proves that the
+problem has no solution.
+
+Variables are ordered so that the conditions of each mutually exclusive group
+(see :func:`sas.find_mutex_groups`) are adjacent, which keeps the BDDs of
+reachable states small. Most nodes built while computing a layer are dead
+once it is found, so after a layer the node table is compacted to the nodes
+of the sets of states and transitions still in use whenever it has grown to
+several times their size.
+
+"""
+from bdd import BDD, FALSE
+from budget import clock
+from problem import bitmask
+from sas import Translation
+
+
+# the factor by which the node table may grow beyond the nodes in use at the
+# last collection before it is collected again
+COLLECT_GROWTH = 4
+# the smallest node table worth collecting
+COLLECT_MIN_NODES = 1 << 16
+
+
+class Layer(object):
+    """The states first reached after some number of operations, and the
+    work of reaching them.
+
+    """
+
+    __slots__ = ('index', 'states', 'frontier', 'nodes', 'seconds')
+
+    def __init__(self, index, states, frontier, nodes, seconds):
+        """
+        :param int index: The number of operations leading to the states.
+        :param int states: The number of states.
+        :param int frontier: The number of nodes of the BDD of the states.
+        :param int nodes: The size of the node table of the BDD manager once
+            the states were found.
+        :param float seconds: The time taken to find the states.
+
+        """
+        self.index = index
+        self.states = states
+        self.frontier = frontier
+        self.nodes = nodes
+        self.seconds = seconds
+
+    def as_tuple(self):
+        return (self.index, self.states, self.frontier, self.nodes,
+                self.seconds)
+
+
+class _Transition(object):
+    """The transition relation of an operation, as the BDD of its
+    preconditions and that of its effects, and bitsets of the variables it
+    requires, adds, deletes and changes.
+
+    """
+
+    __slots__ = ('op', 'pre', 'effect', 'required', 'added', 'deleted',
+                 'changed')
+
+    def __init__(self, op, pre, effect, required, added, changed):
+        self.op = op
+        self.pre = pre
+        self.effect = effect
+        self.required = required
+        self.added = added
+        self.deleted = changed & ~added  # adding takes precedence
+        self.changed = changed
+
+
+class SymbolicSearch(object):
+    """Breadth-first search of the states reachable from the initial state of
+    a problem, one layer of states at a time.
+
+    """
+
+    def __init__(self, problem):
+        """
+        :type  problem: :class:`problem.Problem`
+        :param problem: The problem to search. Every operation must be ground
+            (see :func:`problem.Problem.ground`).
+
+        """
+        translation = Translation(problem)
+        self.conditions = [cond for group in translation.variables
+                           for cond in group]
+        self._vars = dict((cond.bit, 1 << i)
+                          for i, cond in enumerate(self.conditions))
+        self.bdd = BDD(len(self.conditions))
+
+        self.transitions = []
+        for op in sorted(problem.ops, key=lambda op: op.action):
+            if not translation.consistent(op.pre_mask):
+                continue  # never applicable
+            required = self.variables(op.pre_mask)
+            added = self.variables(op.add_mask)
+            changed = added | self.variables(op.del_mask)
+            self.transitions.append(_Transition(
+                op, self.cube(required), self.cube(changed, added), required,
+                added, changed))
+
+        self.everything = (1 << len(self.conditions)) - 1
+        self.goals = self.variables(bitmask(problem.goals))
+        self.initial = self.cube(self.everything,
+                                 self.variables(bitmask(problem.state)))
+        self.reached = self.initial
+        self.frontiers = [self.initial]
+        self.layers = []
+        self.solved = None  # index of the first layer holding a goal state
+        self._live = len(self.bdd)  # nodes in use at the last collection
+
+    def variables(self, bits):
+        """Get the variables of some conditions.
+
+        :param int bits: Bitset of the conditions.
+        :rtype:  int
+        :return: Bitset of their variables.
+
+        """
+        result = 0
+        while bits:
+            low = bits & -bits
+            bits ^= low
+            result |= self._vars[low]
+        return result
+
+    def cube(self, mask, values=None):
+        """Get the set of states in which some variables have given values.
+
+        :param int mask: Bitset of the variables.
+        :param int values: Bitset of those of them which are true. By default
+            all of them are.
+        :rtype:  int
+
+        """
+        if values is None:
+            values = mask
+        literals = {}
+        while mask:
+            low = mask & -mask
+            mask ^= low
+            literals[low.bit_length() - 1] = bool(values & low)
+        return self.bdd.cube(literals)
+
+    def candidates(self, states):
+        """Find the operations which may lead from a set of states to other
+        states, skipping without a pass over the states those which require a
+        condition false in every state, or whose effects already hold in
+        every state.
+
+        :param int states: The set of states.
+        :rtype:  list of :class:`_Transition`
+
+        """
+        can_be_false, can_be_true = self.bdd.possible_values(states)
+        return [t for t in self.transitions
+                if not t.required & ~can_be_true and
+                (t.added & can_be_false or t.deleted & can_be_true)]
+
+    def image(self, states, budget):
+        """Get the states which one operation leads to from a set of states.
+
+        :param int states: The set of states.
+        :type  budget: :class:`budget.Budget`
+        :param budget: The budget to charge the image under each operation
+            to.
+        :rtype:  int
+        :raise BudgetExceeded: If the budget runs out.
+
+        """
+        bdd = self.bdd
+        result = FALSE
+        for t in self.candidates(states):
+            # an image can take far longer than expanding a node, so the
+            # clock is checked before each
+            budget.check()
+            budget.charge()
+            # operations with the same preconditions share the conjunction
+            successors = bdd.exists(bdd.conj(states, t.pre), t.changed)
+            if successors != FALSE:
+                result = bdd.disj(result, bdd.conj(successors, t.effect))
+        return result
+
+    def expand(self, budget):
+        """Search the next layer of states.
+
+        :type  budget: :class:`budget.Budget`
+        :param budget: The budget to charge the images to.
+        :rtype:  :class:`Layer`
+        :raise BudgetExceeded: If the budget runs out.
+
+        """
+        bdd = self.bdd
+        start = clock()
+        frontier = bdd.diff(self.image(self.frontiers[-1], budget),
+                            self.reached)
+        self.reached = bdd.disj(self.reached, frontier)
+        self.frontiers.append(frontier)
+        # the caches only help within a layer
+        bdd.clear_caches()
+        if len(bdd) > max(COLLECT_MIN_NODES, COLLECT_GROWTH * self._live):
+            self.collect()
+        return self._record(self.frontiers[-1], clock() - start)
+
+    def collect(self):
+        """Free the nodes of the BDD manager which are not in any set of
+        states or transition of the search (see :func:`bdd.BDD.collect`).
+
+        """
+        transitions = self.transitions
+        roots = [self.initial, self.reached] + self.frontiers + \
+            [t.pre for t in transitions] + [t.effect for t in transitions]
+        roots = self.bdd.collect(roots)
+        self.initial, self.reached = roots[:2]
+        count = len(self.frontiers)
+        self.frontiers = roots[2:2 + count]
+        for i, t in enumerate(transitions):
+            t.pre = roots[2 + count + i]
+            t.effect = roots[2 + count + len(transitions) + i]
+        self._live = len(self.bdd)
+
+    def _record(self, frontier, seconds):
+        layer = Layer(len(self.frontiers) - 1, self.bdd.count(frontier),
+                      self.bdd.size(frontier), len(self.bdd), seconds)
+        self.layers.append(layer)
+        if self.solved is None and \
+                self.bdd.pick(frontier, self.goals, self.goals) is not None:
+            self.solved = layer.index
+        return layer
+
+    def start(self):
+        """Search the first layer, which holds just the initial state.
+
+        :rtype:  :class:`Layer`
+
+        """
+        del self.frontiers[1:], self.layers[:]
+        self.reached = self.initial
+        self.solved = None
+        return self._record(self.initial, 0.0)
+
+    @property
+    def finished(self):
+        """Whether a goal state has been reached, or the last layer is empty,
+        so that no further states can be.
+
+        """
+        return self.solved is not None or self.frontiers[-1] == FALSE
+
+    def search(self, budget, on_layer=None):
+        """Search layers of states from the first until one holds a goal
+        state or no new states are reached.
+
+        :type  budget: :class:`budget.Budget`
+        :param budget: The budget to charge the images to.
+        :param on_layer: Function called with each :class:`Layer` searched.
+        :rtype:  int or None
+        :return: The length of a shortest plan, or None if there is none.
+        :raise BudgetExceeded: If the budget runs out.
+
+        """
+        layer = self.start()
+        while True:
+            if on_layer is not None:
+                on_layer(layer)
+            if self.finished:
+                return self.solved
+            budget.check()
+            layer = self.expand(budget)
+
+    def extract(self):
+        """Recover a shortest plan by walking back from a goal state through
+        the layers searched. The predecessor of each state is found by picking
+        a state of the layer before it which an operation leads to it from,
+        without building any new sets of states.
+
+        :rtype:  list of :class:`problem.Operation`
+        :raise ValueError: If no layer searched holds a goal state.
+
+        """
+        if self.solved is None:
+            raise ValueError('no goal state has been reached')
+
+        pick = self.bdd.pick
+        state = pick(self.frontiers[self.solved], self.goals, self.goals)
+        plan = []
+        for k in range(self.solved, 0, -1):
+            for t in self.candidates(self.frontiers[k - 1]):
+                if t.added & ~state or t.deleted & state:
+                    continue  # the state is not one the operation leads to
+                # a predecessor agrees with the state on every variable the
+                # operation leaves alone, and satisfies its preconditions
+                unchanged = self.everything & ~t.changed
+                if t.required & unchanged & ~state:
+                    continue
+                previous = pick(self.frontiers[k - 1], unchanged | t.required,
+                                (state & unchanged) | t.required)
+                if previous is not None:
+                    state = previous
+                    plan.append(t.op)
+                    break
+            else:  # every state of a layer is reached from the one before
+                raise AssertionError('no predecessor in layer {}'.format(k - 1))
+        plan.reverse()
+        return plan
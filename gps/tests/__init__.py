@@ -0,0 +1,5 @@
+"""
+Tests of the solvers and the modules they are built on. Run from the gps
+directory with ``python -m pytest tests`` or ``python -m unittest discover``.
+
+"""
@@ -0,0 +1,102 @@
+"""
+Problems and reference searches shared by the tests.
+
+"""
+import random
+from collections import deque
+
+from problem import Condition, Operation, Problem, bitmask
+from problems import drive_to_school, monkey_and_bananas
+
+
+def random_problem(seed, conditions=12, ops=25, goals=3):
+    """Generate a small random problem, which may or may not be solvable.
+
+    :param int seed: The seed of the generator.
+    :param int conditions: The number of conditions.
+    :param int ops: The number of operations.
+    :param int goals: The number of goals.
+    :rtype:  :class:`problem.Problem`
+
+    """
+    rand = random.Random(seed)
+    conds = [Condition('c{}'.format(i)) for i in range(conditions)]
+    operations = []
+    for j in range(ops):
+        pre = rand.sample(conds, rand.randint(0, 3))
+        add = rand.sample(conds, rand.randint(1, 2))
+        delete = [cond for cond in rand.sample(conds, rand.randint(0, 2))
+                  if cond not in add]
+        operations.append(Operation('op{}'.format(j), pre, add, delete))
+    state = rand.sample(conds, rand.randint(0, 4))
+    return Problem(tuple(rand.sample(conds, goals)), state, operations,
+                   'random-{}'.format(seed))
+
+
+def _breadth_first(problem, goals):
+    # the number of operations leading to each state reached, stopping at
+    # the first state holding the goals, if any
+    ops = list(problem.ground().ops)
+    start = bitmask(problem.state)
+    depth = {start: 0}
+    queue = deque([start])
+    while queue:
+        bits = queue.popleft()
+        if goals is not None and bits & goals == goals:
+            return depth, bits
+        for op in ops:
+            if op.pre_mask & ~bits:
+                continue
+            successor = (bits & ~op.del_mask) | op.add_mask
+            if successor not in depth:
+                depth[successor] = depth[bits] + 1
+                queue.append(successor)
+    return depth, None
+
+
+def shortest_plan_length(problem):
+    """Find the length of a shortest plan by breadth-first search.
+
+    :type  problem: :class:`problem.Problem`
+    :rtype:  int or None
+    :return: The length, or None if the problem has no solution.
+
+    """
+    depth, goal_state = _breadth_first(problem, bitmask(problem.goals))
+    return None if goal_state is None else depth[goal_state]
+
+
+def reachable_states(problem):
+    """Find every state reachable from the initial state of a problem.
+
+    :type  problem: :class:`problem.Problem`
+    :rtype:  set of int
+    :return: The bitsets of the states.
+
+    """
+    return set(_breadth_first(problem, None)[0])
+
+
+# the number of random problems each test solves
+RANDOM_SEEDS = range(150)
+
+
+def fixtures():
+    """Get the problems of the problem modules.
+
+    :rtype:  list of :class:`problem.Problem`
+
+    """
+    return [drive_to_school.PROBLEM, drive_to_school.LBYL_PROBLEM,
+            drive_to_school.CLOBBERING_PROBLEM,
+            drive_to_school.RECURSIVE_SUBGOAL_PROBLEM,
+            monkey_and_bananas.PROBLEM]
+
+
+def solvable_fixtures():
+    """Get the problems of the problem modules which have a solution.
+
+    :rtype:  list of :class:`problem.Problem`
+
+    """
+    return [drive_to_school.PROBLEM, monkey_and_bananas.PROBLEM]
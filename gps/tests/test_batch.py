@@ -0,0 +1,70 @@
+"""
+Tests of solving problems in batch mode.
+
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import parallel
+import solve
+
+
+MODULE = '''
+import time
+from problem import Condition, Operation, Problem
+
+with open({log!r}, 'a') as log:
+    log.write('imported\\n')
+time.sleep({delay!r})
+
+goal = Condition('batch-test-goal')
+op = Operation('batch-test-op', (), (goal,))
+FIRST = Problem((goal,), (), [op], 'batch-test-first')
+SECOND = Problem((goal,), (), [op], 'batch-test-second')
+'''
+
+
+class BatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.log = os.path.join(self.directory, 'imports.log')
+        self.modpath = os.path.join(self.directory, 'batch_test_module.py')
+
+    def tearDown(self):
+        solve._worker_problems.pop(self.modpath, None)
+        shutil.rmtree(self.directory)
+
+    def write(self, delay=0.0):
+        with open(self.modpath, 'w') as f:
+            f.write(MODULE.format(log=self.log, delay=delay))
+
+    def imports(self):
+        with open(self.log) as f:
+            return len(f.readlines())
+
+    def test_import_is_not_timed(self):
+        # the import alone overruns the hard timeout
+        self.write(solve.HARD_TIMEOUT_GRACE + 0.5)
+        result = solve.solve_named(self.modpath, 'FIRST', 4, timeout=0.1)
+        self.assertEqual(result['status'], "SUCCESS")
+        self.assertEqual(result['plan'], ['batch-test-op'])
+
+    def test_workers_reuse_import(self):
+        self.write()
+        results = list(solve.solve_batch([self.modpath], 4, workers=2))
+        self.assertEqual(sorted(result['problem'] for result in results),
+                         ['FIRST', 'SECOND'])
+        self.assertTrue(all(result['status'] == "SUCCESS"
+                            for result in results))
+        # forked workers solve the problems imported to list them
+        context = parallel._context()
+        if getattr(context, 'get_start_method', lambda: 'fork')() == 'fork':
+            self.assertEqual(self.imports(), 1)
+        self.assertNotIn(self.modpath, solve._worker_problems)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+Tests of the operations of :mod:`bdd` against truth tables.
+
+"""
+import random
+import unittest
+
+from bdd import BDD, FALSE, TRUE
+
+
+NUM_VARS = 5
+ASSIGNMENTS = range(1 << NUM_VARS)
+
+
+def build(bdd, table):
+    """Build the function with a truth table, a set of the bitsets of the
+    assignments which satisfy it.
+
+    """
+    u = FALSE
+    for bits in table:
+        u = bdd.disj(u, bdd.cube(dict(
+            (var, bool(bits >> var & 1)) for var in range(bdd.num_vars))))
+    return u
+
+
+def evaluate(bdd, u, bits):
+    while u > TRUE:
+        u = bdd.high[u] if bits >> bdd.var[u] & 1 else bdd.low[u]
+    return u == TRUE
+
+
+def table(bdd, u):
+    return set(bits for bits in ASSIGNMENTS if evaluate(bdd, u, bits))
+
+
+class BDDTest(unittest.TestCase):
+
+    def setUp(self):
+        rand = random.Random(0)
+        self.tables = [set(bits for bits in ASSIGNMENTS if rand.random() < p)
+                       for p in (0.0, 0.1, 0.5, 0.9, 1.0) for _ in range(4)]
+
+    def test_operations(self):
+        bdd = BDD(NUM_VARS)
+        everything = set(ASSIGNMENTS)
+        for a in self.tables:
+            u = build(bdd, a)
+            self.assertEqual(table(bdd, u), a)
+            self.assertEqual(bdd.count(u), len(a))
+            self.assertEqual(table(bdd, bdd.neg(u)), everything - a)
+            for b in self.tables:
+                v = build(bdd, b)
+                self.assertEqual(table(bdd, bdd.conj(u, v)), a & b)
+                self.assertEqual(table(bdd, bdd.disj(u, v)), a | b)
+                self.assertEqual(table(bdd, bdd.diff(u, v)), a - b)
+
+    def test_exists(self):
+        bdd = BDD(NUM_VARS)
+        for a in self.tables:
+            u = build(bdd, a)
+            for variables in (0b1, 0b101, 0b11111):
+                expected = set(bits for bits in ASSIGNMENTS
+                               if any(bits & ~variables | other in a
+                                      for other in ASSIGNMENTS
+                                      if not other & ~variables))
+                self.assertEqual(table(bdd, bdd.exists(u, variables)),
+                                 expected)
+
+    def test_pick(self):
+        bdd = BDD(NUM_VARS)
+        for a in self.tables:
+            u = build(bdd, a)
+            for mask, values in ((0, 0), (0b11, 0b01), (0b10100, 0b10000)):
+                fitting = set(bits for bits in a if bits & mask == values)
+                picked = bdd.pick(u, mask, values)
+                if fitting:
+                    self.assertIn(picked, fitting)
+                else:
+                    self.assertIsNone(picked)
+
+    def test_collect(self):
+        bdd = BDD(NUM_VARS)
+        roots = [build(bdd, a) for a in self.tables]
+        before = len(bdd)
+        roots = bdd.collect(roots)
+        self.assertLess(len(bdd), before)
+        for u, a in zip(roots, self.tables):
+            self.assertEqual(table(bdd, u), a)
+        # nodes are still shared after collecting
+        self.assertEqual(build(bdd, self.tables[7]), roots[7])
+
+    def test_many_variables(self):
+        # deeper than the recursion limit
+        num_vars = 5000
+        bdd = BDD(num_vars)
+        everything = dict((var, True) for var in range(num_vars))
+        odd = dict((var, bool(var & 1)) for var in range(num_vars))
+        u = bdd.disj(bdd.cube(everything), bdd.cube(odd))
+        self.assertEqual(bdd.count(u), 2)
+        # two chains below the root, sharing the node of the last variable,
+        # and the terminals
+        self.assertEqual(bdd.size(u), 2 * num_vars)
+        self.assertEqual(bdd.conj(u, bdd.neg(u)), FALSE)
+        self.assertEqual(bdd.exists(u, (1 << num_vars) - 1), TRUE)
+        self.assertEqual(bdd.pick(u, 1, 0), sum(1 << var for var in
+                                               range(1, num_vars, 2)))
+
+
+if __name__ == '__main__':
+    unittest.main()
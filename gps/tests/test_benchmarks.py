@@ -0,0 +1,43 @@
+"""
+Tests of the comparison of benchmark measurements against a baseline.
+
+"""
+import unittest
+
+from benchmarks.runner import MIN_SECONDS, compare
+
+
+def record(status="SUCCESS", expanded=100, seconds=1.0, peak_kib=100):
+    return {'status': status, 'plan_length': 10, 'expanded': expanded,
+            'seconds': seconds, 'peak_kib': peak_kib}
+
+
+class CompareTest(unittest.TestCase):
+
+    def test_unchanged(self):
+        self.assertEqual(compare(record(), record()), [])
+
+    def test_regressions(self):
+        regressions = compare(record(expanded=101, seconds=2.0, peak_kib=200),
+                              record())
+        self.assertEqual(len(regressions), 3)
+        self.assertEqual(len(compare(record("FAILURE"), record())), 1)
+
+    def test_short_solves_are_not_timed(self):
+        seconds = MIN_SECONDS / 2
+        self.assertEqual(compare(record(seconds=seconds),
+                                 record(seconds=seconds / 10)), [])
+
+    def test_timeouts(self):
+        # how far a solve got before timing out is not comparable
+        timeout = record("TIMEOUT", expanded=50, seconds=30.0, peak_kib=None)
+        self.assertEqual(compare(record("TIMEOUT", expanded=1000,
+                                        seconds=31.0, peak_kib=None),
+                                 timeout), [])
+        self.assertEqual(compare(record(expanded=1000), timeout), [])
+        self.assertEqual(len(compare(record("ERROR"), timeout)), 1)
+        self.assertEqual(len(compare(timeout, record())), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
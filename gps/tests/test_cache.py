@@ -0,0 +1,73 @@
+"""
+Tests of the cache of compiled problems.
+
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from cache import ProblemCache
+from solve import import_problems
+
+
+MODULE = '''
+from problem import Condition, Operation, Problem
+
+goal = Condition('cache-test-goal')
+PROBLEM = Problem((goal,), (), [Operation({!r}, (), (goal,))], 'cache-test')
+'''
+
+
+class ProblemCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = ProblemCache(os.path.join(self.directory, 'cache'))
+        self.modpath = os.path.join(self.directory, 'cache_test_module.py')
+        self.write('first')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, action, mtime=None):
+        with open(self.modpath, 'w') as f:
+            f.write(MODULE.format(action))
+        if mtime is not None:
+            os.utime(self.modpath, (mtime, mtime))
+
+    def actions(self):
+        (name, problem), = import_problems(self.modpath, self.cache)
+        self.assertEqual(name, 'PROBLEM')
+        return [op.action for op in problem.ops]
+
+    def test_store_and_load(self):
+        self.assertIsNone(self.cache.load(self.modpath))
+        self.assertEqual(self.actions(), ['first'])
+        (_, problem), = self.cache.load(self.modpath)
+        self.assertEqual(problem.name, 'cache-test')
+        self.assertEqual([op.action for op in problem.ops], ['first'])
+
+    def test_modified_module_invalidates(self):
+        self.assertEqual(self.actions(), ['first'])
+        self.write('second', os.path.getmtime(self.modpath) + 10)
+        self.assertIsNone(self.cache.load(self.modpath))
+        self.assertEqual(self.actions(), ['second'])
+
+    def test_content_checked_with_same_mtime(self):
+        mtime = os.path.getmtime(self.modpath)
+        self.assertEqual(self.actions(), ['first'])
+        self.write('other', mtime)  # same length and modification time
+        self.assertIsNone(self.cache.load(self.modpath))
+        self.assertEqual(self.actions(), ['other'])
+
+    def test_corrupt_entry_ignored(self):
+        self.actions()
+        with open(self.cache.entry_path(self.modpath), 'wb') as f:
+            f.write(b'not a pickle')
+        self.assertIsNone(self.cache.load(self.modpath))
+        self.assertEqual(self.actions(), ['first'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Tests of plan validation in :mod:`executor`.
+
+"""
+import random
+import unittest
+
+from executor import CompiledPlan, validate, validate_batch, \
+    validate_solution
+from problem import Condition, Operation, Problem, bitmask
+from problems import drive_to_school
+from tests.helpers import random_problem
+
+
+class ValidateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.a, self.b, self.c = [Condition('executor-test-{}'.format(name))
+                                  for name in 'abc']
+        self.make_b = Operation('make-b', (self.a,), (self.b,), (self.a,))
+        self.make_c = Operation('make-c', (self.a,), (self.c,))
+        self.problem = Problem((self.b,), (self.a,),
+                               [self.make_b, self.make_c])
+
+    def test_valid(self):
+        result = validate_solution(self.problem, [self.make_b])
+        self.assertTrue(result)
+        self.assertTrue(result.executable)
+
+    def test_missing_precondition(self):
+        result = validate_solution(self.problem, [self.make_b, self.make_c])
+        self.assertFalse(result)
+        self.assertFalse(result.executable)
+        self.assertEqual((result.step, result.op), (1, self.make_c))
+        self.assertEqual(result.missing_conditions(), [self.a])
+
+    def test_unmet_goal(self):
+        result = validate_solution(self.problem, [self.make_c])
+        self.assertFalse(result)
+        self.assertTrue(result.executable)
+        self.assertEqual(result.unmet_goals(), [self.b])
+
+    def test_solved_fixture(self):
+        problem = drive_to_school.PROBLEM
+        plan = [problem.operation(action) for action in (
+            'look-up-number', 'telephone-shop', 'tell-shop-problem',
+            'give-shop-money', 'shop-installs-battery', 'drive-son-to-school')]
+        self.assertTrue(validate_solution(problem, plan))
+        self.assertFalse(validate_solution(problem, plan[1:]))
+
+
+class CompiledPlanTest(unittest.TestCase):
+
+    def test_agrees_with_replay(self):
+        rand = random.Random(0)
+        for seed in range(50):
+            problem = random_problem(seed)
+            ops = sorted(problem.ops, key=lambda op: op.action)
+            conditions = sorted(problem.conditions(), key=lambda c: c.id)
+            goal_mask = bitmask(problem.goals)
+            plans = [[rand.choice(ops) for _ in range(rand.randint(0, 4))]
+                     for _ in range(20)]
+            starts = [bitmask(cond for cond in conditions
+                              if rand.random() < 0.5) for _ in range(20)]
+            batch = validate_batch(plans, [set(Condition.from_bits(bits))
+                                           for bits in starts], problem.goals)
+            for plan, row in zip(plans, batch):
+                compiled = CompiledPlan(plan)
+                for bits, valid in zip(starts, row):
+                    replay = validate(plan, Condition.from_bits(bits),
+                                      problem.goals)
+                    self.assertEqual(compiled.executable(bits),
+                                     replay.executable)
+                    self.assertEqual(compiled.achieves(bits, goal_mask),
+                                     bool(replay))
+                    self.assertEqual(valid, bool(replay))
+                    if replay.executable:
+                        final = bits
+                        for op in plan:
+                            final = (final & ~op.del_mask) | op.add_mask
+                        self.assertEqual(compiled.result(bits), final)
+
+    def test_blocked(self):
+        a, b = Condition('executor-test-a'), Condition('executor-test-b')
+        use_a = Operation('use-a', (a,), (b,), (a,))
+        compiled = CompiledPlan([use_a, use_a])
+        self.assertEqual(compiled.blocked, 1)
+        self.assertFalse(compiled.executable(bitmask([a, b])))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+"""
+Tests of the heuristic forward search of GPS version 4.
+
+"""
+import unittest
+
+import gps
+from benchmarks import generators
+from executor import validate_solution
+from heuristics import HEURISTICS
+from tests.helpers import RANDOM_SEEDS, fixtures, random_problem, \
+    shortest_plan_length
+
+
+class ForwardSearchTest(unittest.TestCase):
+
+    def test_plans_valid_and_complete(self):
+        problems = fixtures() + [random_problem(seed)
+                                 for seed in RANDOM_SEEDS]
+        for problem in problems:
+            solvable = shortest_plan_length(problem) is not None
+            for search in gps.SEARCHES:
+                for heuristic in HEURISTICS:
+                    result = gps.init_gps(4, search=search,
+                                          heuristic=heuristic).run(problem)
+                    name = '{} {} {}'.format(problem.name, search, heuristic)
+                    self.assertEqual(result.solved, solvable, name)
+                    if result.solved:
+                        self.assertTrue(
+                            validate_solution(problem, result.plan), name)
+
+    def test_generated(self):
+        for problem in (generators.chain(50), generators.fanout(20, 2),
+                        generators.cycle(20), generators.rooms(3),
+                        generators.clobbering(5)):
+            result = gps.init_gps(4).run(problem)
+            self.assertEqual(result.status, "SUCCESS", problem.name)
+            self.assertTrue(validate_solution(problem, result.plan))
+
+    def test_astar_with_h_max_optimal(self):
+        for seed in RANDOM_SEEDS:
+            problem = random_problem(seed)
+            result = gps.init_gps(4, search='astar', heuristic='max').run(
+                problem)
+            self.assertEqual(len(result.plan) if result.solved else None,
+                             shortest_plan_length(problem), seed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+"""
+Tests of GPS version 5, which orders and reorders the goals so that achieving
+one does not clobber another.
+
+"""
+import unittest
+
+import gps
+from benchmarks import generators
+from executor import validate_solution
+from tests.helpers import RANDOM_SEEDS, fixtures, random_problem
+
+
+class GoalOrderingTest(unittest.TestCase):
+
+    def test_plans_valid(self):
+        # unlike versions 2 and 3, every plan can be executed as it is, since
+        # the preconditions achieved are checked to still hold
+        problems = fixtures() + [random_problem(seed)
+                                 for seed in RANDOM_SEEDS]
+        for problem in problems:
+            result = gps.init_gps(5).run(problem)
+            if result.solved:
+                self.assertTrue(validate_solution(problem, result.plan),
+                                problem.name)
+
+    def test_clobbering_solved(self):
+        for goals in (2, 10, 100):
+            problem = generators.clobbering(goals)
+            self.assertEqual(gps.init_gps(3).run(problem).status, "FAILURE")
+            result = gps.init_gps(5).run(problem)
+            self.assertEqual(result.status, "SUCCESS")
+            self.assertTrue(validate_solution(problem, result.plan))
+
+
+if __name__ == '__main__':
+    unittest.main()
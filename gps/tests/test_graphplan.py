@@ -0,0 +1,65 @@
+"""
+Tests of the planning graph search of GPS version 6.
+
+"""
+import unittest
+
+import gps
+from executor import validate_solution
+from problem import Condition, Operation, Problem
+from tests.helpers import RANDOM_SEEDS, random_problem, \
+    shortest_plan_length
+
+
+def pigeonhole(holes, pigeons):
+    """A problem of putting pigeons in holes, each of which takes one. Every
+    pair of goals can be achieved together, so with more pigeons than holes
+    the goals are not mutex at any level, and only the search proves that
+    there is no plan.
+
+    """
+    free = [Condition('hole-{}-free'.format(j)) for j in range(holes)]
+    placed = [Condition('pigeon-{}-placed'.format(i)) for i in range(pigeons)]
+    ops = [Operation('put-{}-{}'.format(i, j), (free[j],), (placed[i],),
+                     (free[j],))
+           for i in range(pigeons) for j in range(holes)]
+    return Problem(tuple(placed), free, ops,
+                   'pigeonhole-{}-{}'.format(holes, pigeons))
+
+
+class GraphplanTest(unittest.TestCase):
+
+    def test_levelled_off_without_plan(self):
+        solver = gps.init_gps(6)
+        self.assertEqual(solver.run(pigeonhole(2, 3)).status, "FAILURE")
+        graph = solver.graph
+        self.assertIsNotNone(graph.levelled)
+        self.assertTrue(graph.reachable(graph.goals, graph.levelled))
+        # the graph was extended past where it levelled off until the
+        # no-goods there stopped changing
+        self.assertGreater(len(graph) - 1, graph.levelled)
+
+    def test_levelled_off_with_plan(self):
+        problem = pigeonhole(3, 3)
+        solver = gps.init_gps(6)
+        result = solver.run(problem)
+        self.assertEqual(result.status, "SUCCESS")
+        self.assertTrue(validate_solution(problem, result.plan))
+        self.assertEqual(len(solver.steps), 1)
+
+    def test_steps_no_more_than_shortest_plan(self):
+        for seed in RANDOM_SEEDS:
+            problem = random_problem(seed)
+            solver = gps.init_gps(6)
+            result = solver.run(problem)
+            length = shortest_plan_length(problem)
+            self.assertEqual(result.solved, length is not None, seed)
+            if result.solved:
+                self.assertTrue(validate_solution(problem, result.plan), seed)
+                self.assertLessEqual(len(solver.steps), length, seed)
+                self.assertEqual(solver.plan(),
+                                 [op for step in solver.steps for op in step])
+
+
+if __name__ == '__main__':
+    unittest.main()
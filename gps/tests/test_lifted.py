@@ -0,0 +1,59 @@
+"""
+Tests of lifted problems, whose operations are ground on demand.
+
+"""
+import unittest
+
+from benchmarks.generators import rooms
+from problem import Operation
+
+
+def actions(ops):
+    return [op.action for op in ops]
+
+
+class LiftedProblemTest(unittest.TestCase):
+
+    def setUp(self):
+        self.problem = rooms(4)
+        self.goal = self.problem.goals[0]
+
+    def test_ground_leaves_problem_unchanged(self):
+        self.problem.achievers(self.goal)
+        ops = set(self.problem.ops)
+        ground = self.problem.ground()
+        self.assertEqual(self.problem.ops, ops)
+        self.assertGreater(len(ground.ops), len(ops))
+        self.assertTrue(ops <= ground.ops)
+
+        # the achievers are ground in the same order either way
+        for cond in ground.conditions():
+            self.assertEqual(actions(self.problem.achievers(cond)),
+                             actions(ground.achievers(cond)))
+
+    def test_add_op(self):
+        found = list(self.problem.achievers(self.goal))
+        extra = Operation('lifted-test-extra', (), (self.goal,))
+        self.problem.add_op(extra)
+        self.assertEqual(list(self.problem.achievers(self.goal)),
+                         found + [extra])
+        self.assertIs(self.problem.operation(extra.action), extra)
+        self.assertIn(extra, self.problem.ground().achievers(self.goal))
+
+        self.problem.remove_op(extra)
+        self.assertEqual(list(self.problem.achievers(self.goal)), found)
+        self.assertNotIn(extra, self.problem.ground().ops)
+
+    def test_remove_ground_op(self):
+        op = self.problem.achievers(self.goal)[0]
+        self.problem.remove_op(op)
+        self.assertNotIn(op, self.problem.achievers(self.goal))
+        self.assertIsNone(self.problem.operation(op.action))
+        self.assertNotIn(op.action, actions(self.problem.ground().ops))
+
+        self.problem.add_op(op)
+        self.assertEqual(self.problem.achievers(self.goal)[0], op)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""
+Tests of reading and writing problem files with :mod:`loader`.
+
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import loader
+from problem import Condition, Operation, Problem
+
+
+class OpOrderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.goal = Condition('loader-test-goal')
+        self.first = Operation('loader-test-first', (), (self.goal,))
+        self.second = Operation('loader-test-second', (), (self.goal,))
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'problems.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def problem(self, name, *ops):
+        return Problem((self.goal,), (), ops, name)
+
+    def test_order_kept(self):
+        problems = [self.problem('a', self.second, self.first),
+                    self.problem('b', self.second, self.first)]
+        self.assertEqual(loader._op_order(problems),
+                         [self.second, self.first])
+
+        loader.write_problems(self.path, problems)
+        for _, problem in loader.load_problems(self.path):
+            self.assertEqual([op.action for op in
+                              problem.achievers(self.goal)],
+                             [self.second.action, self.first.action])
+
+    def test_conflicting_orders(self):
+        problems = [self.problem('a', self.first, self.second),
+                    self.problem('b', self.second, self.first)]
+        self.assertRaises(ValueError, loader._op_order, problems)
+        self.assertRaises(ValueError, loader.write_problems, self.path,
+                          problems)
+        self.assertFalse(os.path.exists(self.path))
+
+
+class FormatTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'problems.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def load(self, *lines):
+        with open(self.path, 'w') as f:
+            f.write('\n'.join(lines))
+        return loader.load_problems(self.path)
+
+    def test_conditions_are_lists_of_names(self):
+        problem = '{"problem": "p", "goals": ["loader-test-goal"]}'
+        for op in ('{"op": "o", "pre": "loader-test-goal"}',
+                   '{"op": "o", "add": [1]}',
+                   '{"op": "o", "del": {"loader-test-goal": true}}',
+                   '{"conditions": "loader-test-goal"}'):
+            self.assertRaises(loader.FormatError, self.load, op, problem)
+        self.assertRaises(loader.FormatError, self.load,
+                          '{"problem": "p", "goals": "loader-test-goal"}')
+
+    def test_goals_required(self):
+        self.assertRaises(loader.FormatError, self.load,
+                          '{"problem": "p", "state": ["loader-test-goal"]}')
+        (name, problem), = self.load(
+            '{"op": "o", "add": ["loader-test-goal"]}',
+            '{"problem": "p", "goals": ["loader-test-goal"]}')
+        self.assertEqual(name, 'p')
+        self.assertEqual([goal.name for goal in problem.goals],
+                         ['loader-test-goal'])
+        self.assertFalse(problem.state)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+"""
+Tests of the means-ends GPS versions 2 and 3.
+
+"""
+import unittest
+
+import gps
+from benchmarks import generators
+from executor import validate_solution
+from tests.helpers import RANDOM_SEEDS, fixtures, random_problem, \
+    solvable_fixtures
+
+
+class MeansEndsTest(unittest.TestCase):
+
+    def test_fixture_plans_valid(self):
+        for problem in fixtures():
+            for version in (2, 3):
+                result = gps.init_gps(version).run(problem)
+                if result.solved:
+                    self.assertTrue(validate_solution(problem, result.plan),
+                                    '{} v{}'.format(problem.name, version))
+
+    def test_fixtures_solved(self):
+        for problem in solvable_fixtures():
+            for version in (2, 3):
+                self.assertEqual(gps.init_gps(version).run(problem).status,
+                                 "SUCCESS")
+
+    def test_iterative_matches_recursive(self):
+        problems = fixtures() + [generators.chain(50), generators.cycle(50),
+                                 generators.rooms(4)]
+        problems.extend(random_problem(seed) for seed in RANDOM_SEEDS)
+        for problem in problems:
+            recursive = gps.init_gps(2).run(problem)
+            iterative = gps.init_gps(3).run(problem)
+            self.assertEqual((iterative.status, iterative.plan),
+                             (recursive.status, recursive.plan), problem.name)
+
+    def test_deep_problem(self):
+        # deeper than the recursion limit allows the recursive version
+        problem = generators.chain(5000)
+        result = gps.init_gps(3).run(problem)
+        self.assertEqual(len(result.plan), 5000)
+        self.assertTrue(validate_solution(problem, result.plan))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+"""
+Tests of the memoization of subgoal outcomes in the means-ends GPS versions.
+
+"""
+import unittest
+
+import gps
+from benchmarks import generators
+from memo import TranspositionTable
+from tests.helpers import RANDOM_SEEDS, fixtures, random_problem
+
+
+class TranspositionTableTest(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        memo = TranspositionTable(2)
+        memo.put('a', 1)
+        memo.put('b', 2)
+        self.assertEqual(memo.get('a'), 1)  # b is now the oldest
+        memo.put('c', 3)
+        self.assertNotIn('b', memo)
+        self.assertEqual((memo.get('a'), memo.get('b'), memo.get('c')),
+                         (1, None, 3))
+        self.assertEqual((memo.hits, memo.misses, memo.evictions), (3, 1, 1))
+
+    def test_size_must_be_positive(self):
+        self.assertRaises(ValueError, TranspositionTable, 0)
+
+
+class MemoizedSolveTest(unittest.TestCase):
+
+    def test_same_plans_with_and_without_memo(self):
+        problems = fixtures() + [generators.rooms(8), generators.fanout(20, 2),
+                                 generators.clobbering(10)]
+        problems.extend(random_problem(seed) for seed in RANDOM_SEEDS)
+        hits = 0
+        for version in (2, 3, 5):
+            for problem in problems:
+                memoized = gps.init_gps(version).run(problem, timed=True)
+                plain = gps.init_gps(version, memo_size=0).run(problem)
+                self.assertEqual((memoized.status, memoized.plan),
+                                 (plain.status, plain.plan),
+                                 '{} v{}'.format(problem.name, version))
+                hits += memoized.stats.memo_hits
+        self.assertTrue(hits)  # the memo was used
+
+    def test_small_memo(self):
+        # evicting outcomes must not change the plans either
+        for seed in RANDOM_SEEDS:
+            problem = random_problem(seed)
+            small = gps.init_gps(3, memo_size=2).run(problem)
+            plain = gps.init_gps(3, memo_size=0).run(problem)
+            self.assertEqual((small.status, small.plan),
+                             (plain.status, plain.plan), seed)
+
+
+if __name__ == '__main__':
+    unittest.main()
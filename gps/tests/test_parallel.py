@@ -0,0 +1,89 @@
+"""
+Tests of the parallel means-ends engine.
+
+"""
+import os
+import signal
+import unittest
+
+import parallel
+from benchmarks.generators import fanout
+from executor import validate_solution
+from parallel import ParallelGPS, WorkerError
+
+from tests.helpers import random_problem
+
+# number of seconds after which a test of the workers is taken to have hung
+HANG_TIMEOUT = 60
+
+
+class Hung(Exception):
+    pass
+
+
+def _hang(signum, frame):
+    raise Hung()
+
+
+def _die(task):
+    os._exit(1)
+
+
+def _fail(task):
+    raise ValueError('branch failed')
+
+
+def _forks():
+    context = parallel._context()
+    get_start_method = getattr(context, 'get_start_method', None)
+    return get_start_method is None or get_start_method() == 'fork'
+
+
+class ParallelGPSTest(unittest.TestCase):
+
+    def setUp(self):
+        self.handler = signal.signal(signal.SIGALRM, _hang)
+        signal.alarm(HANG_TIMEOUT)
+        self.solve_branch = parallel._solve_branch
+
+    def tearDown(self):
+        signal.alarm(0)
+        signal.signal(signal.SIGALRM, self.handler)
+        parallel._solve_branch = self.solve_branch
+
+    def test_early_return_does_not_hang(self):
+        # the workers are stopped while most branches are still queued or
+        # being solved, which used to deadlock terminating the pool
+        problem = fanout(200, 2)
+        for _ in range(40):
+            solver = ParallelGPS(3, 4)
+            result = solver.run(problem)
+            self.assertEqual(result.status, "SUCCESS")
+            self.assertGreater(solver.branches, 1)
+            self.assertTrue(validate_solution(problem, result.plan))
+
+    def test_plans_are_valid(self):
+        for seed in range(30):
+            problem = random_problem(seed)
+            for version in (2, 5):
+                result = ParallelGPS(version, 2).run(problem)
+                if result.status == "SUCCESS":
+                    self.assertTrue(validate_solution(problem, result.plan),
+                                    (seed, version))
+
+    @unittest.skipUnless(_forks(), 'workers must be forked to be patched')
+    def test_dead_worker_raises(self):
+        parallel._solve_branch = _die
+        with self.assertRaises(WorkerError):
+            ParallelGPS(3, 2).run(fanout(20))
+
+    @unittest.skipUnless(_forks(), 'workers must be forked to be patched')
+    def test_failed_branch_raises(self):
+        parallel._solve_branch = _fail
+        with self.assertRaises(WorkerError) as raised:
+            ParallelGPS(3, 2).run(fanout(20))
+        self.assertIn('branch failed', str(raised.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+"""
+Tests of the finite-domain translation of :mod:`sas`: the mutex groups it
+finds must hold in every reachable state, and packing a state must lose
+nothing.
+
+"""
+import unittest
+
+from benchmarks import generators
+from sas import Translation
+from tests.helpers import RANDOM_SEEDS, fixtures, random_problem, \
+    reachable_states
+
+
+def _problems():
+    for problem in fixtures() + [generators.rooms(2), generators.rooms(3),
+                                 generators.clobbering(4)]:
+        yield problem.ground()
+    for seed in RANDOM_SEEDS:
+        yield random_problem(seed)
+
+
+class TranslationTest(unittest.TestCase):
+
+    def test_groups_are_mutex_in_reachable_states(self):
+        grouped = 0
+        for problem in _problems():
+            translation = Translation(problem)
+            grouped += len(translation.group_masks)
+            for bits in reachable_states(problem):
+                self.assertTrue(translation.consistent(bits), problem.name)
+        self.assertTrue(grouped)  # some problems have groups to check
+
+    def test_pack_round_trip(self):
+        for problem in _problems():
+            translation = Translation(problem)
+            for bits in reachable_states(problem):
+                packed = translation.pack(bits)
+                self.assertLess(packed, 1 << translation.state_bits)
+                self.assertEqual(translation.unpack(packed),
+                                 bits & translation.mask)
+                self.assertEqual(
+                    translation.decode(translation.encode(bits)),
+                    bits & translation.mask)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+"""
+Tests of the symbolic search of GPS version 7.
+
+"""
+import unittest
+
+import gps
+from benchmarks import generators
+from executor import validate_solution
+from tests.helpers import RANDOM_SEEDS, fixtures, random_problem, \
+    reachable_states, shortest_plan_length
+
+
+class SymbolicSearchTest(unittest.TestCase):
+
+    def test_shortest_plans(self):
+        problems = fixtures() + [random_problem(seed)
+                                 for seed in RANDOM_SEEDS]
+        for problem in problems:
+            result = gps.init_gps(7).run(problem)
+            self.assertEqual(len(result.plan) if result.solved else None,
+                             shortest_plan_length(problem), problem.name)
+            if result.solved:
+                self.assertTrue(validate_solution(problem, result.plan),
+                                problem.name)
+
+    def test_failure_searches_every_state(self):
+        unsolvable = [problem for problem in map(random_problem, RANDOM_SEEDS)
+                      if shortest_plan_length(problem) is None]
+        self.assertTrue(unsolvable)
+        for problem in unsolvable:
+            result = gps.init_gps(7).run(problem)
+            self.assertEqual(result.status, "FAILURE")
+            self.assertEqual(sum(layer[1] for layer in result.stats.layers),
+                             len(reachable_states(problem)), problem.name)
+
+    def test_deep_problem(self):
+        # deeper than the recursion limit allows recursive BDD operations
+        problem = generators.chain(400)
+        result = gps.init_gps(7).run(problem)
+        self.assertEqual(len(result.plan), 400)
+        self.assertTrue(validate_solution(problem, result.plan))
+
+
+if __name__ == '__main__':
+    unittest.main()
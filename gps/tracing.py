@@ -0,0 +1,87 @@
+"""
+Tracers record the reasoning of the GPS as it searches for a solution: every
+goal it attempts to achieve, every operation it considers and every action it
+takes. Solvers check :attr:`Tracer.enabled` before building any trace
+arguments, so tracing costs nothing when it is switched off.
+
+Trace events are format strings with positional arguments. Formatting is
+deferred until the event is actually emitted (or read back from a
+:class:RingBufferTracer).
+
+"""
+import logging
+from collections import deque
+
+
+class Tracer(object):
+    """Template class for tracers."""
+
+    enabled = True
+
+    def trace(self, event, *args):
+        """Record an event.
+
+        :param str event: A format string describing the event.
+        :param args: The arguments to format the event string with. These
+            should not be mutated after being traced.
+
+        """
+        raise NotImplementedError('Subclasses should override this method.')
+
+
+class NullTracer(Tracer):
+    """Tracer which discards all events."""
+
+    enabled = False
+
+    def trace(self, event, *args):
+        pass
+
+
+NULL_TRACER = NullTracer()
+
+
+class LoggingTracer(Tracer):
+    """Tracer which emits events as records of a :mod:`logging` logger."""
+
+    def __init__(self, logger=None, level=logging.INFO):
+        """
+        :type  logger: :class:`logging.Logger`
+        :param logger: The logger to emit events to. Defaults to the 'gps'
+            logger.
+        :param int level: The level to log events at.
+
+        """
+        self.logger = logging.getLogger('gps') if logger is None else logger
+        self.level = level
+
+    def trace(self, event, *args):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, event.format(*args))
+
+
+class RingBufferTracer(Tracer):
+    """Tracer which keeps the most recent events in memory."""
+
+    def __init__(self, size=1000):
+        """
+        :param int size: The maximum number of events to keep.
+
+        """
+        self.events = deque(maxlen=size)
+
+    def trace(self, event, *args):
+        self.events.append((event, args))
+
+    def messages(self):
+        """Format the events currently held in the buffer.
+
+        :rtype:  list of str
+        :return: The formatted events, oldest first.
+
+        """
+        return [event.format(*args) for event, args in self.events]
+
+    def clear(self):
+        """Discard all events currently held in the buffer."""
+        self.events.clear()